@@ -0,0 +1,390 @@
+"""
+Benchmarks of the stviewer hot paths on synthetic datasets, without any browser.
+
+Usage, from the root of the project:
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 2000000 --output results.json
+
+Each dataset size runs in its own process, so that its peak RSS is not polluted by the previous sizes. Rendering needs
+an X server or an offscreen VTK build (OSMesa/EGL); use ``--no-render`` on machines without any.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from benchmarks.synthetic import write_synthetic_dataset
+
+DEFAULT_SIZES = [10000, 100000, 500000, 2000000]
+RENDER_STYLES = {
+    "points": dict(model_style="points", model_size=5),
+    "spheres": dict(model_style="points", model_size=5),
+    "mesh": dict(model_style="surface"),
+}
+
+# -----------------------------------------------------------------------------
+# Measurements
+# -----------------------------------------------------------------------------
+
+
+def peak_rss_mb() -> float:
+    """The peak resident set size of the current process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ``ru_maxrss`` is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def memory_mb() -> dict:
+    """
+    The memory of the current process in MB, from ``/proc/self/smaps_rollup`` (Linux only, None elsewhere):
+
+        * ``rss_mb``: the resident memory, pages shared with other processes included.
+        * ``pss_mb``: the proportional memory, each shared page divided by the number of processes mapping it.
+        * ``uss_mb``: the private memory, freed if the process exits.
+    """
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Private_Clean": "uss_mb"}
+    memory = dict.fromkeys(["rss_mb", "pss_mb", "uss_mb"])
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return memory
+    memory["uss_mb"] = 0.0
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name in fields or name == "Private_Dirty":
+            key = fields.get(name, "uss_mb")
+            memory[key] = (memory[key] or 0.0) + int(value.split()[0]) / 1024
+    return memory
+
+
+def timeit(func, repeat: int = 5, setup=None) -> dict:
+    """
+    Time a function.
+
+    Args:
+        func: The function without argument.
+        repeat: The number of calls.
+        setup: A function without argument called before each call, outside the measured time.
+
+    Returns:
+        The min, median, mean and max wall time of the calls in milliseconds.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": float(np.min(times)),
+        "median_ms": float(np.median(times)),
+        "mean_ms": float(np.mean(times)),
+        "max_ms": float(np.max(times)),
+        "repeat": repeat,
+    }
+
+
+def bench_load(dir_path: str) -> dict:
+    """Time ``drosophila_E7_9h_dataset`` without cache, with a cold binary cache and with a warm one."""
+    from stviewer import drosophila_E7_9h_dataset
+
+    cache_dir = os.path.join(dir_path, ".stviewer_cache")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    results = {
+        "no_cache": timeit(
+            lambda: drosophila_E7_9h_dataset(dir_path=dir_path, cache=False), repeat=1
+        ),
+        "cache_cold": timeit(
+            lambda: drosophila_E7_9h_dataset(dir_path=dir_path, cache=True), repeat=1
+        ),
+        "cache_warm": timeit(
+            lambda: drosophila_E7_9h_dataset(dir_path=dir_path, cache=True), repeat=1
+        ),
+        "metadata_only": timeit(
+            lambda: drosophila_E7_9h_dataset(
+                dir_path=dir_path, load_X=False, cache=True
+            ),
+            repeat=1,
+        ),
+    }
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def bench_scalars(server, plotter, adata, pc_model, repeat: int = 5) -> dict:
+    """
+    Time ``PVCB.on_scalars_change`` for numeric and categorical obs keys and for gene keys, with and without the scalar
+    cache.
+    """
+    from stviewer.pv_pipeline import PVCB, add_single_model
+
+    actor = add_single_model(plotter=plotter, model=pc_model, model_style="points")
+    pvcb = PVCB(server=server, actor=actor, actor_name="PC_Bench", adata=adata)
+    rng = np.random.default_rng(0)
+    keys = {
+        "obs": ["area"],
+        "obs_categorical": ["anno_cell_type"],
+        "gene": list(rng.choice(adata.var_names, size=repeat, replace=False)),
+    }
+
+    results = {}
+    for kind, kind_keys in keys.items():
+        for cached in [False, True]:
+            keys_iter = iter(kind_keys * repeat)
+            if cached:
+                for key in kind_keys:
+                    pvcb.get_scalars(key)
+
+            def setup():
+                if not cached:
+                    pvcb._scalar_cache.clear()
+                server.state[pvcb.SCALARS] = next(keys_iter)
+
+            results[f"{kind}_{'warm' if cached else 'cold'}"] = timeit(
+                pvcb.on_scalars_change, repeat=repeat, setup=setup
+            )
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def bench_render(pc_model, mesh_model, window_size, n_frames: int = 20) -> dict:
+    """Time offscreen renders of ``create_plotter`` for each model style, while the camera turns around the model."""
+    from stviewer.pv_pipeline import add_single_model, create_plotter
+
+    results = {}
+    for style, kwargs in RENDER_STYLES.items():
+        plotter = create_plotter(window_size=window_size)
+        actor = add_single_model(
+            plotter=plotter,
+            model=mesh_model if style == "mesh" else pc_model,
+            **kwargs,
+        )
+        actor.prop.render_points_as_spheres = style == "spheres"
+        plotter.render()
+
+        def render():
+            plotter.camera.azimuth += 360 / n_frames
+            plotter.render()
+
+        results[style] = timeit(render, repeat=n_frames)
+        results[style]["fps"] = 1000 / results[style]["median_ms"]
+        plotter.close()
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def bench_screenshot(server, plotter, repeat: int = 5) -> dict:
+    """Time ``Viewer.screenshot`` without the attachment to the client."""
+    from stviewer.pv_pipeline import get_viewer
+
+    viewer = get_viewer(plotter=plotter, server=server)
+    results = timeit(viewer.take_screenshot, repeat=repeat)
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def _session_memory(dir_path: str, server_name: str, queue, release):
+    from stviewer import flysta3d_html
+
+    flysta3d_html(dir_path=dir_path, server_name=server_name)
+    queue.put(memory_mb())
+    # Stay alive until all sessions are measured, so that shared pages are split between all of them
+    release.wait()
+
+
+def bench_sessions(dir_path: str, n_sessions: int = 3) -> dict:
+    """
+    Measure the memory of ``n_sessions`` sessions of ``stviewer.launcher.launch_sessions`` built side by side, each
+    in its own process without serving it. The stores of ``write_shared_dataset`` are mapped by all sessions, the rest
+    of a session (interpreter, VTK, plotter, actors, trame state) is private.
+    """
+    from stviewer.launcher import write_shared_dataset
+
+    write_shared_dataset(dir_path=dir_path)
+    context = get_context("spawn")
+    queue, release = context.Queue(), context.Event()
+    processes = [
+        context.Process(
+            target=_session_memory,
+            args=(dir_path, f"benchmark_session_{i}", queue, release),
+        )
+        for i in range(n_sessions)
+    ]
+    for process in processes:
+        process.start()
+    sessions = [queue.get() for _ in processes]
+    release.set()
+    for process in processes:
+        process.join()
+
+    results = {"n_sessions": n_sessions, "sessions": sessions}
+    for key in ["rss_mb", "pss_mb", "uss_mb"]:
+        values = [session[key] for session in sessions if session[key] is not None]
+        results[f"mean_{key}"] = float(np.mean(values)) if values else None
+    # An extra session costs at least its private memory, and about its proportional memory
+    results["extra_session_mb"] = results["mean_uss_mb"]
+    return results
+
+
+def run_size(
+    n_cells: int,
+    data_dir: str,
+    n_genes: int,
+    density: float,
+    repeat: int,
+    render: bool,
+    window_size: tuple,
+    n_sessions: int = 0,
+) -> dict:
+    """Run all benchmarks on a synthetic dataset of ``n_cells`` cells, in a fresh process."""
+    from trame.app import get_server
+
+    from stviewer import drosophila_E7_9h_dataset
+    from stviewer.pv_pipeline import create_plotter
+
+    dir_path = os.path.join(data_dir, f"cells_{n_cells}_genes_{n_genes}")
+    results = {"n_cells": n_cells, "n_genes": n_genes, "density": density}
+    results["load"] = bench_load(dir_path)
+
+    adata, pc_models, _, mesh_models, _ = drosophila_E7_9h_dataset(dir_path=dir_path)
+    server = get_server(f"benchmark_{n_cells}")
+    # No view is attached, renders are measured separately
+    server.controller.view_update = lambda **kwargs: None
+    plotter = create_plotter(window_size=window_size)
+    results["scalars"] = bench_scalars(
+        server=server,
+        plotter=plotter,
+        adata=adata,
+        pc_model=pc_models[0],
+        repeat=repeat,
+    )
+    if render:
+        results["screenshot"] = bench_screenshot(
+            server=server, plotter=plotter, repeat=repeat
+        )
+        results["render"] = bench_render(
+            pc_model=pc_models[0], mesh_model=mesh_models[0], window_size=window_size
+        )
+        # Sessions build their UI, which renders
+        if n_sessions > 0:
+            results["sessions"] = bench_sessions(dir_path, n_sessions=n_sessions)
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+# -----------------------------------------------------------------------------
+# Main
+# -----------------------------------------------------------------------------
+
+
+def metadata(args) -> dict:
+    """The environment of the run, to compare results across versions."""
+    import anndata
+    import vtk
+
+    import pyvista
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "anndata": anndata.__version__,
+        "pyvista": pyvista.__version__,
+        "vtk": vtk.vtkVersion.GetVTKVersion(),
+        "args": vars(args),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--n-genes", type=int, default=500)
+    parser.add_argument("--density", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--window-size", type=int, nargs=2, default=[1024, 1024])
+    parser.add_argument(
+        "--data-dir",
+        default=None,
+        help="Directory of the synthetic datasets, reused across runs. A temporary directory by default.",
+    )
+    parser.add_argument(
+        "--n-sessions",
+        type=int,
+        default=3,
+        help="The number of sessions whose memory is measured, 0 to skip. Needs rendering.",
+    )
+    parser.add_argument("--no-render", action="store_true")
+    parser.add_argument("--output", default=None, help="The output JSON file.")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="stviewer_benchmarks_")
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "results",
+        f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json",
+    )
+
+    report = {"metadata": metadata(args), "results": []}
+    context = get_context("spawn")
+    for n_cells in args.sizes:
+        # Datasets are generated and benchmarked in separate processes
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            pool.submit(
+                write_synthetic_dataset,
+                dir_path=os.path.join(
+                    data_dir, f"cells_{n_cells}_genes_{args.n_genes}"
+                ),
+                n_cells=n_cells,
+                n_genes=args.n_genes,
+                density=args.density,
+            ).result()
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results = pool.submit(
+                run_size,
+                n_cells=n_cells,
+                data_dir=data_dir,
+                n_genes=args.n_genes,
+                density=args.density,
+                repeat=args.repeat,
+                render=not args.no_render,
+                window_size=tuple(args.window_size),
+                n_sessions=args.n_sessions,
+            ).result()
+        report["results"].append(results)
+        print(json.dumps(results, indent=2))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    if args.data_dir is None:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import os
+from typing import Optional
+
+import anndata as ad
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import pyvista as pv
+
+from stviewer.flysta3d import E7_9h_MESH_MODEL_FILES, E7_9h_PC_MODEL_FILES
+
+# -----------------------------------------------------------------------------
+# Synthetic datasets with the layout of ``drosophila_E7_9h_dataset``
+# -----------------------------------------------------------------------------
+
+# Fraction of the cells of the embryo in each point cloud model
+PC_MODEL_FRACTIONS = [1.0, 0.2, 0.1]
+TISSUES = ["CNS", "midgut", "muscle", "epidermis", "fat body", "trachea"]
+
+
+def synthetic_adata(
+    n_cells: int, n_genes: int = 500, density: float = 0.02, random_state: int = 0
+) -> ad.AnnData:
+    """
+    Generate an AnnData object with the obs columns, layers and ``obsm['spatial']`` of the E7-9h dataset.
+
+    Args:
+        n_cells: The number of cells.
+        n_genes: The number of genes.
+        density: The fraction of non-zero values of the expression matrix.
+        random_state: The seed of the random generator.
+
+    Returns:
+        The AnnData object, with a CSR expression matrix.
+    """
+    rng = np.random.default_rng(random_state)
+
+    # Each cell expresses a window of consecutive genes, which keeps the column indices of a row unique.
+    n_expressed = max(int(n_genes * density), 1)
+    starts = rng.integers(n_genes, size=n_cells)
+    indices = (starts[:, None] + np.arange(n_expressed)[None, :]) % n_genes
+    indptr = np.arange(0, n_cells * n_expressed + 1, n_expressed, dtype=np.int64)
+    data = (rng.poisson(2.0, size=n_cells * n_expressed) + 1).astype(np.float32)
+    X_counts = sparse.csr_matrix(
+        (data, indices.ravel().astype(np.int32), indptr), shape=(n_cells, n_genes)
+    )
+    X_log1p = X_counts.log1p()
+
+    # Cells are spread in an ellipsoid shaped like an embryo
+    directions = rng.normal(size=(n_cells, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    radii = rng.random(n_cells) ** (1 / 3)
+    spatial = directions * radii[:, None] * np.asarray([250.0, 100.0, 100.0])
+
+    obs = pd.DataFrame(
+        {
+            "area": rng.gamma(4.0, 10.0, size=n_cells),
+            "slices": pd.Categorical(
+                [
+                    f"S{s:02d}"
+                    for s in np.digitize(spatial[:, 0], np.linspace(-250, 250, 16))
+                ]
+            ),
+            "anno_cell_type": pd.Categorical(rng.choice(TISSUES, size=n_cells)),
+            "anno_tissue": pd.Categorical(rng.choice(TISSUES, size=n_cells)),
+            "anno_germ_layer": pd.Categorical(
+                rng.choice(["ectoderm", "mesoderm", "endoderm"], size=n_cells)
+            ),
+        },
+        index=[f"cell_{i}" for i in range(n_cells)],
+    )
+    var = pd.DataFrame(index=[f"gene_{i}" for i in range(n_genes)])
+    adata = ad.AnnData(X=X_counts, obs=obs, var=var)
+    adata.layers["X_counts"] = X_counts
+    adata.layers["X_log1p"] = X_log1p
+    adata.obsm["spatial"] = spatial
+    return adata
+
+
+def synthetic_pc_model(
+    adata: ad.AnnData, rows: Optional[np.ndarray] = None
+) -> pv.PolyData:
+    """
+    Generate a point cloud model of some cells, with the point arrays of the E7-9h point cloud models.
+
+    Args:
+        adata: The AnnData object.
+        rows: The row positions of the cells. If None, all cells are used.
+
+    Returns:
+        The point cloud model.
+    """
+    rows = np.arange(adata.n_obs) if rows is None else rows
+    model = pv.PolyData(np.asarray(adata.obsm["spatial"][rows], dtype=np.float64))
+    area = np.asarray(adata.obs["area"].values[rows], dtype=np.float64)
+    tissue = np.asarray(adata.obs["anno_tissue"].values[rows]).astype(str)
+    codes = np.asarray(adata.obs["anno_tissue"].cat.codes.values[rows])
+    rgba = plt.get_cmap("tab10")(codes % 10).astype(np.float32)
+
+    model.point_data["cell_size"] = area
+    model.point_data["tissue_rgba"] = rgba
+    model.point_data["tissue"] = tissue
+    model.point_data["obs_index"] = np.asarray(adata.obs_names[rows]).astype("<U16")
+    model.point_data["cell_radius"] = np.sqrt(area / np.pi)
+    return model
+
+
+def synthetic_mesh_model(pc_model: pv.PolyData, n_cells: int) -> pv.PolyData:
+    """
+    Generate a closed surface around a point cloud model, with about ``n_cells`` triangles.
+
+    Args:
+        pc_model: The point cloud model.
+        n_cells: The expected number of triangles, at most about 2M.
+
+    Returns:
+        The mesh model with point normals.
+    """
+    resolution = int(np.clip(np.sqrt(n_cells / 2), 8, 1000))
+    bounds = np.asarray(pc_model.bounds).reshape(3, 2)
+    mesh = pv.Sphere(radius=0.5, theta_resolution=resolution, phi_resolution=resolution)
+    mesh = mesh.scale(bounds[:, 1] - bounds[:, 0], inplace=False)
+    mesh = mesh.translate(bounds.mean(axis=1), inplace=False)
+    return mesh.compute_normals(cell_normals=False)
+
+
+def write_synthetic_dataset(
+    dir_path: str,
+    n_cells: int,
+    n_genes: int = 500,
+    density: float = 0.02,
+    random_state: int = 0,
+) -> str:
+    """
+    Write a synthetic dataset with the file names of the E7-9h dataset, readable with
+    ``stviewer.drosophila_E7_9h_dataset(dir_path=dir_path)``. Existing files are kept.
+
+    Args:
+        dir_path: The output directory.
+        n_cells: The number of cells.
+        n_genes: The number of genes.
+        density: The fraction of non-zero values of the expression matrix.
+        random_state: The seed of the random generator.
+
+    Returns:
+        The output directory.
+    """
+    os.makedirs(dir_path, exist_ok=True)
+    adata_file = os.path.join(dir_path, "E7-9h_cellbin.h5ad")
+    if os.path.exists(adata_file):
+        return dir_path
+
+    adata = synthetic_adata(
+        n_cells=n_cells, n_genes=n_genes, density=density, random_state=random_state
+    )
+    rng = np.random.default_rng(random_state)
+    for fraction, pc_file, mesh_file in zip(
+        PC_MODEL_FRACTIONS, E7_9h_PC_MODEL_FILES, E7_9h_MESH_MODEL_FILES
+    ):
+        n_rows = max(int(n_cells * fraction), 1)
+        rows = np.sort(rng.choice(n_cells, size=n_rows, replace=False))
+        pc_model = synthetic_pc_model(adata=adata, rows=rows)
+        pc_model.save(os.path.join(dir_path, pc_file), binary=True)
+        mesh_model = synthetic_mesh_model(pc_model=pc_model, n_cells=n_rows)
+        mesh_model.save(os.path.join(dir_path, mesh_file), binary=True)
+
+    # The h5ad file is written last, its presence marks a complete dataset.
+    adata.write_h5ad(adata_file)
+    return dir_path
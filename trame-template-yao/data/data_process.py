@@ -1,7 +1,15 @@
+# Run from the root of the project: python -m data.data_process
+import os
+
 import anndata as ad
 import dynamo as dyn
 
-adata = ad.read_h5ad("./drosophila-E7-9h-models/E7-9h_cellbin_tdr_v2.h5ad")
+from stviewer.dataset import write_gene_store
+
+dir_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "drosophila-E7-9h-models"
+)
+adata = ad.read_h5ad(os.path.join(dir_path, "E7-9h_cellbin_tdr_v2.h5ad"))
 
 X_counts = adata.layers["counts_X"].copy()
 adata.X = adata.layers["counts_X"].copy()
@@ -19,4 +27,11 @@ adata.layers["X_counts"] = X_counts
 adata.layers["X_log1p"] = X_log1p
 print(adata)
 
-adata.write_h5ad("./drosophila-E7-9h-models/E7-9h_cellbin.h5ad", compression="gzip")
+adata.write_h5ad(os.path.join(dir_path, "E7-9h_cellbin.h5ad"), compression="gzip")
+
+# Gene-major (CSC) copy of the expression matrices for random gene access in the viewer
+write_gene_store(
+    adata=adata,
+    path=os.path.join(dir_path, "E7-9h_cellbin_genes"),
+    layers=["X", "X_counts", "X_log1p"],
+)
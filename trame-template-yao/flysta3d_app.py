@@ -1,5 +1,6 @@
 from stviewer import flysta3d_html
 
-server = flysta3d_html()
 if __name__ == "__main__":
+    # The server is built under the main guard, spawned scalar workers import this module again
+    server = flysta3d_html()
     server.start()
@@ -0,0 +1,5 @@
+from stviewer.launcher import launch_sessions
+
+if __name__ == "__main__":
+    for process in launch_sessions(n_sessions=4, port=8080):
+        process.join()
@@ -1,7 +1,9 @@
 from .app import standard_html
 from .assets import asset_manager
+from .dataset import GeneStore, write_gene_store
 from .flysta3d import (
     drosophila_E7_9h_dataset,
+    drosophila_E7_9h_gene_store,
     drosophila_plotter,
     drosophila_tree,
     flysta3d_html,
@@ -3,13 +3,14 @@ try:
 except ImportError:
     from typing_extensions import Literal
 
-from typing import Optional
+from typing import Optional, Union
 
-from anndata import AnnData
+from anndata import AnnData, read_h5ad
 
 from pyvista import BasePlotter
 
 from .assets import asset_manager
+from .dataset import read_h5ad_backed
 from .server import get_trame_server
 from .ui import (
     ui_layout,
@@ -22,7 +23,7 @@ from .ui import (
 
 def standard_html(
     plotter: BasePlotter,
-    adata: AnnData,
+    adata: Union[AnnData, str],
     actors: list,
     actor_names: list,
     tree: Optional[list] = None,
@@ -32,7 +33,28 @@ def standard_html(
     ui_name: str = "Flysta3D",
     ui_icon=asset_manager.spateo_icon,
     drawer_width: int = 350,
+    scalar_cache_bytes: int = 256 * 1024**2,
+    gene_store=None,
+    scalar_executor: Literal["thread", "process"] = "thread",
+    n_scalar_workers: Optional[int] = None,
+    gene_sets: Optional[dict] = None,
+    slice_key: Optional[str] = "slices",
+    n_neighbors: int = 10,
+    backed: Optional[Literal["r"]] = None,
+    max_fps: float = 30,
+    interactive_quality: int = 50,
+    interactive_ratio: float = 0.5,
+    still_quality: int = 100,
+    still_ratio: float = 1,
 ):
+    # Open the h5ad file, in backed mode X and the layers stay on disk
+    if isinstance(adata, str):
+        if backed is None:
+            adata = read_h5ad(filename=adata)
+        else:
+            adata, backed_store = read_h5ad_backed(filename=adata)
+            gene_store = backed_store if gene_store is None else gene_store
+
     # Get a Server to work with
     server = get_trame_server(name=server_name)
     state, ctrl = server.state, server.controller
@@ -65,13 +87,29 @@ def standard_html(
                 actors=actors,
                 actor_names=actor_names,
                 tree=tree,
+                scalar_cache_bytes=scalar_cache_bytes,
+                gene_store=gene_store,
+                scalar_executor=scalar_executor,
+                n_scalar_workers=n_scalar_workers,
+                gene_sets=gene_sets,
+                slice_key=slice_key,
+                n_neighbors=n_neighbors,
             )
 
         # -----------------------------------------------------------------------------
         # Main Content
         # -----------------------------------------------------------------------------
         with layout.content as con:
-            ui_standard_container(server=server, plotter=plotter, mode=mode)
+            ui_standard_container(
+                server=server,
+                plotter=plotter,
+                mode=mode,
+                max_fps=max_fps,
+                interactive_quality=interactive_quality,
+                interactive_ratio=interactive_ratio,
+                still_quality=still_quality,
+                still_ratio=still_ratio,
+            )
 
         # -----------------------------------------------------------------------------
         # Footer
@@ -0,0 +1,16 @@
+from .backed import BackedStore, read_h5ad_backed
+from .gene_store import (
+    QUANTILES,
+    GeneStore,
+    column_quantiles,
+    read_h5ad_metadata,
+    write_gene_store,
+)
+from .model_loader import (
+    create_executor,
+    read_decimation_levels,
+    read_model,
+    read_models,
+    write_xml_model,
+)
+from .model_store import ModelStore, write_model_store
@@ -0,0 +1,284 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from anndata import AnnData
+from scipy import sparse
+
+from .gene_store import read_elem, read_h5ad_metadata
+
+# -----------------------------------------------------------------------------
+# Disk-backed expression matrices of an ``.h5ad`` file
+# -----------------------------------------------------------------------------
+
+
+def _open_array(filename: str, dataset):
+    """Memory-map an uncompressed contiguous HDF5 dataset, otherwise return the dataset itself."""
+    offset = dataset.id.get_offset()
+    if dataset.chunks is None and dataset.compression is None and offset is not None:
+        return np.memmap(
+            filename, mode="r", dtype=dataset.dtype, shape=dataset.shape, offset=offset
+        )
+    return dataset
+
+
+class BackedStore:
+    """Read single genes of ``X`` and the layers of an ``.h5ad`` file from disk, without loading any matrix."""
+
+    def __init__(
+        self, filename: str, chunk_size: int = 2**22, allow_scans: bool = False
+    ):
+        """
+        Initialize BackedStore.
+
+        Args:
+            filename: The ``.h5ad`` file.
+            chunk_size: The number of nonzeros scanned at once when reading a column of a CSR matrix.
+            allow_scans: Whether to accept matrices whose columns cannot be read on their own, i.e. CSR or compressed
+                         matrices, see ``scanned_layers``. Reading a single gene of these decompresses and scans the
+                         whole matrix, so they are refused unless explicitly allowed.
+
+        Raises:
+            ValueError: If a matrix of the file needs a full scan per gene and ``allow_scans`` is False.
+        """
+        import h5py
+
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.allow_scans = allow_scans
+        self._file = h5py.File(filename, "r")
+        self.obs_names = pd.Index(read_elem(self._file["obs"]).index)
+        self.var_names = pd.Index(read_elem(self._file["var"]).index)
+        self.shape = (len(self.obs_names), len(self.var_names))
+        self.layers = ["X"] + (
+            list(self._file["layers"].keys()) if "layers" in self._file else []
+        )
+        self._matrices = {}
+
+        scanned_layers = self.scanned_layers
+        if len(scanned_layers) > 0 and not allow_scans:
+            self.close()
+            raise ValueError(
+                f"The matrices {scanned_layers} of {filename} are CSR or compressed, so every gene read in backed mode "
+                f"would scan the whole matrix. Write a gene store once with "
+                f"``stviewer.dataset.write_gene_store(anndata.read_h5ad(filename), path)`` and pass "
+                f"``GeneStore(path)`` as ``gene_store``, or pass ``allow_scans=True``."
+            )
+
+    @property
+    def scanned_layers(self) -> list:
+        """The layers whose columns cannot be read on their own: CSR matrices, and compressed or chunked matrices."""
+        scanned_layers = []
+        for layer in self.layers:
+            elem = self._file["X"] if layer == "X" else self._file["layers"][layer]
+            encoding = elem.attrs.get("encoding-type", "array")
+            if encoding == "csr_matrix":
+                scanned_layers.append(layer)
+            elif encoding == "csc_matrix":
+                if elem["indices"].compression or elem["data"].compression:
+                    scanned_layers.append(layer)
+            elif elem.compression or elem.chunks is not None:
+                scanned_layers.append(layer)
+        return scanned_layers
+
+    def __contains__(self, key):
+        return key in self.var_names
+
+    def close(self):
+        self._file.close()
+
+    def _matrix(self, layer: Optional[str] = None):
+        layer = "X" if layer is None else layer
+        if layer not in self._matrices:
+            elem = self._file["X"] if layer == "X" else self._file["layers"][layer]
+            encoding = elem.attrs.get("encoding-type", "array")
+            if encoding in ["csr_matrix", "csc_matrix"]:
+                self._matrices[layer] = (
+                    encoding[:3],
+                    elem["indptr"][()],
+                    _open_array(self.filename, elem["indices"]),
+                    _open_array(self.filename, elem["data"]),
+                )
+            else:
+                self._matrices[layer] = ("dense", _open_array(self.filename, elem))
+        return self._matrices[layer]
+
+    def take_column(
+        self, col: int, layer: Optional[str] = None, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Read a single column of ``X`` or a layer as a dense array.
+
+        CSC and dense matrices only read this column. CSR matrices are scanned in chunks of ``chunk_size`` nonzeros,
+        so memory stays bounded but the whole matrix is read, see ``allow_scans``; prefer a gene store for CSR files.
+
+        Args:
+            col: The column position.
+            layer: The layer. If None, ``X`` is used.
+            rows: Row positions to gather from the column. If None, all rows are returned.
+
+        Returns:
+            The dense column values (of the given rows).
+        """
+        matrix = self._matrix(layer=layer)
+        if matrix[0] == "dense":
+            column = np.asarray(matrix[1][:, col]).ravel()
+        elif matrix[0] == "csc":
+            _, indptr, indices, data = matrix
+            start, end = indptr[col], indptr[col + 1]
+            column = np.zeros(self.shape[0], dtype=data.dtype)
+            column[indices[start:end]] = data[start:end]
+        else:
+            _, indptr, indices, data = matrix
+            column = np.zeros(self.shape[0], dtype=data.dtype)
+            for start in range(0, int(indptr[-1]), self.chunk_size):
+                end = min(start + self.chunk_size, int(indptr[-1]))
+                hits = np.flatnonzero(np.asarray(indices[start:end]) == col)
+                if len(hits) == 0:
+                    continue
+                column[
+                    np.searchsorted(indptr, hits + start, side="right") - 1
+                ] = np.asarray(data[start:end])[hits]
+        return column if rows is None else column[rows]
+
+    def take_row(
+        self, row: int, layer: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read the nonzeros of a single row of ``X`` or a layer. CSR and dense matrices only read this row, CSC matrices
+        are scanned in chunks of ``chunk_size`` nonzeros; the gene store of a CSC file reads the row from its
+        cell-major copy instead, see ``write_gene_store``.
+
+        Args:
+            row: The row position.
+            layer: The layer. If None, ``X`` is used.
+
+        Returns:
+            cols: The column positions of the nonzeros.
+            values: Their values.
+        """
+        matrix = self._matrix(layer=layer)
+        if matrix[0] == "dense":
+            values = np.asarray(matrix[1][row]).ravel()
+            cols = np.flatnonzero(values)
+            return cols, values[cols]
+
+        _, indptr, indices, data = matrix
+        if matrix[0] == "csr":
+            start, end = int(indptr[row]), int(indptr[row + 1])
+            return np.asarray(indices[start:end]), np.asarray(data[start:end])
+
+        hit_cols, hit_data = [], []
+        for start in range(0, int(indptr[-1]), self.chunk_size):
+            end = min(start + self.chunk_size, int(indptr[-1]))
+            hits = np.flatnonzero(np.asarray(indices[start:end]) == row)
+            if len(hits) == 0:
+                continue
+            hit_cols.append(np.searchsorted(indptr, hits + start, side="right") - 1)
+            hit_data.append(np.asarray(data[start:end])[hits])
+        if len(hit_cols) == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=data.dtype)
+        return np.concatenate(hit_cols), np.concatenate(hit_data)
+
+    def take_columns(self, cols: np.ndarray, layer: Optional[str] = None):
+        """
+        Read several columns of ``X`` or a layer at once. CSR matrices are scanned once for all columns, in chunks of
+        ``chunk_size`` nonzeros.
+
+        Args:
+            cols: The unique column positions.
+            layer: The layer. If None, ``X`` is used.
+
+        Returns:
+            A CSC matrix of the columns.
+        """
+        cols = np.asarray(cols, dtype=np.intp)
+        matrix = self._matrix(layer=layer)
+        if matrix[0] != "csr":
+            return sparse.csc_matrix(
+                np.column_stack([self.take_column(col, layer=layer) for col in cols])
+            )
+
+        _, indptr, indices, data = matrix
+        order = np.argsort(cols)
+        sorted_cols = cols[order]
+        hit_rows, hit_cols, hit_data = [], [], []
+        for start in range(0, int(indptr[-1]), self.chunk_size):
+            end = min(start + self.chunk_size, int(indptr[-1]))
+            chunk = np.asarray(indices[start:end])
+            found = np.minimum(
+                np.searchsorted(sorted_cols, chunk), len(sorted_cols) - 1
+            )
+            hits = np.flatnonzero(sorted_cols[found] == chunk)
+            if len(hits) == 0:
+                continue
+            hit_rows.append(np.searchsorted(indptr, hits + start, side="right") - 1)
+            hit_cols.append(order[found[hits]])
+            hit_data.append(np.asarray(data[start:end])[hits])
+        if len(hit_rows) == 0:
+            return sparse.csc_matrix((self.shape[0], len(cols)), dtype=data.dtype)
+        return sparse.csc_matrix(
+            (
+                np.concatenate(hit_data),
+                (np.concatenate(hit_rows), np.concatenate(hit_cols)),
+            ),
+            shape=(self.shape[0], len(cols)),
+        )
+
+    def weighted_column_sums(
+        self, weights: np.ndarray, layer: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Sum every column of ``X`` or a layer weighted per row. Sparse matrices are scanned in chunks of ``chunk_size``
+        nonzeros, dense matrices in chunks of rows of about as many values.
+
+        Args:
+            weights: The ``(n_rows, k)`` weights.
+            layer: The layer. If None, ``X`` is used.
+
+        Returns:
+            The ``(n_cols, k)`` weighted sums.
+        """
+        weights = np.asarray(weights)
+        matrix = self._matrix(layer=layer)
+        sums = np.zeros((self.shape[1], weights.shape[1]))
+        if matrix[0] == "dense":
+            n_rows = max(1, self.chunk_size // max(self.shape[1], 1))
+            for start in range(0, self.shape[0], n_rows):
+                end = min(start + n_rows, self.shape[0])
+                sums += np.asarray(matrix[1][start:end]).T @ weights[start:end]
+            return sums
+
+        encoding, indptr, indices, data = matrix
+        for start in range(0, int(indptr[-1]), self.chunk_size):
+            end = min(start + self.chunk_size, int(indptr[-1]))
+            # The major positions of the nonzeros follow from ``indptr``, the minor ones are their indices
+            major = np.searchsorted(indptr, np.arange(start, end), side="right") - 1
+            minor = np.asarray(indices[start:end])
+            rows, cols = (major, minor) if encoding == "csr" else (minor, major)
+            values = np.asarray(data[start:end])
+            for k in range(weights.shape[1]):
+                sums[:, k] += np.bincount(
+                    cols, weights=values * weights[rows, k], minlength=self.shape[1]
+                )
+        return sums
+
+
+def read_h5ad_backed(
+    filename: str, allow_scans: bool = False
+) -> Tuple[AnnData, BackedStore]:
+    """
+    Open an ``.h5ad`` file in backed mode: ``obs``, ``var`` and ``obsm`` are loaded eagerly, while ``X`` and the layers
+    stay on disk and are read gene by gene.
+
+    Args:
+        filename: The ``.h5ad`` file.
+        allow_scans: Whether to accept CSR or compressed matrices, see ``BackedStore``.
+
+    Returns:
+        adata: An AnnData object whose ``X`` is None.
+        store: The store of ``X`` and the layers, to be passed as ``gene_store``.
+    """
+    return read_h5ad_metadata(filename=filename), BackedStore(
+        filename=filename, allow_scans=allow_scans
+    )
@@ -0,0 +1,303 @@
+import json
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from anndata import AnnData
+from scipy import sparse
+
+try:
+    from anndata.io import read_elem
+except ImportError:
+    from anndata.experimental import read_elem
+
+# -----------------------------------------------------------------------------
+# Gene-major expression store
+#
+# A gene store is a directory holding every expression matrix of an AnnData object in CSC layout, so that the
+# nonzeros of one gene are a contiguous slice on disk:
+#
+#     meta.json                                  {"shape": [n_obs, n_vars], "layers": ["X", ...]}
+#     obs_names.npy, var_names.npy
+#     <layer>/indptr.npy                         int64, n_vars + 1
+#     <layer>/indices.npy, <layer>/data.npy      row positions and values of the nonzeros, gene by gene
+#     <layer>/quantiles.npy                      float32, the ``QUANTILES`` of each gene across all cells
+#     <layer>/row_indptr.npy                     int64, n_obs + 1, the same nonzeros in CSR layout, cell by cell, so
+#     <layer>/row_indices.npy, row_data.npy      that inspecting a cell reads a single slice
+# -----------------------------------------------------------------------------
+
+# Quantile levels precomputed for each gene, enough for the min/max and the robust ranges of the lookup tables
+QUANTILES = (0.0, 0.01, 0.05, 0.95, 0.99, 1.0)
+
+
+def column_quantiles(
+    indptr: np.ndarray, data: np.ndarray, n_rows: int, quantiles=QUANTILES
+) -> np.ndarray:
+    """
+    Compute quantiles of every column of a CSC matrix at once, implicit zeros included, with the linear interpolation
+    of ``np.quantile``.
+
+    Args:
+        indptr: The column pointers of the CSC matrix.
+        data: The nonzeros of the CSC matrix.
+        n_rows: The number of rows of the matrix.
+        quantiles: The quantile levels in [0, 1].
+
+    Returns:
+        The quantiles, one row per level and one column per matrix column.
+    """
+    indptr = np.asarray(indptr, dtype=np.int64)
+    n_cols, nnz = len(indptr) - 1, np.diff(indptr)
+    cols = np.repeat(np.arange(n_cols), nnz)
+    data = np.asarray(data)
+    # Sort the nonzeros within each column; a column then reads negatives, zeros, positives
+    order = np.lexsort((data, cols))
+    values = data[order].astype(np.float64)
+    n_negative = np.bincount(cols, weights=values < 0, minlength=n_cols)
+    n_zeros = n_rows - nnz
+
+    def order_statistic(k: np.ndarray) -> np.ndarray:
+        # The k-th smallest value of each column
+        position = np.where(k < n_negative, k, k - n_zeros)
+        is_zero = (k >= n_negative) & (k < n_negative + n_zeros)
+        if len(values) == 0:
+            return np.zeros(n_cols)
+        index = np.clip(indptr[:-1] + position, 0, len(values) - 1).astype(np.int64)
+        return np.where(is_zero, 0.0, values[index])
+
+    result = np.zeros((len(quantiles), n_cols), dtype=np.float32)
+    for i, q in enumerate(quantiles):
+        h = (n_rows - 1) * q
+        lo, hi = int(np.floor(h)), int(np.ceil(h))
+        v_lo = order_statistic(np.full(n_cols, lo))
+        v_hi = v_lo if hi == lo else order_statistic(np.full(n_cols, hi))
+        result[i] = v_lo + (h - lo) * (v_hi - v_lo)
+    return result
+
+
+def write_gene_store(adata: AnnData, path: str, layers: Optional[list] = None):
+    """
+    Write the expression matrices of an AnnData object into a gene-major store.
+
+    Args:
+        adata: The AnnData object.
+        path: The directory of the gene store.
+        layers: The layers to write. ``'X'`` stands for ``adata.X``. If None, ``adata.X`` and all layers are written.
+
+    Returns:
+        The path of the gene store.
+    """
+    layers = ["X"] + list(adata.layers.keys()) if layers is None else layers
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "obs_names.npy"), np.asarray(adata.obs_names, dtype=str))
+    np.save(os.path.join(path, "var_names.npy"), np.asarray(adata.var_names, dtype=str))
+
+    for layer in layers:
+        matrix = adata.X if layer == "X" else adata.layers[layer]
+        matrix = sparse.csc_matrix(matrix)
+        matrix.sort_indices()
+
+        layer_path = os.path.join(path, layer)
+        os.makedirs(layer_path, exist_ok=True)
+        np.save(os.path.join(layer_path, "indptr.npy"), matrix.indptr.astype(np.int64))
+        np.save(os.path.join(layer_path, "indices.npy"), matrix.indices)
+        np.save(os.path.join(layer_path, "data.npy"), matrix.data)
+        np.save(
+            os.path.join(layer_path, "quantiles.npy"),
+            column_quantiles(matrix.indptr, matrix.data, n_rows=matrix.shape[0]),
+        )
+        matrix = matrix.tocsr()
+        matrix.sort_indices()
+        np.save(
+            os.path.join(layer_path, "row_indptr.npy"), matrix.indptr.astype(np.int64)
+        )
+        np.save(os.path.join(layer_path, "row_indices.npy"), matrix.indices)
+        np.save(os.path.join(layer_path, "row_data.npy"), matrix.data)
+
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(
+            {"shape": list(adata.shape), "layers": layers, "quantiles": QUANTILES}, f
+        )
+    return path
+
+
+def read_h5ad_metadata(filename: str) -> AnnData:
+    """
+    Read an ``.h5ad`` file without any expression matrix, i.e. only ``obs``, ``var`` and ``obsm``.
+
+    Args:
+        filename: The ``.h5ad`` file.
+
+    Returns:
+        An AnnData object whose ``X`` is None.
+    """
+    import h5py
+
+    with h5py.File(filename, "r") as f:
+        obs = read_elem(f["obs"])
+        var = read_elem(f["var"])
+        obsm = read_elem(f["obsm"]) if "obsm" in f else None
+    return AnnData(obs=obs, var=var, obsm=obsm)
+
+
+class GeneStore:
+    """Read single genes from a gene-major store written by ``write_gene_store``."""
+
+    def __init__(self, path: str):
+        """Initialize GeneStore. The nonzeros are memory-mapped, so only the requested genes are read from disk."""
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        self.shape = tuple(meta["shape"])
+        self.layers = list(meta["layers"])
+        self._stored_quantiles = tuple(meta.get("quantiles", ()))
+        self.obs_names = pd.Index(np.load(os.path.join(path, "obs_names.npy")))
+        self.var_names = pd.Index(np.load(os.path.join(path, "var_names.npy")))
+        self._columns = {}
+        self._rows = {}
+        self._quantiles = {}
+
+    def __contains__(self, key):
+        return key in self.var_names
+
+    def _layer(self, layer: Optional[str] = None):
+        layer = "X" if layer is None else layer
+        if layer not in self._columns:
+            layer_path = os.path.join(self.path, layer)
+            self._columns[layer] = (
+                np.load(os.path.join(layer_path, "indptr.npy")),
+                np.load(os.path.join(layer_path, "indices.npy"), mmap_mode="r"),
+                np.load(os.path.join(layer_path, "data.npy"), mmap_mode="r"),
+            )
+        return self._columns[layer]
+
+    def _row_layer(self, layer: Optional[str] = None):
+        layer = "X" if layer is None else layer
+        if layer not in self._rows:
+            layer_path = os.path.join(self.path, layer)
+            filenames = [
+                os.path.join(layer_path, f"row_{name}.npy")
+                for name in ["indptr", "indices", "data"]
+            ]
+            # Stores written before the cell-major copy only have the gene-major one
+            self._rows[layer] = (
+                (
+                    np.load(filenames[0]),
+                    np.load(filenames[1], mmap_mode="r"),
+                    np.load(filenames[2], mmap_mode="r"),
+                )
+                if all(os.path.exists(filename) for filename in filenames)
+                else None
+            )
+        return self._rows[layer]
+
+    def take_column(
+        self, col: int, layer: Optional[str] = None, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Read a single column of a layer as a dense array. Only the nonzeros of this column are read from disk.
+
+        Args:
+            col: The column position.
+            layer: The layer. If None, ``'X'`` is used.
+            rows: Row positions to gather from the column. If None, all rows are returned.
+
+        Returns:
+            The dense column values (of the given rows).
+        """
+        indptr, indices, data = self._layer(layer=layer)
+        start, end = indptr[col], indptr[col + 1]
+        column = np.zeros(self.shape[0], dtype=data.dtype)
+        column[indices[start:end]] = data[start:end]
+        return column if rows is None else column[rows]
+
+    def take_columns(self, cols: np.ndarray, layer: Optional[str] = None):
+        """
+        Read several columns of a layer at once. Only the nonzeros of these columns are read from disk.
+
+        Args:
+            cols: The column positions.
+            layer: The layer. If None, ``'X'`` is used.
+
+        Returns:
+            A CSC matrix of the columns.
+        """
+        indptr, indices, data = self._layer(layer=layer)
+        cols = np.asarray(cols, dtype=np.intp)
+        starts, lengths = indptr[cols], indptr[cols + 1] - indptr[cols]
+        col_indptr = np.concatenate([[0], np.cumsum(lengths)])
+        # Positions of the nonzeros of the columns, one contiguous run per column
+        positions = np.repeat(starts - col_indptr[:-1], lengths) + np.arange(
+            col_indptr[-1]
+        )
+        return sparse.csc_matrix(
+            (data[positions], indices[positions], col_indptr),
+            shape=(self.shape[0], len(cols)),
+        )
+
+    def take_row(
+        self, row: int, layer: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read the nonzeros of a single row of a layer. Only the nonzeros of this row are read from its cell-major copy;
+        stores written without it scan the row indices of all nonzeros at once.
+
+        Args:
+            row: The row position.
+            layer: The layer. If None, ``'X'`` is used.
+
+        Returns:
+            cols: The column positions of the nonzeros.
+            values: Their values.
+        """
+        rows = self._row_layer(layer=layer)
+        if rows is not None:
+            indptr, indices, data = rows
+            start, end = int(indptr[row]), int(indptr[row + 1])
+            return np.asarray(indices[start:end]), np.asarray(data[start:end])
+
+        indptr, indices, data = self._layer(layer=layer)
+        hits = np.flatnonzero(indices == row)
+        return np.searchsorted(indptr, hits, side="right") - 1, data[hits]
+
+    def weighted_column_sums(
+        self, weights: np.ndarray, layer: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Sum every column of a layer weighted per row, as a single sparse matrix product over the mapped nonzeros.
+
+        Args:
+            weights: The ``(n_rows, k)`` weights.
+            layer: The layer. If None, ``'X'`` is used.
+
+        Returns:
+            The ``(n_cols, k)`` weighted sums.
+        """
+        indptr, indices, data = self._layer(layer=layer)
+        matrix = sparse.csc_matrix(
+            (data, indices, indptr), shape=self.shape, copy=False
+        )
+        return np.asarray(matrix.T @ weights)
+
+    def quantiles(self, layer: Optional[str] = None) -> np.ndarray:
+        """
+        Get the ``QUANTILES`` of every gene of a layer across all cells. Stores written without them compute them once.
+
+        Args:
+            layer: The layer. If None, ``'X'`` is used.
+
+        Returns:
+            The quantiles, one row per level of ``QUANTILES`` and one column per gene.
+        """
+        layer = "X" if layer is None else layer
+        if layer not in self._quantiles:
+            filename = os.path.join(self.path, layer, "quantiles.npy")
+            if self._stored_quantiles == QUANTILES and os.path.exists(filename):
+                self._quantiles[layer] = np.load(filename)
+            else:
+                indptr, _, data = self._layer(layer=layer)
+                self._quantiles[layer] = column_quantiles(
+                    indptr, data, n_rows=self.shape[0]
+                )
+        return self._quantiles[layer]
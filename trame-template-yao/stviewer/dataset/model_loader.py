@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Union
+
+import pyvista as pv
+from pyvista import DataSet
+
+try:
+    from typing import Literal
+except ImportError:
+    from typing_extensions import Literal
+
+# -----------------------------------------------------------------------------
+# Binary model cache
+# -----------------------------------------------------------------------------
+
+_XML_EXTENSIONS = {
+    "vtkPolyData": ".vtp",
+    "vtkUnstructuredGrid": ".vtu",
+    "vtkImageData": ".vti",
+    "vtkStructuredGrid": ".vts",
+    "vtkRectilinearGrid": ".vtr",
+}
+
+
+def _file_signature(filename: str, check_hash: bool = False) -> dict:
+    """The mtime and size of a file, plus its sha1 if ``check_hash``."""
+    stat = os.stat(filename)
+    signature = {"mtime": stat.st_mtime, "size": stat.st_size}
+    if check_hash:
+        sha1 = hashlib.sha1()
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(2**20), b""):
+                sha1.update(block)
+        signature["sha1"] = sha1.hexdigest()
+    return signature
+
+
+def _replace_file(filename: str, write, suffix: str = ""):
+    """Write a file through ``write(temp_filename)`` into a temporary file unique to this process, then move it."""
+    directory = os.path.dirname(os.path.abspath(filename))
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=suffix, delete=False) as f:
+        temp_filename = f.name
+    try:
+        write(temp_filename)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        raise
+
+
+def _write_json(data: dict, filename: str):
+    with open(filename, "w") as f:
+        json.dump(data, f)
+
+
+def write_xml_model(model: DataSet, filename: str):
+    """
+    Write a model as a VTK XML file with raw appended data, which is read back without any parsing or decompression.
+
+    Args:
+        model: The model.
+        filename: The output file, whose extension must match the model type (e.g. ``.vtp`` for PolyData).
+    """
+    from vtkmodules.vtkIOXML import vtkXMLDataSetWriter
+
+    writer = vtkXMLDataSetWriter()
+    writer.SetInputData(model)
+    writer.SetFileName(filename)
+    writer.SetDataModeToAppended()
+    writer.EncodeAppendedDataOff()
+    writer.SetCompressorTypeToNone()
+    if not writer.Write():
+        raise OSError(f"Failed to write the model to {filename}.")
+
+
+def read_model(
+    filename: str, cache_dir: Optional[str] = None, check_hash: bool = False
+) -> DataSet:
+    """
+    Read a model, through a binary cache if ``cache_dir`` is given.
+
+    The first read converts the model (e.g. a legacy ASCII/binary ``.vtk`` file) into a raw VTK XML file in
+    ``cache_dir``. Later reads load the cached file as long as the mtime and size (and sha1 if ``check_hash``) of the
+    source file are unchanged.
+
+    Args:
+        filename: The model file.
+        cache_dir: The directory of the binary cache. If None, the model is read without any cache.
+        check_hash: Whether to also compare the sha1 of the source file to invalidate the cache.
+
+    Returns:
+        The model.
+    """
+    if cache_dir is None:
+        return pv.read(filename)
+
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    manifest_file = os.path.join(cache_dir, f"{stem}.json")
+    signature = _file_signature(filename, check_hash=check_hash)
+    if os.path.exists(manifest_file):
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+        cached_file = os.path.join(cache_dir, manifest["cache"])
+        if manifest["signature"] == signature and os.path.exists(cached_file):
+            return pv.read(cached_file)
+
+    model = pv.read(filename)
+    extension = _XML_EXTENSIONS.get(model.GetClassName())
+    if extension is None:
+        return model
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        cached_file = os.path.join(cache_dir, f"{stem}{extension}")
+        # Concurrent readers of the same model never see a partially written file
+        _replace_file(
+            cached_file, lambda f: write_xml_model(model, f), suffix=extension
+        )
+        _replace_file(
+            manifest_file,
+            lambda f: _write_json(
+                {"cache": os.path.basename(cached_file), "signature": signature}, f
+            ),
+            suffix=".json",
+        )
+    except OSError:
+        # A read-only data directory only disables the cache.
+        pass
+    return model
+
+
+def read_decimation_levels(
+    filename: str,
+    model: Optional[DataSet] = None,
+    reductions: tuple = (0.5, 0.8, 0.95),
+) -> list:
+    """
+    Read the quadric decimation levels of a mesh model, computing them once and caching them next to the source file
+    (e.g. ``<stem>_decimated_80.vtp``). A cached level is recomputed when the source file is newer. Each level is
+    decimated from the previous one, so the coarse levels cost a fraction of the full mesh.
+
+    Args:
+        filename: The mesh model file.
+        model: The mesh model read from ``filename``. If None, it is read when a level must be computed.
+        reductions: The target reductions of the triangle count of the full mesh, from finest to coarsest.
+
+    Returns:
+        The decimated meshes, from finest to coarsest.
+    """
+    stem, _ = os.path.splitext(filename)
+    source_mtime = os.path.getmtime(filename)
+    levels, previous, previous_reduction = [], None, 0.0
+    for reduction in reductions:
+        level_file = f"{stem}_decimated_{int(round(reduction * 100))}.vtp"
+        if os.path.exists(level_file) and os.path.getmtime(level_file) >= source_mtime:
+            level = pv.read(level_file)
+        else:
+            if previous is None:
+                model = pv.read(filename) if model is None else model
+                previous = model.extract_surface().triangulate()
+            # Each level decimates the previous, finer one: the reduction left to reach the target of the full mesh
+            level = previous.decimate(
+                1 - (1 - reduction) / (1 - previous_reduction),
+                volume_preservation=True,
+            ).compute_normals(cell_normals=False, split_vertices=False)
+            try:
+                _replace_file(
+                    level_file, lambda f: write_xml_model(level, f), suffix=".vtp"
+                )
+            except OSError:
+                # A read-only data directory only disables the cache.
+                pass
+        levels.append(level)
+        previous, previous_reduction = level, reduction
+    return levels
+
+
+# -----------------------------------------------------------------------------
+# Concurrent loading
+# -----------------------------------------------------------------------------
+
+
+def create_executor(
+    executor: Literal["thread", "process"] = "thread", n_workers: Optional[int] = None
+) -> Executor:
+    """
+    Create a pool to load models concurrently.
+
+    Args:
+        executor: Either ``'thread'`` or ``'process'``. Processes parse ASCII files in parallel regardless of the GIL,
+                  but the models are pickled back to the main process.
+        n_workers: The number of workers. If None, the default of ``concurrent.futures`` is used.
+
+    Returns:
+        The executor.
+    """
+    if executor == "process":
+        return ProcessPoolExecutor(max_workers=n_workers)
+    return ThreadPoolExecutor(max_workers=n_workers)
+
+
+def read_models(
+    filenames: list,
+    cache_dir: Optional[str] = None,
+    check_hash: bool = False,
+    executor: Union[Literal["thread", "process"], Executor] = "thread",
+    n_workers: Optional[int] = None,
+) -> list:
+    """
+    Read several models concurrently, through a binary cache if ``cache_dir`` is given.
+
+    Args:
+        filenames: The model files.
+        cache_dir: The directory of the binary cache, see ``read_model``.
+        check_hash: Whether to also compare the sha1 of the source files to invalidate the cache.
+        executor: An executor, or the kind of pool to create, see ``create_executor``.
+        n_workers: The number of workers of the created pool.
+
+    Returns:
+        The models, in the order of ``filenames``.
+    """
+    pool = (
+        executor
+        if isinstance(executor, Executor)
+        else create_executor(executor=executor, n_workers=n_workers)
+    )
+    try:
+        futures = [
+            pool.submit(read_model, filename, cache_dir, check_hash)
+            for filename in filenames
+        ]
+        return [future.result() for future in futures]
+    finally:
+        if pool is not executor:
+            pool.shutdown()
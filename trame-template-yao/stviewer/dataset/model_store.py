@@ -0,0 +1,153 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonDataModel import vtkCellArray
+
+import pyvista as pv
+from pyvista import PolyData
+
+# -----------------------------------------------------------------------------
+# Memory-mapped model store
+#
+# A model store is a directory holding the arrays of PolyData models as ``.npy`` files, which every process maps
+# read-only (copy-on-write), so that the pages of the models are shared by all processes reading the same store:
+#
+#     meta.json                                  {"models": {name: {"cells": [...], "point_data": {...}}}}
+#     <name>/points.npy
+#     <name>/<cells>_offsets.npy                 int64 offsets and connectivity of verts, lines, polys and strips
+#     <name>/<cells>_connectivity.npy
+#     <name>/point_data/<array>.npy
+#
+# String point arrays are stored as category codes, restored to strings when read, and ``obs_index`` as row positions
+# in ``obs_names``.
+# -----------------------------------------------------------------------------
+
+_CELL_TYPES = ["verts", "lines", "polys", "strips"]
+
+
+def _category_codes(values: np.ndarray):
+    """The smallest unsigned codes of a string array and its categories."""
+    categories, codes = np.unique(values, return_inverse=True)
+    dtype = np.uint8 if len(categories) <= 2**8 else np.uint16
+    dtype = dtype if len(categories) <= 2**16 else np.uint32
+    return codes.astype(dtype), categories.tolist()
+
+
+def write_model_store(
+    models: dict, path: str, obs_names: Optional[pd.Index] = None
+) -> str:
+    """
+    Write PolyData models into a memory-mapped model store.
+
+    Args:
+        models: The models by name.
+        path: The directory of the model store.
+        obs_names: The ``obs_names`` of the AnnData object. If given, the ``obs_index`` point array of each model is
+                   stored as row positions in ``obs_names``, which ``stviewer.pv_pipeline.ScalarResolver`` uses as is.
+
+    Returns:
+        The path of the model store.
+    """
+    meta = {"models": {}}
+    for name, model in models.items():
+        model_path = os.path.join(path, name)
+        os.makedirs(os.path.join(model_path, "point_data"), exist_ok=True)
+        np.save(os.path.join(model_path, "points.npy"), np.asarray(model.points))
+
+        cells = []
+        for cell_type in _CELL_TYPES:
+            cell_array = getattr(model, f"Get{cell_type.capitalize()}")()
+            if cell_array.GetNumberOfCells() == 0:
+                continue
+            for part, vtk_array in [
+                ("offsets", cell_array.GetOffsetsArray()),
+                ("connectivity", cell_array.GetConnectivityArray()),
+            ]:
+                np.save(
+                    os.path.join(model_path, f"{cell_type}_{part}.npy"),
+                    numpy_support.vtk_to_numpy(vtk_array).astype(np.int64),
+                )
+            cells.append(cell_type)
+
+        point_data = {}
+        for key in model.point_data.keys():
+            array, categories = np.asarray(model.point_data[key]), None
+            if key == "obs_index" and obs_names is not None:
+                array = obs_names.get_indexer(array.astype(str)).astype(np.int64)
+                if np.any(array < 0):
+                    raise KeyError(
+                        f"{int(np.sum(array < 0))} values of ``obs_index`` of {name} are not in ``obs_names``."
+                    )
+            elif array.dtype.kind in "OUS":
+                array, categories = _category_codes(array.astype(str))
+            np.save(os.path.join(model_path, "point_data", f"{key}.npy"), array)
+            point_data[key] = {"categories": categories}
+
+        meta["models"][name] = {"cells": cells, "point_data": point_data}
+
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return path
+
+
+class ModelStore:
+    """Read models from a model store written by ``write_model_store`` without copying their arrays."""
+
+    def __init__(self, path: str):
+        """Initialize ModelStore."""
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self._meta = json.load(f)["models"]
+
+    @property
+    def names(self) -> list:
+        return list(self._meta.keys())
+
+    def __contains__(self, name):
+        return name in self._meta
+
+    def categories(self, name: str, key: str) -> Optional[list]:
+        """The categories of a string point array stored as codes, None for other arrays."""
+        return self._meta[name]["point_data"][key]["categories"]
+
+    def _load(self, name: str, filename: str) -> np.ndarray:
+        # Copy-on-write mapping: pages are shared between processes unless written to.
+        return np.load(os.path.join(self.path, name, filename), mmap_mode="c")
+
+    def read(self, name: str) -> PolyData:
+        """
+        Read a model. Its points, cells and numeric point arrays are views of the mapped files; string point arrays
+        are restored from their codes, see ``categories``.
+
+        Args:
+            name: The name of the model.
+
+        Returns:
+            The model.
+        """
+        meta = self._meta[name]
+        model = pv.PolyData()
+        model.points = self._load(name, "points.npy")
+        for cell_type in meta["cells"]:
+            cell_array = vtkCellArray()
+            cell_array.SetData(
+                numpy_support.numpy_to_vtkIdTypeArray(
+                    self._load(name, f"{cell_type}_offsets.npy"), deep=False
+                ),
+                numpy_support.numpy_to_vtkIdTypeArray(
+                    self._load(name, f"{cell_type}_connectivity.npy"), deep=False
+                ),
+            )
+            getattr(model, f"Set{cell_type.capitalize()}")(cell_array)
+        for key, array_meta in meta["point_data"].items():
+            array = self._load(name, os.path.join("point_data", f"{key}.npy"))
+            if array_meta["categories"] is not None:
+                array = np.asarray(array_meta["categories"])[array]
+            model.point_data[key] = array
+        if "Normals" in meta["point_data"]:
+            model.GetPointData().SetActiveNormals("Normals")
+        return model
@@ -1,10 +1,26 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 import anndata as ad
 
-import pyvista as pv
-
-from .pv_pipeline import add_single_model, create_plotter
+from .dataset import (
+    BackedStore,
+    GeneStore,
+    ModelStore,
+    create_executor,
+    read_decimation_levels,
+    read_h5ad_metadata,
+    read_model,
+    read_models,
+)
+from .pv_pipeline import (
+    ActorDisplay,
+    add_lazy_model,
+    add_single_model,
+    create_plotter,
+    get_display,
+)
 from .ui import standard_tree
 
 try:
@@ -17,34 +33,90 @@ from typing import Optional
 from .app import standard_html
 
 
+E7_9h_DIR_PATH = "/home/yao/PythonProject/Yao_packages/trame-template/trame-template-yao/data/drosophila-E7-9h-models"
+
+
+def drosophila_E7_9h_gene_store(dir_path=E7_9h_DIR_PATH) -> Optional[GeneStore]:
+    # Gene-major store written by ``data/data_process.py``
+    store_path = os.path.join(dir_path, "E7-9h_cellbin_genes")
+    return GeneStore(store_path) if os.path.isdir(store_path) else None
+
+
+def drosophila_E7_9h_model_store(dir_path=E7_9h_DIR_PATH) -> Optional[ModelStore]:
+    # Memory-mapped models written by ``stviewer.launcher.write_shared_dataset``
+    store_path = os.path.join(dir_path, "E7-9h_cellbin_models")
+    return ModelStore(store_path) if os.path.isdir(store_path) else None
+
+
+def model_store_name(filename: str) -> str:
+    # Models are stored under the name of their file, without extension
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+E7_9h_PC_MODEL_FILES = [
+    "E7-9h_embryo_aligned_pc_model.vtk",
+    "E7-9h_aligned_pc_model_CNS.vtk",
+    "E7-9h_aligned_pc_model_midgut.vtk",
+]
+E7_9h_MESH_MODEL_FILES = [
+    "E7-9h_embryo_aligned_mesh_model.vtk",
+    "E7-9h_aligned_mesh_model_CNS.vtk",
+    "E7-9h_aligned_mesh_model_midgut.vtk",
+]
+
+
 def drosophila_E7_9h_dataset(
-    dir_path="/home/yao/PythonProject/Yao_packages/trame-template/trame-template-yao/data/drosophila-E7-9h-models",
+    dir_path=E7_9h_DIR_PATH,
+    load_X: bool = True,
+    cache: bool = True,
+    executor: Literal["thread", "process"] = "thread",
+    n_workers: Optional[int] = None,
+    lazy: bool = False,
+    model_store: Optional[ModelStore] = None,
 ):
-    # Generate anndata object
-    adata = ad.read_h5ad(filename=os.path.join(dir_path, "E7-9h_cellbin.h5ad"))
-
-    # Generate point cloud models
-    pc_model_files = [
-        "E7-9h_embryo_aligned_pc_model.vtk",
-        "E7-9h_aligned_pc_model_CNS.vtk",
-        "E7-9h_aligned_pc_model_midgut.vtk",
-    ]
-    pc_models = [pv.read(filename=os.path.join(dir_path, f)) for f in pc_model_files]
+    # The anndata object and the models are read concurrently.
+    # Models are converted once into a binary cache in ``<dir_path>/.stviewer_cache``, later reads load the cache.
+    # If ``lazy``, models are not read and their loaders are returned instead, see ``drosophila_plotter``.
+    # Models found in ``model_store`` are memory-mapped instead of read, sharing their pages between processes.
+    # Both pools are shut down whatever happens, e.g. a missing model file.
+    with ThreadPoolExecutor(max_workers=1) as adata_pool:
+        # Generate anndata object
+        # Without ``X`` only obs, var and obsm are read; genes are then read from the gene store.
+        adata_file = os.path.join(dir_path, "E7-9h_cellbin.h5ad")
+        adata_future = adata_pool.submit(
+            ad.read_h5ad if load_X else read_h5ad_metadata, filename=adata_file
+        )
+
+        # Generate point cloud models and mesh models
+        filenames = [
+            os.path.join(dir_path, f)
+            for f in E7_9h_PC_MODEL_FILES + E7_9h_MESH_MODEL_FILES
+        ]
+        cache_dir = os.path.join(dir_path, ".stviewer_cache") if cache else None
+        loaders = [
+            partial(model_store.read, model_store_name(f))
+            if model_store is not None and model_store_name(f) in model_store
+            else partial(read_model, f, cache_dir=cache_dir)
+            for f in filenames
+        ]
+        if lazy:
+            models = loaders
+        elif model_store is not None:
+            models = [loader() for loader in loaders]
+        else:
+            with create_executor(executor=executor, n_workers=n_workers) as models_pool:
+                models = read_models(
+                    filenames=filenames, cache_dir=cache_dir, executor=models_pool
+                )
+        adata = adata_future.result()
+
+    pc_models = models[: len(E7_9h_PC_MODEL_FILES)]
     pc_models_names = [
         "PC_Embryo",
         "PC_CNS",
         "PC_Midgut",
     ]  # Cannot contain `-` and ` `.
-
-    # Generate mesh models
-    mesh_model_files = [
-        "E7-9h_embryo_aligned_mesh_model.vtk",
-        "E7-9h_aligned_mesh_model_CNS.vtk",
-        "E7-9h_aligned_mesh_model_midgut.vtk",
-    ]
-    mesh_models = [
-        pv.read(filename=os.path.join(dir_path, f)) for f in mesh_model_files
-    ]
+    mesh_models = models[len(E7_9h_PC_MODEL_FILES) :]
     mesh_models_names = [
         "Mesh_Embryo",
         "Mesh_CNS",
@@ -60,8 +132,13 @@ def drosophila_plotter(
     mesh_models_cmaps: list,
     pc_added_kwargs: Optional[dict] = None,
     mesh_added_kwargs: Optional[dict] = None,
-    **kwargs
+    pc_max_interactive_points: Optional[int] = 100000,
+    mesh_models_levels: Optional[list] = None,
+    **kwargs,
 ):
+    # Models given as loaders (functions without argument) become lazy actors, only read once shown in the tree.
+    # Mesh levels given as functions are computed from the loaded mesh by ``levels(model=mesh)``.
+
     # Generate a new plotter
     plotter = create_plotter(**kwargs)
 
@@ -78,8 +155,20 @@ def drosophila_plotter(
     if not (pc_added_kwargs is None):
         pc_kwargs.update(pc_added_kwargs)
     pc_actors = [
-        add_single_model(plotter=plotter, model=pc, **pc_kwargs) for pc in pc_models
+        add_lazy_model(plotter=plotter, loader=pc, **pc_kwargs)
+        if callable(pc)
+        else add_single_model(plotter=plotter, model=pc, **pc_kwargs)
+        for pc in pc_models
     ]
+    # Subsampled levels of detail shown while the camera is interacting
+    if pc_max_interactive_points is not None:
+        for pc_actor in pc_actors:
+            get_display(pc_actor).on_load(
+                partial(
+                    ActorDisplay.build_point_levels,
+                    max_interactive_points=pc_max_interactive_points,
+                )
+            )
 
     # Generate actors for mesh models
     mesh_kwargs = dict(
@@ -93,12 +182,48 @@ def drosophila_plotter(
     if not (mesh_added_kwargs is None):
         mesh_kwargs.update(mesh_added_kwargs)
     mesh_actors = [
-        add_single_model(plotter=plotter, model=mesh, **mesh_kwargs)
+        add_lazy_model(plotter=plotter, loader=mesh, **mesh_kwargs)
+        if callable(mesh)
+        else add_single_model(plotter=plotter, model=mesh, **mesh_kwargs)
         for mesh in mesh_models
     ]
+    # Decimated levels of detail picked from the viewport size and the interaction state
+    if mesh_models_levels is not None:
+        for mesh_actor, mesh_levels in zip(mesh_actors, mesh_models_levels):
+            get_display(mesh_actor).on_load(
+                partial(
+                    _set_mesh_levels,
+                    levels=mesh_levels,
+                    window_size=plotter.window_size,
+                )
+            )
     return plotter, pc_actors, mesh_actors
 
 
+def drosophila_E7_9h_mesh_levels(
+    filename: str, model_store: Optional[ModelStore] = None
+):
+    # Decimated levels of a mesh, from the model store if available, else from the files next to the mesh
+    prefix = f"{model_store_name(filename)}_decimated_"
+    names = (
+        []
+        if model_store is None
+        else [n for n in model_store.names if n.startswith(prefix)]
+    )
+    if len(names) == 0:
+        return partial(read_decimation_levels, filename=filename)
+
+    names = sorted(names, key=lambda n: int(n[len(prefix) :]))
+    return lambda model: [model_store.read(n) for n in names]
+
+
+def _set_mesh_levels(mesh_display: ActorDisplay, levels, window_size):
+    if callable(levels):
+        levels = levels(model=mesh_display.model)
+    mesh_display.set_mesh_levels(levels=levels)
+    mesh_display.set_viewport_size(window_size=window_size)
+
+
 def drosophila_tree(pc_actors, pc_actor_names, mesh_actors, mesh_actor_names):
     pc_actors, pc_actor_names, pc_tree = standard_tree(
         actors=pc_actors, actor_names=pc_actor_names, base_id=0
@@ -114,16 +239,40 @@ def drosophila_tree(pc_actors, pc_actor_names, mesh_actors, mesh_actor_names):
     return totel_actors, totel_actor_names, totel_tree
 
 
-def flysta3d_html(ui_name: str = "Flysta3D", **kwargs):
+def flysta3d_html(
+    ui_name: str = "Flysta3D",
+    dir_path=E7_9h_DIR_PATH,
+    backed: Optional[Literal["r"]] = None,
+    lazy: bool = True,
+    **kwargs,
+):
 
     # PyVista Pipeline
+    # Genes are read from the gene store if available, else from disk in backed mode, else from memory.
+    gene_store = drosophila_E7_9h_gene_store(dir_path=dir_path)
+    model_store = drosophila_E7_9h_model_store(dir_path=dir_path)
+    if gene_store is None and backed is not None:
+        gene_store = BackedStore(filename=os.path.join(dir_path, "E7-9h_cellbin.h5ad"))
     (
         adata,
         pc_models,
         pc_models_names,
         mesh_models,
         mesh_models_names,
-    ) = drosophila_E7_9h_dataset()
+    ) = drosophila_E7_9h_dataset(
+        dir_path=dir_path,
+        load_X=gene_store is None,
+        lazy=lazy,
+        model_store=model_store,
+    )
+
+    # With ``lazy``, a model is only read from disk the first time it is shown in the pipeline tree
+    mesh_models_levels = [
+        drosophila_E7_9h_mesh_levels(
+            filename=os.path.join(dir_path, f), model_store=model_store
+        )
+        for f in E7_9h_MESH_MODEL_FILES
+    ]
 
     pc_models_cmaps = []
     mesh_models_cmaps = []
@@ -132,6 +281,7 @@ def flysta3d_html(ui_name: str = "Flysta3D", **kwargs):
         pc_models_cmaps=pc_models_cmaps,
         mesh_models=mesh_models,
         mesh_models_cmaps=mesh_models_cmaps,
+        mesh_models_levels=mesh_models_levels,
     )
     actors, actor_names, tree = drosophila_tree(
         pc_actors=pc_actors,
@@ -148,6 +298,7 @@ def flysta3d_html(ui_name: str = "Flysta3D", **kwargs):
         actor_names=actor_names,
         tree=tree,
         ui_name=ui_name,
-        **kwargs
+        gene_store=gene_store,
+        **kwargs,
     )
     return server
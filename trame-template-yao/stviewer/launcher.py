@@ -0,0 +1,135 @@
+import os
+from multiprocessing import get_context
+from typing import Optional
+
+import anndata as ad
+
+from .dataset import (
+    read_decimation_levels,
+    read_models,
+    write_gene_store,
+    write_model_store,
+)
+from .flysta3d import (
+    E7_9h_DIR_PATH,
+    E7_9h_MESH_MODEL_FILES,
+    E7_9h_PC_MODEL_FILES,
+    drosophila_E7_9h_gene_store,
+    drosophila_E7_9h_model_store,
+    flysta3d_html,
+    model_store_name,
+)
+
+# -----------------------------------------------------------------------------
+# Shared read-only dataset
+# -----------------------------------------------------------------------------
+
+
+def write_shared_dataset(
+    dir_path: str = E7_9h_DIR_PATH,
+    reductions: tuple = (0.5, 0.8, 0.95),
+    overwrite: bool = False,
+) -> str:
+    """
+    Convert the E7-9h dataset once into memory-mapped stores, read by every session without copying:
+
+        * ``E7-9h_cellbin_genes``: the gene store of the expression matrices, see ``stviewer.dataset.GeneStore``.
+        * ``E7-9h_cellbin_models``: the model store of the models and the decimated levels of the meshes, see
+          ``stviewer.dataset.ModelStore``.
+
+    Args:
+        dir_path: The directory of the dataset.
+        reductions: The decimation ratios of the mesh levels.
+        overwrite: Whether to write the stores again if they exist.
+
+    Returns:
+        The directory of the dataset.
+    """
+    gene_store = drosophila_E7_9h_gene_store(dir_path=dir_path)
+    if gene_store is None or overwrite:
+        adata = ad.read_h5ad(os.path.join(dir_path, "E7-9h_cellbin.h5ad"))
+        write_gene_store(adata, path=os.path.join(dir_path, "E7-9h_cellbin_genes"))
+        obs_names = adata.obs_names
+        del adata
+    else:
+        obs_names = gene_store.obs_names
+
+    if drosophila_E7_9h_model_store(dir_path=dir_path) is None or overwrite:
+        # Missing model files are skipped, sessions read them from disk (and fail) only if they are shown.
+        filenames = [
+            os.path.join(dir_path, f)
+            for f in E7_9h_PC_MODEL_FILES + E7_9h_MESH_MODEL_FILES
+            if os.path.exists(os.path.join(dir_path, f))
+        ]
+        models = dict(
+            zip([model_store_name(f) for f in filenames], read_models(filenames))
+        )
+        for f in E7_9h_MESH_MODEL_FILES:
+            name = model_store_name(f)
+            if name not in models:
+                continue
+            levels = read_decimation_levels(
+                filename=os.path.join(dir_path, f),
+                model=models[name],
+                reductions=reductions,
+            )
+            for reduction, level in zip(reductions, levels):
+                models[f"{name}_decimated_{int(round(reduction * 100))}"] = level
+        write_model_store(
+            models,
+            path=os.path.join(dir_path, "E7-9h_cellbin_models"),
+            obs_names=obs_names,
+        )
+    return dir_path
+
+
+# -----------------------------------------------------------------------------
+# Multi-session launcher
+# -----------------------------------------------------------------------------
+
+
+def _serve_session(port: int, host: Optional[str], dir_path: str, kwargs: dict):
+    server = flysta3d_html(dir_path=dir_path, server_name=f"flysta3d_{port}", **kwargs)
+    server.start(port=port, host=host, open_browser=False)
+
+
+def launch_sessions(
+    n_sessions: int = 4,
+    port: int = 8080,
+    dir_path: str = E7_9h_DIR_PATH,
+    host: Optional[str] = None,
+    **kwargs,
+) -> list:
+    """
+    Serve the Flysta3D app to several users, one process per session on consecutive ports.
+
+    A trame server shares its state with every client connected to it, so each session is a whole process: an
+    interpreter with VTK and trame, a plotter, actors and their client payloads, the obs/var metadata and a trame
+    state. An extra session therefore costs tens to hundreds of MB, not kilobytes; see the ``sessions`` results of
+    ``benchmarks/run_benchmarks.py`` for the measured memory per session. Only the dataset itself is shared: it is
+    converted once into memory-mapped stores (see ``write_shared_dataset``), whose points, cells and expression
+    columns are mapped by all sessions through the page cache instead of being copied into each process.
+
+    Args:
+        n_sessions: The number of sessions.
+        port: The port of the first session, the i-th session listens on ``port + i``.
+        dir_path: The directory of the dataset.
+        host: The host the sessions listen on. If None, the trame default is used.
+        kwargs: Additional parameters that will be passed to ``stviewer.flysta3d_html`` function.
+
+    Returns:
+        The started session processes.
+    """
+    write_shared_dataset(dir_path=dir_path)
+
+    context = get_context("spawn")
+    processes = []
+    for i in range(n_sessions):
+        process = context.Process(
+            target=_serve_session,
+            args=(port + i, host, dir_path, kwargs),
+            name=f"flysta3d_{port + i}",
+        )
+        process.start()
+        processes.append(process)
+    return processes
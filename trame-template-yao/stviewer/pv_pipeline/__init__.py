@@ -1,2 +1,42 @@
-from .pv_callback import PVCB, Viewer
-from .pv_plotter import add_single_model, create_plotter
+from .pv_callback import PVCB, Viewer, get_card, get_viewer
+from .pv_display import (
+    ActorDisplay,
+    clipping_bounds,
+    compact_array,
+    get_display,
+    pick_point,
+    select_points,
+    set_clipping,
+    set_interacting,
+    set_local_rendering,
+    update_visibility,
+)
+from .pv_filter import SortedIndex, vertex_cells
+from .pv_picking import (
+    camera_matrix,
+    display_ray,
+    pick_nearest,
+    pick_ray,
+    project_points,
+    select_frustum,
+    select_projected,
+)
+from .pv_plotter import add_lazy_model, add_single_model, create_plotter
+from .pv_scalars import (
+    CLIPS,
+    SCORES,
+    ScalarCache,
+    ScalarResolver,
+    category_codes,
+    clip_range,
+    knn_graph,
+    matrix_quantiles,
+    module_score,
+    rank_genes,
+    take_column,
+    take_columns,
+    take_row,
+    weighted_column_sums,
+)
+from .pv_render import RenderScheduler
+from .pv_timing import RingBuffer, Timings, get_timings, timed
@@ -1,17 +1,48 @@
+import asyncio
+import functools
 import io
+import json
+import threading
+import time
+import traceback
+import weakref
+from typing import Optional
 
 import numpy as np
 
 import pyvista as pv
 
+from .pv_display import (
+    clipping_bounds,
+    get_display,
+    pick_point,
+    select_points,
+    set_clipping,
+    set_interacting,
+    set_local_rendering,
+)
+from .pv_filter import SortedIndex
+from .pv_scalars import (
+    ScalarCache,
+    ScalarResolver,
+    as_scalars,
+    clip_range,
+    knn_graph,
+)
+from .pv_timing import get_timings, timed
+
 # -----------------------------------------------------------------------------
 # Common Callback-ToolBar&Container
 # -----------------------------------------------------------------------------
 
 
 def vuwrap(func):
-    """Call view_update in trame to synchronize changes to a view."""
+    """
+    Call view_update in trame to synchronize changes to a view. The wrapped method should not call it again; in any
+    case the render scheduler of the container coalesces the requests of a frame into a single render.
+    """
 
+    @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
         ret = func(self, *args, **kwargs)
         self._ctrl.view_update()
@@ -41,18 +72,77 @@ class Viewer:
         self.AXIS = f"{plotter._id_name}_axis_visiblity"
         self.SCREENSHOT = f"{plotter._id_name}_download_screenshot"
         self.SERVER_RENDERING = f"{plotter._id_name}_use_server_rendering"
+        self.SHOW_TIMINGS = f"{plotter._id_name}_show_timings"
+        self.TIMINGS = f"{plotter._id_name}_timings"
+        self.DUMP_TIMINGS = f"{plotter._id_name}_dump_timings"
+        self.CLIPPING = f"{plotter._id_name}_clipping"
+        self.CLIPPING_AXIS = f"{plotter._id_name}_clipping_axis"
+        self.CLIPPING_POSITION = f"{plotter._id_name}_clipping_position"
+        self.SLAB_WIDTH = f"{plotter._id_name}_slab_width"
+        self.PICKING = f"{plotter._id_name}_picking"
+        self.PICKED = f"{plotter._id_name}_picked"
+        self.PICK_PENDING = f"{plotter._id_name}_pick_pending"
+        self.SELECTING = f"{plotter._id_name}_selecting"
 
         # controller
         ctrl.get_render_window = lambda: self.plotter.render_window
 
+        # Record the wall time of each server-side render and the frame rate
+        self._render_start = None
+        self.plotter.render_window.AddObserver("StartEvent", self._on_render_start)
+        self.plotter.render_window.AddObserver("EndEvent", self._on_render_end)
+        self._timings_task = None
+        self._pick_task = None
+        self._state.setdefault(self.TIMINGS, {"fps": 0, "categories": {}})
+        for name, value in [
+            (self.CLIPPING, "off"),
+            (self.CLIPPING_AXIS, "x"),
+            (self.CLIPPING_POSITION, 0.5),
+            (self.SLAB_WIDTH, 0.1),
+            (self.PICKING, False),
+            (self.PICKED, None),
+            (self.PICK_PENDING, False),
+            (self.SELECTING, False),
+        ]:
+            self._state.setdefault(name, value)
+
         # Listen to state changes
-        self._state.change(self.GRID)(self.on_grid_visiblity_change)
-        self._state.change(self.OUTLINE)(self.on_outline_visiblity_change)
-        self._state.change(self.EDGES)(self.on_edge_visiblity_change)
-        self._state.change(self.AXIS)(self.on_axis_visiblity_change)
-        self._state.change(self.SERVER_RENDERING)(self.on_rendering_mode_change)
+        self._handlers = {
+            self.GRID: self.on_grid_visiblity_change,
+            self.OUTLINE: self.on_outline_visiblity_change,
+            self.EDGES: self.on_edge_visiblity_change,
+            self.AXIS: self.on_axis_visiblity_change,
+            self.SERVER_RENDERING: self.on_rendering_mode_change,
+            self.SHOW_TIMINGS: self.on_timings_visibility_change,
+            self.CLIPPING: self.on_clipping_change,
+            self.CLIPPING_AXIS: self.on_clipping_change,
+            self.CLIPPING_POSITION: self.on_clipping_change,
+            self.SLAB_WIDTH: self.on_clipping_change,
+            self.PICKING: self.on_picking_change,
+        }
+        # Every Viewer of the plotter counts its registrations in the server-side context, see ``n_handlers``
+        self._n_handlers_key = f"stviewer_n_handlers_{plotter._id_name}"
+        n_handlers = server.context[self._n_handlers_key] or 0
+        for name, handler in self._handlers.items():
+            self._state.change(name)(timed(handler))
+            n_handlers += 1
         # Listen to events
-        self._ctrl.trigger(self.SCREENSHOT)(self.screenshot)
+        self._triggers = {
+            self.SCREENSHOT: self.screenshot,
+            self.DUMP_TIMINGS: self.dump_timings,
+        }
+        for name, trigger in self._triggers.items():
+            self._ctrl.trigger(name)(timed(trigger))
+            n_handlers += 1
+        server.context[self._n_handlers_key] = n_handlers
+
+    @property
+    def n_handlers(self):
+        """
+        Get the number of state change handlers and triggers registered on the server by the Viewers of this plotter,
+        e.g. to check that they are only attached once.
+        """
+        return self._server.context[self._n_handlers_key]
 
     @vuwrap
     def on_edge_visiblity_change(self, **kwargs):
@@ -116,25 +206,233 @@ class Viewer:
         else:
             self.plotter.hide_axes()
 
+    def on_interaction_start(self, **kwargs):
+        """Show the coarse levels of detail while the camera is interacting, with server rendering only."""
+        if self._state[self.SERVER_RENDERING] is not False:
+            set_interacting(self.plotter, interacting=True)
+
+    def on_interaction_end(self, **kwargs):
+        """Show the full resolution again once the camera is idle."""
+        if set_interacting(self.plotter, interacting=False):
+            self._ctrl.view_update()
+
     @vuwrap
     def on_rendering_mode_change(self, **kwargs):
         """Handle any configurations when the render mode changes between client and server."""
+        set_local_rendering(
+            self.plotter, local_rendering=not self._state[self.SERVER_RENDERING]
+        )
         if not self._state[self.SERVER_RENDERING]:
             self._ctrl.view_push_camera(force=True)
 
+    @vuwrap
+    def on_clipping_change(self, **kwargs):
+        """
+        Clip all actors along an axis. ``'clip'`` keeps the part below the plane, ``'slab'`` a slab centered on it.
+        The position and the slab width are fractions of the extent of the models along the axis.
+        """
+        mode = self._state[self.CLIPPING]
+        if mode in [None, "off"]:
+            set_clipping(self.plotter, axis=None)
+            return
+
+        axis = "xyz".index(self._state[self.CLIPPING_AXIS])
+        low, high = clipping_bounds(self.plotter, axis=axis)
+        position = low + (high - low) * self._state[self.CLIPPING_POSITION]
+        if mode == "clip":
+            set_clipping(self.plotter, axis=axis, high=position)
+        else:
+            half_width = (high - low) * self._state[self.SLAB_WIDTH] / 2
+            set_clipping(
+                self.plotter,
+                axis=axis,
+                low=position - half_width,
+                high=position + half_width,
+            )
+
+    def on_picking_change(self, **kwargs):
+        if not self._state[self.PICKING]:
+            self._state[self.PICKED] = None
+
+    def on_pick(self, event=None, n_genes=10, hover=False):
+        """
+        Inspect the cell under the cursor of a click or hover event of the view, see ``pick_point``. Server rendering
+        events carry the display position, client rendering events the world position picked by the browser, or
+        nothing over the background. The point is picked right away, while the row of its cell is read in a thread;
+        a newer event cancels the pending inspection.
+
+        Args:
+            event: The picking event of the view.
+            n_genes: The number of most expressed genes of the inspected cell.
+            hover: Whether the event is a hover event, see ``on_hover``.
+        """
+        picked = None
+        if self._state[self.PICKING] and event:
+            if "position" in event:
+                position = (event["position"]["x"], event["position"]["y"])
+                picked = pick_point(self.plotter, position=position, size=event["size"])
+            elif "worldPosition" in event:
+                picked = pick_point(self.plotter, world_position=event["worldPosition"])
+        card = None if picked is None else get_card(picked[0])
+        if self._pick_task is not None:
+            self._pick_task.cancel()
+            self._pick_task = None
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Without a running event loop (e.g. before the server starts), inspect right away.
+            loop = None
+        if card is None or loop is None:
+            self.set_picked(
+                None if card is None else card.inspect(picked[1], n_genes=n_genes)
+            )
+            if hover:
+                self.clear_pick_pending()
+            return
+        self._pick_task = loop.create_task(
+            self._inspect(card, picked[1], n_genes=n_genes, hover=hover)
+        )
+        self._pick_task.add_done_callback(self._on_pick_done)
+
+    async def _inspect(self, card, point_id, n_genes, hover):
+        task = asyncio.current_task()
+        try:
+            picked = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(card.inspect, point_id, n_genes=n_genes)
+            )
+        finally:
+            if self._pick_task is task:
+                self._pick_task = None
+            if hover:
+                with self._state:
+                    self.clear_pick_pending()
+        with self._state:
+            self.set_picked(picked)
+
+    @staticmethod
+    def _on_pick_done(task):
+        if not task.cancelled() and task.exception() is not None:
+            error = task.exception()
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    def set_picked(self, picked):
+        """Show the description of the inspected cell, see ``PVCB.inspect``, or hide it if None."""
+        if picked != self._state[self.PICKED]:
+            self._state[self.PICKED] = picked
+
+    def clear_pick_pending(self):
+        """Let the view send its next hover event, see ``on_hover``."""
+        self._state[self.PICK_PENDING] = False
+        # The view set it on its side, the server copy may not have seen it yet
+        self._state.dirty(self.PICK_PENDING)
+
+    def on_hover(self, event=None, n_genes=10):
+        """
+        Same as ``on_pick`` for the hover events of the view, which only sends a hover event once the previous one is
+        inspected: the view sets ``PICK_PENDING`` when it sends one, and the inspection clears it.
+        """
+        try:
+            self.on_pick(event, n_genes=n_genes, hover=True)
+        except BaseException:
+            self.clear_pick_pending()
+            raise
+
+    def on_select(self, event=None):
+        """
+        Select the cells of the point clouds within a box, and rank their genes in the card of each point cloud, see
+        ``PVCB.select``. Cards without selected cells are cleared.
+
+        Args:
+            event: The selection event of the view. Server rendering events carry the box on the display, client
+                   rendering events the world frustum of the box.
+        """
+        if event and "frustrum" in event:
+            selections = select_points(self.plotter, frustum=event["frustrum"])
+        elif event and "selection" in event:
+            # The box is in pixels of the canvas, which the render window of the plotter follows
+            selections = select_points(self.plotter, box=event["selection"])
+        else:
+            selections = {}
+        for actor in self.plotter.renderer.actors.values():
+            card = get_card(actor)
+            if card is not None:
+                card.select(selections.get(actor))
+
     @property
     def actors(self):
         """Get dataset actors."""
         return {k: v for k, v in self.plotter.actors.items() if isinstance(v, pv.Actor)}
 
-    @vuwrap
-    def screenshot(self):
-        """Take screenshot and add attachament."""
+    def take_screenshot(self) -> bytes:
+        """Render the scene and encode it as PNG."""
         self.plotter.render()
         buffer = io.BytesIO()
-        self.plotter.screenshot(filename=buffer)
+        with get_timings().measure("encode:screenshot"):
+            self.plotter.screenshot(filename=buffer)
         buffer.seek(0)
-        return self._server.protocol.addAttachment(memoryview(buffer.read()))
+        return buffer.read()
+
+    @vuwrap
+    def screenshot(self):
+        """Take screenshot and add attachament."""
+        return self._server.protocol.addAttachment(memoryview(self.take_screenshot()))
+
+    def _on_render_start(self, *args):
+        self._render_start = time.perf_counter()
+
+    def _on_render_end(self, *args):
+        if self._render_start is not None:
+            get_timings().record("render:vtk", time.perf_counter() - self._render_start)
+            get_timings().frame()
+            self._render_start = None
+
+    def dump_timings(self) -> str:
+        """Get the statistics of the recorded wall times as JSON."""
+        return json.dumps(get_timings().stats(), indent=2)
+
+    def on_timings_visibility_change(self, **kwargs):
+        """Publish the timing statistics to the overlay twice a second while it is shown."""
+        if not self._state[self.SHOW_TIMINGS] or self._timings_task is not None:
+            return
+        try:
+            self._timings_task = asyncio.get_running_loop().create_task(
+                self._publish_timings()
+            )
+        except RuntimeError:
+            # Without a running event loop (e.g. before the server starts), publish once.
+            self._state[self.TIMINGS] = get_timings().stats()
+
+    async def _publish_timings(self, period: float = 0.5):
+        try:
+            while self._state[self.SHOW_TIMINGS]:
+                with self._state:
+                    self._state[self.TIMINGS] = get_timings().stats()
+                await asyncio.sleep(period)
+        finally:
+            self._timings_task = None
+
+
+def get_viewer(plotter, server, suppress_rendering=False):
+    """
+    Get the Viewer of a plotter, creating it on first use. All UI pieces share this Viewer, so its state change handlers
+    and triggers are only attached once per plotter.
+
+    Args:
+        plotter: The PyVista plotter.
+        server: The trame server.
+        suppress_rendering: Whether to suppress rendering, only used when the Viewer is created.
+
+    Returns:
+        The Viewer of the plotter.
+    """
+    # Kept in the server-side context of the server, so the Viewer goes away with its session
+    key = f"stviewer_viewer_{plotter._id_name}"
+    if key not in server.context:
+        server.context[key] = Viewer(
+            plotter=plotter, server=server, suppress_rendering=suppress_rendering
+        )
+    return server.context[key]
 
 
 # -----------------------------------------------------------------------------
@@ -220,10 +518,32 @@ class PVCB:
 """
 
 
+# The card of each actor. Cards hold their actor and are held by the state handlers of their server, so the registry
+# holds neither: entries go away with the actor, once the session is closed.
+_CARDS = weakref.WeakKeyDictionary()
+
+
+def get_card(actor) -> Optional["PVCB"]:
+    """Get the card of an actor, or None if it has none."""
+    card = _CARDS.get(actor)
+    return None if card is None else card()
+
+
 class PVCB:
     """Callbacks for drawer based on pyvista."""
 
-    def __init__(self, server, actor, actor_name, adata):
+    def __init__(
+        self,
+        server,
+        actor,
+        actor_name,
+        adata,
+        resolver=None,
+        scalar_cache=None,
+        slice_key="slices",
+        spatial_key="spatial",
+        n_neighbors=10,
+    ):
         """Initialize PVCB."""
         state, ctrl = server.state, server.controller
         self._server = server
@@ -232,9 +552,45 @@ class PVCB:
         self._actor = actor
         self._actor_name = actor_name
         self._adata = adata
+        self._resolver = ScalarResolver(adata) if resolver is None else resolver
+        self._scalar_cache = ScalarCache() if scalar_cache is None else scalar_cache
+        self._obs_rows = None
+        self._model_arrays = None
+        self._added_scalars = None
+        self._scalars_task = None
+        self._selection_task = None
+        self._continuous_lut = None
+        self._categorical_luts = {}
+        self._threshold_array = None
+        self._threshold_key = None
+        self._threshold_index = None
+        self._slice_key = slice_key
+        self._slice_index = None
+        self._spatial_key = spatial_key
+        self._n_neighbors = n_neighbors
+        self._knn_graph = None
+        self._knn_graph_lock = threading.Lock()
+        # Register the actor for the plotter-wide display changes, e.g. clipping, and for picking
+        get_display(actor)
+        _CARDS[actor] = weakref.ref(self)
 
         # State variable names
         self.SCALARS = f"{actor_name}_scalars_value"
+        self.SCALARS_LOADING = f"{actor_name}_scalars_loading"
+        self.SCALARS_ERROR = f"{actor_name}_scalars_error"
+        self.SCORE = f"{actor_name}_score_value"
+        self.LAYER = f"{actor_name}_layer_value"
+        self.SMOOTHING = f"{actor_name}_smoothing_value"
+        self.CLIP = f"{actor_name}_clip_value"
+        self.THRESHOLD = f"{actor_name}_threshold_value"
+        self.THRESHOLD_RANGE = f"{actor_name}_threshold_range_value"
+        self.THRESHOLD_BOUNDS = f"{actor_name}_threshold_bounds"
+        self.SLICES = f"{actor_name}_slices_value"
+        self.SLICES_RANGE = f"{actor_name}_slices_range_value"
+        self.SLICE_LABELS = f"{actor_name}_slice_labels"
+        self.SELECTION = f"{actor_name}_selection"
+        self.SELECTION_LOADING = f"{actor_name}_selection_loading"
+        self.SELECTION_ERROR = f"{actor_name}_selection_error"
         self.OPACITY = f"{actor_name}_opacity_value"
         self.AMBIENT = f"{actor_name}_ambient_value"
         self.COLOR = f"{actor_name}_color_value"
@@ -246,49 +602,581 @@ class PVCB:
         self.ASTUBES = f"{actor_name}_as_tubes_value"
 
         # Listen to state changes
-        self._state.change(self.SCALARS)(self.on_scalars_change)
-        self._state.change(self.OPACITY)(self.on_opacity_change)
-        self._state.change(self.AMBIENT)(self.on_ambient_change)
-        self._state.change(self.COLOR)(self.on_color_change)
-        self._state.change(self.COLORMAP)(self.on_colormap_change)
-        self._state.change(self.STYLE)(self.on_style_change)
-        self._state.change(self.POINTSIZE)(self.on_point_size_change)
-        self._state.change(self.LINEWIDTH)(self.on_line_width_change)
-        self._state.change(self.ASSPHERES)(self.on_as_spheres_change)
-        self._state.change(self.ASTUBES)(self.on_as_tubes_change)
+        self._handlers = {
+            self.SCALARS: self.on_scalars_change,
+            self.SCORE: self.on_score_change,
+            self.LAYER: self.on_layer_change,
+            self.SMOOTHING: self.on_smoothing_change,
+            self.CLIP: self.on_clip_change,
+            self.THRESHOLD: self.on_threshold_change,
+            self.THRESHOLD_RANGE: self.on_threshold_change,
+            self.SLICES: self.on_slices_change,
+            self.SLICES_RANGE: self.on_slices_change,
+            self.OPACITY: self.on_opacity_change,
+            self.AMBIENT: self.on_ambient_change,
+            self.COLOR: self.on_color_change,
+            self.COLORMAP: self.on_colormap_change,
+            self.STYLE: self.on_style_change,
+            self.POINTSIZE: self.on_point_size_change,
+            self.LINEWIDTH: self.on_line_width_change,
+            self.ASSPHERES: self.on_as_spheres_change,
+            self.ASTUBES: self.on_as_tubes_change,
+        }
+        for name, handler in self._handlers.items():
+            self._state.change(name)(timed(handler))
+        self._state.setdefault(self.THRESHOLD_BOUNDS, [0, 1])
+        self._state.setdefault(self.SLICE_LABELS, self.slice_labels)
+        self._state.setdefault(self.SELECTION, None)
+        self._state.setdefault(self.SCALARS_ERROR, None)
+        self._state.setdefault(self.SELECTION_LOADING, False)
+        self._state.setdefault(self.SELECTION_ERROR, None)
 
     def get_model(self):
-        return self._actor.mapper.dataset
+        """Get the full-resolution model, whatever level of detail the actor currently shows. Lazy actors are loaded."""
+        display = get_display(self._actor)
+        display.load()
+        return display.model
 
     def get_adata(self):
+        """Get the AnnData object. In backed mode only obs, var and obsm are in memory."""
         return self._adata
 
-    @vuwrap
+    @property
+    def obs_rows(self):
+        """Row positions in ``adata`` of the model points, computed once per actor."""
+        if self._obs_rows is None:
+            self._obs_rows = self._resolver.obs_rows(
+                self.get_model().point_data["obs_index"]
+            )
+        return self._obs_rows
+
+    async def get_obs_rows_async(self):
+        """
+        Same as ``obs_rows``, but the mapping of the obs_index onto ``adata`` runs in a thread. A lazy model is loaded
+        on the event loop first, since loading it changes the scene.
+        """
+        if self._obs_rows is None:
+            obs_index = self.get_model().point_data["obs_index"]
+            obs_rows = await asyncio.get_running_loop().run_in_executor(
+                None, self._resolver.obs_rows, obs_index
+            )
+            if self._obs_rows is None:
+                self._obs_rows = obs_rows
+        return self._obs_rows
+
+    @property
+    def layers(self):
+        """The layers genes can be read from."""
+        return self._resolver.layers
+
+    @property
+    def slice_labels(self):
+        """The labels of the slices in slice order, empty if ``adata.obs`` has no categorical slice key."""
+        categories = self._resolver.categories(self._slice_key)
+        return [] if categories is None else list(categories)
+
+    @property
+    def slice_index(self):
+        """The point ids of the model sorted by slice, built once per actor."""
+        if self._slice_index is None:
+            self._slice_index = SortedIndex(
+                self._resolver.resolve(key=self._slice_key, rows=self.obs_rows)
+            )
+        return self._slice_index
+
+    @property
+    def knn_graph(self):
+        """
+        The kNN graph of the cells of the model over ``adata.obsm[spatial_key]``, or over the model points without
+        it, built once per actor and reused by all scalars, see ``stviewer.pv_pipeline.knn_graph``.
+        """
+        # Smoothing runs in threads, the graph is only built once
+        with self._knn_graph_lock:
+            if self._knn_graph is None:
+                if self._spatial_key in self._adata.obsm:
+                    coordinates = np.asarray(self._adata.obsm[self._spatial_key])
+                    coordinates = coordinates[self.obs_rows]
+                else:
+                    coordinates = np.asarray(self.get_model().points)
+                with get_timings().measure("smoothing:graph"):
+                    self._knn_graph = knn_graph(
+                        coordinates, n_neighbors=self._n_neighbors
+                    )
+        return self._knn_graph
+
+    def smooth(self, array):
+        """Average a per-point array over the kNN graph, a single sparse matrix-vector product."""
+        return as_scalars(self.knn_graph @ array.astype(np.float32, copy=False))
+
+    def cache_key(self, scalars, layer=None, score="mean", smoothing=False):
+        """
+        The key of the resolved scalars in the scalar cache. The layer only matters for genes and gene sets, the
+        score for gene sets, and the smoothing for numeric scalars.
+        """
+        if self._resolver.gene_set(scalars) is None:
+            score = None
+            if not self._resolver.is_var_name(scalars):
+                layer = None
+        smoothing = bool(smoothing) and self._resolver.categories(scalars) is None
+        return self._actor_name, scalars, layer, score, smoothing
+
+    def _put_scalars(self, cache_key, array):
+        if array is None:
+            # Unknown keys, e.g. partially typed var names, must not evict resolved arrays from the cache
+            return np.ones(shape=(len(self.obs_rows),), dtype=np.float32), (1.0, 1.0)
+        return self._scalar_cache.put(
+            cache_key, array=array, clim=(np.min(array), np.max(array))
+        )
+
+    def get_scalars(self, scalars, layer=None, score="mean", smoothing=False):
+        """
+        Get the per-point array of an obs key, a var name or a gene set and its range, from the cache if possible.
+        See ``ScalarResolver.resolve``. Smoothed arrays are derived from the cached raw arrays, see ``smooth``.
+        """
+        cache_key = self.cache_key(
+            scalars, layer=layer, score=score, smoothing=smoothing
+        )
+        entry = self._scalar_cache.get(cache_key)
+        if entry is None and cache_key[-1]:
+            array, _ = self.get_scalars(scalars, layer=layer, score=score)
+            entry = self._put_scalars(cache_key, self.smooth(array))
+        elif entry is None:
+            array = self._resolver.resolve(
+                key=scalars, rows=self.obs_rows, layer=layer, score=score
+            )
+            entry = self._put_scalars(cache_key, array)
+        return entry
+
+    async def get_scalars_async(
+        self, scalars, layer=None, score="mean", smoothing=False
+    ):
+        """
+        Same as ``get_scalars``, but arrays missing from the cache are resolved in the worker pool, and smoothed in a
+        thread.
+        """
+        cache_key = self.cache_key(
+            scalars, layer=layer, score=score, smoothing=smoothing
+        )
+        entry = self._scalar_cache.get(cache_key)
+        if entry is None and cache_key[-1]:
+            array, _ = await self.get_scalars_async(scalars, layer=layer, score=score)
+            # The kNN graph is built on first use, then each smoothing is a product over all points
+            smoothed = await asyncio.get_running_loop().run_in_executor(
+                None, self.smooth, array
+            )
+            entry = self._put_scalars(cache_key, smoothed)
+        elif entry is None:
+            array = await self._resolver.resolve_async(
+                key=scalars, rows=self.obs_rows, layer=layer, score=score
+            )
+            entry = self._put_scalars(cache_key, array)
+        return entry
+
+    def get_range(
+        self, scalars, array, clim, layer=None, clip="min-max", smoothing=False
+    ):
+        """
+        Get the range of the lookup table, see ``clip_range``. "min-max" is the range of the cells of the actor;
+        robust ranges of genes use their quantiles across all cells, see ``ScalarResolver.gene_range``, other scalars
+        and smoothed genes the quantiles of their resolved array. Degenerate robust ranges fall back to "min-max".
+
+        Args:
+            scalars: The obs key, var name or gene set.
+            array: The resolved array.
+            clim: The ``(min, max)`` range of the resolved array.
+            layer: The layer of genes.
+            clip: The range, one of ``CLIPS``.
+            smoothing: Whether the array is smoothed.
+
+        Returns:
+            The ``(low, high)`` range.
+        """
+        robust_range = None
+        if clip != "min-max" and not smoothing:
+            robust_range = self._resolver.gene_range(scalars, layer=layer, clip=clip)
+        return clip_range(array, clim, clip=clip, robust_range=robust_range)
+
+    def get_categorical_lut(self, scalars, categories):
+        """
+        Get the discrete lookup table of a categorical obs key, one color and one annotation per category code.
+
+        Args:
+            scalars: The categorical obs key.
+            categories: Its category labels, see ``ScalarResolver.categories``.
+
+        Returns:
+            The lookup table, created once per key.
+        """
+        if scalars not in self._categorical_luts:
+            n_categories = len(categories)
+            self._categorical_luts[scalars] = pv.LookupTable(
+                cmap=self._state[self.COLORMAP] or "tab20",
+                n_values=n_categories,
+                scalar_range=(-0.5, n_categories - 0.5),
+                annotations=dict(enumerate(categories)),
+            )
+        return self._categorical_luts[scalars]
+
+    def set_lookup_table(self, lookup_table=None):
+        """Color the actor with a categorical lookup table, or with its continuous one if None."""
+        mapper = self._actor.mapper
+        if self._continuous_lut is None:
+            self._continuous_lut = mapper.lookup_table
+        lookup_table = self._continuous_lut if lookup_table is None else lookup_table
+        if mapper.lookup_table is not lookup_table:
+            if self._state[self.COLORMAP]:
+                lookup_table.cmap = self._state[self.COLORMAP]
+            mapper.lookup_table = lookup_table
+
+    def scalars_request(self) -> dict:
+        """The scalars, layer, score and smoothing currently chosen in the card."""
+        return dict(
+            scalars=self._state[self.SCALARS],
+            layer=self._state[self.LAYER],
+            score=self._state[self.SCORE] or "mean",
+            smoothing=bool(self._state[self.SMOOTHING]),
+        )
+
+    def set_point_array(self, name, array):
+        """Write a resolved array into the model, dropping the previously resolved one."""
+        point_data = self.get_model().point_data
+        if self._model_arrays is None:
+            self._model_arrays = set(point_data.keys())
+        if (
+            self._added_scalars not in [None, name]
+            and self._added_scalars in point_data
+        ):
+            point_data.remove(self._added_scalars)
+        point_data[name] = array
+        self._added_scalars = None if name in self._model_arrays else name
+
     def on_scalars_change(self, **kwargs):
-        if self._state[self.SCALARS] in ["none", "None", None]:
+        """
+        Color the actor by the new scalars. Arrays missing from the cache are resolved in the worker pool while the
+        card shows a loading indicator; a newer request cancels the pending one, so only the latest result is applied.
+        Errors of the resolution are shown under the Scalars field.
+        """
+        request = self.scalars_request()
+        if self._scalars_task is not None:
+            self._scalars_task.cancel()
+            self._scalars_task = None
+        self._state[self.SCALARS_ERROR] = None
+
+        if (
+            request["scalars"] not in ["none", "None", None]
+            and self.cache_key(**request) not in self._scalar_cache
+        ):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Without a running event loop (e.g. before the server starts), resolve right away.
+                loop = None
+            if loop is not None:
+                self._state[self.SCALARS_LOADING] = True
+                self._scalars_task = loop.create_task(self._resolve_scalars(request))
+                self._scalars_task.add_done_callback(
+                    functools.partial(self._on_task_done, self.SCALARS_ERROR)
+                )
+                return
+
+        self._state[self.SCALARS_LOADING] = False
+        self.apply_scalars(**request)
+
+    async def _resolve_scalars(self, request):
+        task = asyncio.current_task()
+        try:
+            with get_timings().measure("scalars:resolve"):
+                await self.get_obs_rows_async()
+                resolved = await self.get_scalars_async(**request)
+        finally:
+            latest = self._scalars_task is task
+            if latest:
+                self._scalars_task = None
+                with self._state:
+                    self._state[self.SCALARS_LOADING] = False
+        if latest and self.scalars_request() == request:
+            with self._state:
+                # The resolved array may not fit in the cache, it must not be resolved again on the event loop
+                self.apply_scalars(**request, resolved=resolved)
+
+    def _on_task_done(self, error_name, task):
+        # Without it, errors of the worker pool would only be logged as "Task exception was never retrieved"
+        if task.cancelled() or task.exception() is None:
+            return
+        error = task.exception()
+        traceback.print_exception(type(error), error, error.__traceback__)
+        with self._state:
+            self._state[error_name] = f"{type(error).__name__}: {error}"
+
+    @vuwrap
+    def apply_scalars(
+        self, scalars, layer=None, score="mean", smoothing=False, resolved=None
+    ):
+        """
+        Color the actor by an obs key, a var name or a gene set, resolving it if it is not cached. Numeric scalars may
+        be smoothed over the kNN graph of the cells.
+
+        Args:
+            scalars: The obs key, var name or gene set.
+            layer: The layer of genes.
+            score: The score of gene sets.
+            smoothing: Whether numeric scalars are smoothed.
+            resolved: The ``(array, clim)`` already resolved, see ``get_scalars_async``. If None, it is read from the
+                      cache or resolved right away, see ``get_scalars``.
+        """
+        if scalars in ["none", "None", None]:
             self._actor.mapper.scalar_visibility = False
+            self.set_threshold_scalars(None)
         else:
-            _adata = self._adata.copy()
-            _obs_index = self._actor.mapper.dataset.point_data["obs_index"]
-            _adata = _adata[_obs_index, :]
-
-            if self._state[self.SCALARS] in set(_adata.obs_keys()):
-                array = np.asarray(
-                    _adata.obs[self._state[self.SCALARS]].values
-                ).flatten()
-            elif self._state[self.SCALARS] in set(_adata.var_names.tolist()):
-                array = np.asarray(
-                    _adata[:, self._state[self.SCALARS]].X.sum(axis=1).flatten()
+            array, clim = (
+                self.get_scalars(scalars, layer=layer, score=score, smoothing=smoothing)
+                if resolved is None
+                else resolved
+            )
+            self.set_threshold_scalars(array, bounds=clim, key=scalars)
+            categories = self._resolver.categories(scalars)
+            if categories is None:
+                self.set_lookup_table(None)
+                clim = self.get_range(
+                    scalars,
+                    array=array,
+                    clim=clim,
+                    layer=layer,
+                    clip=self._state[self.CLIP] or "min-max",
+                    smoothing=smoothing,
                 )
             else:
-                array = np.ones(shape=(len(_obs_index),))
-
-            self._actor.mapper.dataset.point_data[self._state[self.SCALARS]] = array
-            self._actor.mapper.SelectColorArray(self._state[self.SCALARS])
-            self._actor.mapper.lookup_table.SetRange(np.min(array), np.max(array))
+                # Category codes index the colors of a discrete lookup table
+                lookup_table = self.get_categorical_lut(scalars, categories)
+                self.set_lookup_table(lookup_table)
+                clim = lookup_table.scalar_range
+            self.set_point_array(scalars, array)
+            self._actor.mapper.SelectColorArray(scalars)
+            self._actor.mapper.lookup_table.SetRange(*clim)
+            # Map unsigned char codes through the lookup table instead of reading them as colors
+            self._actor.mapper.SetColorModeToMapScalars()
             self._actor.mapper.SetScalarModeToUsePointFieldData()
             self._actor.mapper.scalar_visibility = True
-        self._ctrl.view_update()
+        # Refresh the dataset sent to the browser with client rendering
+        get_display(self._actor).update()
+
+    def on_score_change(self, **kwargs):
+        """Score the current gene set again, other scalars do not depend on the score."""
+        if self._resolver.gene_set(self._state[self.SCALARS]) is not None:
+            self.on_scalars_change()
+
+    def on_layer_change(self, **kwargs):
+        """Read the current gene or gene set again from the new layer."""
+        scalars = self._state[self.SCALARS]
+        if self._resolver.is_var_name(scalars) or self._resolver.gene_set(scalars):
+            self.on_scalars_change()
+
+    def on_smoothing_change(self, **kwargs):
+        """Smooth the current numeric scalars or show them raw again, categorical scalars are never smoothed."""
+        scalars = self._state[self.SCALARS]
+        if (
+            scalars not in ["none", "None", None]
+            and self._resolver.categories(scalars) is None
+        ):
+            self.on_scalars_change()
+
+    def on_clip_change(self, **kwargs):
+        """Set the range of the lookup table again."""
+        if self._state[self.SCALARS] not in ["none", "None", None]:
+            self.on_scalars_change()
+
+    def set_threshold_scalars(self, array, bounds=(0, 1), key=None):
+        """
+        Threshold the points on a new array. The threshold range is reset to its bounds only when the scalars change;
+        another layer or smoothing of the same scalars keeps it, within the new bounds. The sorted index of the array
+        is built the first time the threshold is applied.
+
+        Args:
+            array: The per-point array, None to show all points.
+            bounds: The ``(min, max)`` of the array.
+            key: The obs key, var name or gene set of the array.
+        """
+        if array is not None and not np.issubdtype(array.dtype, np.number):
+            array = None
+        if array is self._threshold_array and key == self._threshold_key:
+            # e.g. a new range of the lookup table
+            return
+        same_scalars = array is not None and key == self._threshold_key
+        self._threshold_array, self._threshold_index = array, None
+        self._threshold_key = key
+        bounds = [float(bounds[0]), float(bounds[1])]
+        self._state[self.THRESHOLD_BOUNDS] = bounds
+        if same_scalars:
+            low, high = self._state[self.THRESHOLD_RANGE]
+            low, high = min(max(low, bounds[0]), bounds[1]), max(
+                min(high, bounds[1]), bounds[0]
+            )
+            self._state[self.THRESHOLD_RANGE] = [low, high]
+        else:
+            self._state[self.THRESHOLD_RANGE] = bounds
+        self.apply_threshold()
+
+    def apply_threshold(self) -> bool:
+        """
+        Only show the points whose scalars are within the threshold range. Each change of the range is two binary
+        searches in the sorted index, whose slice is shown as is.
+
+        Returns:
+            Whether the shown dataset changed.
+        """
+        ids = None
+        if self._state[self.THRESHOLD] and self._threshold_array is not None:
+            if self._threshold_index is None:
+                self._threshold_index = SortedIndex(self._threshold_array)
+            low, high = self._state[self.THRESHOLD_RANGE]
+            ids = self._threshold_index.range_ids(low, high)
+        return get_display(self._actor).set_point_filter("threshold", ids)
+
+    def on_threshold_change(self, **kwargs):
+        if self.apply_threshold():
+            self._ctrl.view_update()
+
+    def inspect(self, point_id, n_genes=10) -> dict:
+        """
+        Describe the cell of a model point: its obs name, all its obs fields and its most expressed genes in the
+        current layer, read from a single row of the matrix.
+
+        Args:
+            point_id: The id of the point in the full-resolution model.
+            n_genes: The number of genes.
+
+        Returns:
+            The description, with values formatted as strings.
+        """
+        row = int(self.obs_rows[point_id])
+        obs = self._adata.obs.iloc[row]
+
+        def format_value(value):
+            if isinstance(value, (float, np.floating)):
+                return f"{value:.4g}"
+            return str(value)
+
+        return dict(
+            actor=self._actor_name,
+            obs_index=str(self._adata.obs_names[row]),
+            obs=[dict(key=str(k), value=format_value(v)) for k, v in obs.items()],
+            genes=[
+                dict(name=name, value=format_value(value))
+                for name, value in self._resolver.top_genes(
+                    row, layer=self._state[self.LAYER], n_genes=n_genes
+                )
+            ],
+        )
+
+    def select(self, point_ids=None, n_genes=20):
+        """
+        Rank the genes of the cells of some model points against the other cells of the model, by log fold change of
+        their mean expression in the current layer, see ``ScalarResolver.differential_expression``. The ranking runs
+        in the worker pool while the card shows a loading indicator; a newer selection cancels the pending one.
+
+        Args:
+            point_ids: The ids of the selected points in the full-resolution model. If None, the selection is cleared.
+            n_genes: The number of genes.
+        """
+        if self._selection_task is not None:
+            self._selection_task.cancel()
+            self._selection_task = None
+        self._state[self.SELECTION_ERROR] = None
+        if point_ids is None or len(point_ids) == 0:
+            self._state[self.SELECTION] = None
+            self._state[self.SELECTION_LOADING] = False
+            return
+
+        request = dict(
+            point_ids=point_ids, layer=self._state[self.LAYER], n_genes=n_genes
+        )
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Without a running event loop (e.g. before the server starts), rank right away.
+            loop = None
+        if loop is None:
+            rows, reference_rows = self.selection_rows(point_ids)
+            with get_timings().measure("selection:rank"):
+                genes = self._resolver.differential_expression(
+                    rows,
+                    reference_rows=reference_rows,
+                    layer=request["layer"],
+                    n_genes=n_genes,
+                )
+            self._state[self.SELECTION] = self.selection_table(
+                rows, reference_rows, genes
+            )
+            return
+        self._state[self.SELECTION_LOADING] = True
+        self._selection_task = loop.create_task(self._rank_selection(**request))
+        self._selection_task.add_done_callback(
+            functools.partial(self._on_task_done, self.SELECTION_ERROR)
+        )
+
+    def selection_rows(self, point_ids):
+        """The rows of the cells of some model points, and the rows of the other cells of the model."""
+        rows = np.unique(self.obs_rows[point_ids])
+        return rows, np.setdiff1d(np.unique(self.obs_rows), rows)
+
+    @staticmethod
+    def selection_table(rows, reference_rows, genes):
+        """The state of the table of the genes ranked in a selection."""
+        return dict(
+            n_cells=len(rows),
+            n_reference=len(reference_rows),
+            genes=[
+                dict(
+                    name=gene["name"],
+                    mean=f"{gene['mean']:.3g}",
+                    reference_mean=f"{gene['reference_mean']:.3g}",
+                    log_fold_change=f"{gene['log_fold_change']:.2f}",
+                )
+                for gene in genes
+            ],
+        )
+
+    async def _rank_selection(self, point_ids, layer, n_genes):
+        task = asyncio.current_task()
+        try:
+            with get_timings().measure("selection:rank"):
+                await self.get_obs_rows_async()
+                rows, reference_rows = await asyncio.get_running_loop().run_in_executor(
+                    None, self.selection_rows, point_ids
+                )
+                genes = await self._resolver.differential_expression_async(
+                    rows, reference_rows=reference_rows, layer=layer, n_genes=n_genes
+                )
+        finally:
+            latest = self._selection_task is task
+            if latest:
+                self._selection_task = None
+                with self._state:
+                    self._state[self.SELECTION_LOADING] = False
+        if latest:
+            with self._state:
+                self._state[self.SELECTION] = self.selection_table(
+                    rows, reference_rows, genes
+                )
+
+    def apply_slices(self) -> bool:
+        """
+        Only show the points of the slices within the slice range, the codes of the slices being their positions in
+        ``slice_labels``. The points of any range of slices are a contiguous slice of the index, so moving through
+        the slices never reads the model or the AnnData object again.
+
+        Returns:
+            Whether the shown dataset changed.
+        """
+        ids = None
+        if self._state[self.SLICES] and len(self.slice_labels) > 0:
+            low, high = self._state[self.SLICES_RANGE]
+            ids = self.slice_index.range_ids(int(low), int(high))
+        return get_display(self._actor).set_point_filter("slices", ids)
+
+    def on_slices_change(self, **kwargs):
+        if self.apply_slices():
+            self._ctrl.view_update()
 
     def on_opacity_change(self, **kwargs):
         self._actor.prop.opacity = self._state[self.OPACITY]
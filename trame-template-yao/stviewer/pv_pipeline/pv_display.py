@@ -0,0 +1,776 @@
+import weakref
+from typing import Callable, Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+import pyvista as pv
+from pyvista import Plotter, PolyData
+
+from vtkmodules.vtkCommonDataModel import vtkPlane
+
+from .pv_filter import SortedIndex, vertex_cells
+from .pv_picking import (
+    camera_matrix,
+    pick_nearest,
+    pick_ray,
+    pixel_radius,
+    project_points,
+    select_frustum,
+    select_projected,
+)
+
+try:
+    from typing import Literal
+except ImportError:
+    from typing_extensions import Literal
+
+# -----------------------------------------------------------------------------
+# Subsampling
+# -----------------------------------------------------------------------------
+
+
+def voxel_subsample(points: np.ndarray, n_target: int, n_iter: int = 3) -> np.ndarray:
+    """
+    Keep one point per voxel of a regular grid whose voxel size is tuned to keep about ``n_target`` points.
+
+    Args:
+        points: The point coordinates.
+        n_target: The expected number of points.
+        n_iter: The number of refinements of the voxel size.
+
+    Returns:
+        The sorted ids of the kept points.
+    """
+    origin = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - origin, 1e-6)
+    voxel_size = (np.prod(extent) / n_target) ** (1 / 3)
+    for _ in range(n_iter):
+        dims = np.floor(extent / voxel_size).astype(np.int64) + 1
+        ijk = np.floor((points - origin) / voxel_size).astype(np.int64)
+        keys = np.ravel_multi_index(ijk.T, dims)
+        _, ids = np.unique(keys, return_index=True)
+        # Clustered point clouds occupy fewer voxels than the bounding box suggests.
+        voxel_size *= (len(ids) / n_target) ** (1 / 3)
+    return np.sort(ids)
+
+
+def random_subsample(n_points: int, n_target: int, random_state: int = 0) -> np.ndarray:
+    """
+    Keep a uniform random sample of ``n_target`` points.
+
+    Args:
+        n_points: The number of points.
+        n_target: The number of kept points.
+        random_state: The seed of the random generator.
+
+    Returns:
+        The sorted ids of the kept points.
+    """
+    rng = np.random.default_rng(random_state)
+    return np.sort(rng.choice(n_points, size=min(n_target, n_points), replace=False))
+
+
+# -----------------------------------------------------------------------------
+# Local rendering payload
+# -----------------------------------------------------------------------------
+
+
+def compact_array(array: np.ndarray) -> np.ndarray:
+    """
+    Downcast an array for the browser: integer-valued arrays within [0, 65535] become uint8 or uint16 without any loss,
+    other floating-point arrays become float32.
+
+    Args:
+        array: The numeric array.
+
+    Returns:
+        The downcast array, ``array`` itself if it is already compact or not numeric.
+    """
+    if array.dtype.kind not in "fiub" or array.size == 0:
+        return array
+    if array.dtype.kind == "f" and not (
+        np.all(np.isfinite(array)) and np.array_equal(array, np.round(array))
+    ):
+        return array.astype(np.float32, copy=False)
+
+    low, high = array.min(), array.max()
+    if low >= 0 and high <= np.iinfo(np.uint8).max:
+        return array.astype(np.uint8, copy=False)
+    if low >= 0 and high <= np.iinfo(np.uint16).max:
+        return array.astype(np.uint16, copy=False)
+    return array.astype(np.float32, copy=False) if array.dtype.kind == "f" else array
+
+
+# -----------------------------------------------------------------------------
+# Actor display
+# -----------------------------------------------------------------------------
+
+
+class ActorDisplay:
+    """The datasets shown by an actor: its full-resolution model and the levels of detail derived from it."""
+
+    def __init__(self, actor):
+        """Initialize ActorDisplay with the current mapper input of the actor as full-resolution model."""
+        self._actor = weakref.ref(actor)
+        self.model = actor.mapper.dataset
+        self.interacting = False
+
+        # Point cloud levels of detail, from finest to coarsest
+        self.max_interactive_points = None
+        self._point_levels = []
+        self._level_models = {}
+        self._level_mtimes = {}
+
+        # Mesh levels of detail, from finest to coarsest
+        self.viewport_pixels = 1024 * 1024
+        self.cells_per_pixel = 0.25
+        self.interactive_cells_ratio = 0.1
+        self._mesh_levels = []
+        self._shown = self.model
+
+        # Point clouds may only show some of their points, see ``set_point_filter``
+        self._point_filters = {}
+        self._point_ids = None
+        self._ids_version = 0
+        self._filtered_versions = {}
+        self._model_verts = None
+        self._vertex_offsets = np.arange(1, dtype=np.int64)
+
+        # Clipping along an axis, see ``set_clipping``
+        self._clipping = None
+        self._axis_bounds = {}
+        self._coordinate_indexes = {}
+
+        # Picking, see ``point_tree``
+        self._point_tree = None
+        self._shown_mask = None
+
+        # Slim copies of the shown datasets sent to the browser with client rendering
+        self.local_rendering = False
+        self._payload_models = {}
+
+        # Lazy actors read their model the first time they are shown
+        self._loader = None
+        self._on_load = []
+
+    @property
+    def actor(self):
+        """The actor, held weakly so that its display does not keep it alive, see ``get_display``."""
+        return self._actor()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+    def set_loader(self, loader: Callable[[pv.Actor], PolyData]):
+        """
+        Defer the model of the actor until ``load`` is called, see ``stviewer.pv_pipeline.add_lazy_model``.
+
+        Args:
+            loader: A function that maps the model into the given actor and returns the new mapper input. It must not
+                    hold the actor itself.
+        """
+        self._loader = loader
+
+    def on_load(self, callback: Callable[["ActorDisplay"], None]):
+        """
+        Call ``callback(display)`` once the model is loaded, immediately if it already is. Levels of detail are built
+        this way, as they depend on the model.
+        """
+        if self.loaded:
+            callback(self)
+        else:
+            self._on_load.append(callback)
+
+    def load(self) -> bool:
+        """
+        Load the model of a lazy actor.
+
+        Returns:
+            Whether the model was loaded by this call.
+        """
+        if self.loaded:
+            return False
+        loader, self._loader = self._loader, None
+        self.model = loader(self.actor)
+        self._shown = self.model
+        self._point_levels, self._level_models, self._level_mtimes = [], {}, {}
+        self._point_filters, self._point_ids, self._ids_version = {}, None, 0
+        self._filtered_versions, self._model_verts = {}, None
+        self._axis_bounds, self._coordinate_indexes = {}, {}
+        self._point_tree, self._shown_mask = None, None
+        self._payload_models = {}
+        callbacks, self._on_load = self._on_load, []
+        for callback in callbacks:
+            callback(self)
+        if self._clipping is not None:
+            # The loaded mapper replaced the one clipped so far
+            self.set_clipping(*self._clipping)
+        self.update()
+        return True
+
+    @property
+    def n_levels(self):
+        return len(self._point_levels) + len(self._mesh_levels)
+
+    def set_mesh_levels(
+        self,
+        levels: list,
+        cells_per_pixel: float = 0.25,
+        interactive_cells_ratio: float = 0.1,
+    ):
+        """
+        Set the decimated levels of a mesh, see ``stviewer.dataset.read_decimation_levels``. The coarsest level that
+        still has ``cells_per_pixel`` cells per viewport pixel is shown, and ``interactive_cells_ratio`` times fewer
+        while the camera is interacting.
+
+        Args:
+            levels: The decimated meshes, from finest to coarsest.
+            cells_per_pixel: The number of cells per viewport pixel of the shown level.
+            interactive_cells_ratio: The ratio of cells per viewport pixel while the camera is interacting.
+        """
+        self._mesh_levels = list(levels)
+        self.cells_per_pixel = cells_per_pixel
+        self.interactive_cells_ratio = interactive_cells_ratio
+
+    def set_viewport_size(self, window_size) -> bool:
+        """
+        Set the viewport size in pixels, which decides the shown mesh level.
+
+        Returns:
+            Whether the mapper input changed.
+        """
+        self.viewport_pixels = int(np.prod(window_size))
+        return self.update()
+
+    def _mesh_level(self) -> Optional[int]:
+        """The mesh level to show in the current state, None for full resolution."""
+        n_cells = self.viewport_pixels * self.cells_per_pixel
+        n_cells *= self.interactive_cells_ratio if self.interacting else 1.0
+        level = None
+        for i, level_model in enumerate(self._mesh_levels):
+            if level_model.n_cells >= n_cells:
+                level = i
+        return level
+
+    def build_point_levels(
+        self,
+        max_interactive_points: int = 100000,
+        factor: int = 4,
+        method: Literal["voxel", "random"] = "voxel",
+    ):
+        """
+        Build the subsampled levels of a point cloud. Each level keeps about ``1 / factor`` of the points of the previous
+        one, down to ``max_interactive_points``.
+
+        Args:
+            max_interactive_points: The maximum number of points shown while the camera is interacting.
+            factor: The subsampling factor between two levels.
+            method: Either ``'voxel'`` (one point per voxel, preserving the shape) or ``'random'``.
+        """
+        self.max_interactive_points = max_interactive_points
+        self._point_levels, self._level_models, self._level_mtimes = [], {}, {}
+        points = np.asarray(self.model.points)
+        n_target = self.model.n_points // factor
+        while self.model.n_points > max_interactive_points and n_target > 0:
+            if method == "voxel":
+                ids = voxel_subsample(points, n_target=n_target)
+            else:
+                ids = random_subsample(len(points), n_target=n_target)
+            self._point_levels.append(ids)
+            if len(ids) <= max_interactive_points:
+                break
+            n_target //= factor
+
+    def _point_level(self) -> Optional[int]:
+        """The point cloud level to show in the current state, None for full resolution."""
+        if not self.interacting or len(self._point_levels) == 0:
+            return None
+        for i, ids in enumerate(self._point_levels):
+            if len(ids) <= self.max_interactive_points:
+                return i
+        return len(self._point_levels) - 1
+
+    def _point_level_model(self, level: int) -> PolyData:
+        """The subsampled model of a level, with the point arrays of the full model gathered on the kept points."""
+        ids = self._point_levels[level]
+        if level not in self._level_models:
+            self._level_models[level] = pv.PolyData(np.asarray(self.model.points)[ids])
+            self._level_mtimes[level] = {}
+        level_model, mtimes = self._level_models[level], self._level_mtimes[level]
+
+        # Only the arrays modified since the last gather are gathered again, keeping scalars and ``obs_index`` in sync.
+        point_data = self.model.GetPointData()
+        for name in self.model.point_data.keys():
+            mtime = point_data.GetAbstractArray(name).GetMTime()
+            if mtimes.get(name) != mtime:
+                level_model.point_data[name] = np.asarray(self.model.point_data[name])[
+                    ids
+                ]
+                mtimes[name] = mtime
+        for name in set(level_model.point_data.keys()) - set(
+            self.model.point_data.keys()
+        ):
+            level_model.point_data.remove(name)
+            mtimes.pop(name, None)
+        return level_model
+
+    @property
+    def is_point_cloud(self) -> bool:
+        """Whether the model only has vertex cells."""
+        model = self.model
+        return (
+            model.GetNumberOfLines()
+            + model.GetNumberOfPolys()
+            + model.GetNumberOfStrips()
+            == 0
+        )
+
+    def set_point_filter(self, name: str, ids: Optional[np.ndarray]) -> bool:
+        """
+        Only show some points of a point cloud, as one vertex cell per shown point. The model keeps all its points and
+        arrays, only the vertex cells of the shown dataset are replaced. Points must pass all filters to be shown.
+
+        Args:
+            name: The name of the filter, e.g. ``'threshold'``.
+            ids: The ids of the points of the full-resolution model passing the filter, used without copying (e.g. a
+                 slice of a ``stviewer.pv_pipeline.SortedIndex``) and never modified. If None, the filter is removed.
+
+        Returns:
+            Whether the shown dataset changed.
+        """
+        if ids is None and name not in self._point_filters:
+            return False
+        if ids is None:
+            self._point_filters.pop(name)
+        else:
+            self._point_filters[name] = ids
+
+        filters = list(self._point_filters.values())
+        if len(filters) <= 1:
+            self._point_ids = filters[0] if filters else None
+        else:
+            counts = np.zeros(self.model.n_points, dtype=np.uint8)
+            for filter_ids in filters:
+                counts[filter_ids] += 1
+            self._point_ids = np.flatnonzero(counts == len(filters))
+        self._ids_version += 1
+        return self.update()
+
+    def axis_bounds(self, axis: int) -> tuple:
+        """The ``(min, max)`` coordinates of the model points along an axis, computed once."""
+        if axis not in self._axis_bounds:
+            coordinates = np.asarray(self.model.points)[:, axis]
+            self._axis_bounds[axis] = (
+                float(coordinates.min()),
+                float(coordinates.max()),
+            )
+        return self._axis_bounds[axis]
+
+    def coordinate_index(self, axis: int) -> SortedIndex:
+        """The sorted index of the coordinates of the model points along an axis, built once."""
+        if axis not in self._coordinate_indexes:
+            self._coordinate_indexes[axis] = SortedIndex(
+                np.asarray(self.model.points)[:, axis]
+            )
+        return self._coordinate_indexes[axis]
+
+    @property
+    def point_tree(self) -> cKDTree:
+        """The KD-tree of the model points, built the first time a point is picked."""
+        if self._point_tree is None:
+            self._point_tree = cKDTree(np.asarray(self.model.points))
+        return self._point_tree
+
+    @property
+    def shown_mask(self) -> Optional[np.ndarray]:
+        """The boolean mask of the points shown by the point filters, None if all points are shown."""
+        if self._point_ids is None:
+            return None
+        if self._shown_mask is None or self._shown_mask[0] != self._ids_version:
+            shown = np.zeros(self.model.n_points, dtype=bool)
+            shown[self._point_ids] = True
+            self._shown_mask = (self._ids_version, shown)
+        return self._shown_mask[1]
+
+    def set_clipping(
+        self, axis: Optional[int], low: float = -np.inf, high: float = np.inf
+    ) -> bool:
+        """
+        Only show the part of the model whose coordinates along an axis are within ``[low, high]``. Meshes are clipped
+        by the mapper on the GPU with up to two planes, without new geometry. Point clouds are filtered with the sorted
+        index of their coordinates along the axis, so moving the planes costs two binary searches.
+
+        Args:
+            axis: The axis, 0, 1 or 2 for x, y or z. If None, the clipping is removed.
+            low: The lower bound of the coordinates, -inf for none.
+            high: The upper bound of the coordinates, inf for none.
+
+        Returns:
+            Whether the shown dataset changed.
+        """
+        self._clipping = None if axis is None else (axis, low, high)
+        if not self.loaded:
+            # Applied once loaded
+            return False
+
+        mapper = self.actor.mapper
+        mapper.RemoveAllClippingPlanes()
+        if self.is_point_cloud:
+            ids = None
+            if axis is not None:
+                ids = self.coordinate_index(axis).range_ids(low, high)
+            return self.set_point_filter("clipping", ids)
+
+        if axis is not None:
+            normal = np.zeros(3)
+            normal[axis] = 1.0
+            for bound, sign in [(low, 1.0), (high, -1.0)]:
+                if np.isfinite(bound):
+                    # The mapper keeps the side the normal points to
+                    plane = vtkPlane()
+                    plane.SetOrigin(*(normal * bound))
+                    plane.SetNormal(*(normal * sign))
+                    mapper.AddClippingPlane(plane)
+        return True
+
+    def _filter_points(self, dataset: PolyData, level_ids=None) -> bool:
+        """Apply the shown point ids to the model or to a point level model, if not done yet."""
+        key = id(dataset)
+        if self._filtered_versions.get(key, 0) == self._ids_version:
+            return False
+        self._filtered_versions[key] = self._ids_version
+
+        ids = self._point_ids
+        if ids is not None and level_ids is not None:
+            # Only the kept points of the level that are shown, in level numbering
+            shown = np.zeros(self.model.n_points, dtype=bool)
+            shown[ids] = True
+            ids = np.flatnonzero(shown[level_ids])
+        elif ids is None and level_ids is not None:
+            ids = np.arange(len(level_ids))
+
+        if ids is None:
+            if self._model_verts is None:
+                return False
+            dataset.SetVerts(self._model_verts)
+            return True
+        if dataset is self.model and self._model_verts is None:
+            self._model_verts = dataset.GetVerts()
+        if len(self._vertex_offsets) <= len(ids):
+            self._vertex_offsets = np.arange(dataset.n_points + 1, dtype=np.int64)
+        dataset.SetVerts(vertex_cells(ids, offsets=self._vertex_offsets))
+        return True
+
+    def _payload_model(self, dataset: PolyData) -> PolyData:
+        """
+        The slim copy of a dataset sent to the browser: float32 points, the cells and normals of ``dataset`` and only
+        the array colored by the mapper, compacted with ``compact_array``. Arrays are only gathered again once modified,
+        so unchanged geometry keeps the hash of its arrays and is not sent twice.
+        """
+        if not isinstance(dataset, PolyData):
+            return dataset
+        key = id(dataset)
+        if key not in self._payload_models:
+            payload = pv.PolyData(np.asarray(dataset.points, dtype=np.float32))
+            payload.SetVerts(dataset.GetVerts())
+            payload.SetLines(dataset.GetLines())
+            payload.SetPolys(dataset.GetPolys())
+            payload.SetStrips(dataset.GetStrips())
+            payload.GetPointData().SetNormals(dataset.GetPointData().GetNormals())
+            self._payload_models[key] = (payload, {})
+        payload, mtimes = self._payload_models[key]
+        if payload.GetVerts() is not dataset.GetVerts():
+            # The shown points were filtered, see ``set_point_filter``
+            payload.SetVerts(dataset.GetVerts())
+
+        mapper = self.actor.mapper
+        name = mapper.GetArrayName() if mapper.GetScalarVisibility() else None
+        point_data = dataset.GetPointData()
+        if name is not None and point_data.GetAbstractArray(name) is not None:
+            mtime = point_data.GetAbstractArray(name).GetMTime()
+            if mtimes.get(name) != mtime:
+                payload.point_data[name] = compact_array(
+                    np.asarray(dataset.point_data[name])
+                )
+                mtimes[name] = mtime
+        for stale in set(mtimes) - {name}:
+            payload.point_data.remove(stale)
+            mtimes.pop(stale)
+        return payload
+
+    def update(self) -> bool:
+        """
+        Set the mapper input of the actor according to the current state.
+
+        Returns:
+            Whether the mapper input changed.
+        """
+        point_level, mesh_level = self._point_level(), self._mesh_level()
+        if point_level is not None:
+            shown = self._point_level_model(point_level)
+            filtered = self._filter_points(
+                shown, level_ids=self._point_levels[point_level]
+            )
+        elif mesh_level is not None:
+            shown, filtered = self._mesh_levels[mesh_level], False
+        else:
+            shown = self.model
+            filtered = self._filter_points(shown)
+        if self.local_rendering:
+            shown = self._payload_model(shown)
+        if shown is self._shown:
+            return filtered
+        self.actor.mapper.SetInputData(shown)
+        self._shown = shown
+        return True
+
+    def set_interacting(self, interacting: bool) -> bool:
+        """
+        Switch between the coarse level shown while the camera is interacting and the full resolution.
+
+        Returns:
+            Whether the mapper input changed.
+        """
+        self.interacting = interacting
+        return self.update()
+
+    def set_local_rendering(self, local_rendering: bool) -> bool:
+        """
+        Switch between the datasets rendered on the server and their slim copies sent to the browser.
+
+        Returns:
+            Whether the mapper input changed.
+        """
+        self.local_rendering = local_rendering
+        return self.update()
+
+
+# Displays are dropped with their actor, e.g. once the plotter of a closed session is collected
+_DISPLAYS = weakref.WeakKeyDictionary()
+
+
+def get_display(actor) -> ActorDisplay:
+    """
+    Get the ActorDisplay of an actor, creating it on first use.
+
+    Args:
+        actor: The actor.
+
+    Returns:
+        The ActorDisplay of the actor.
+    """
+    if actor not in _DISPLAYS:
+        _DISPLAYS[actor] = ActorDisplay(actor=actor)
+    return _DISPLAYS[actor]
+
+
+def set_interacting(plotter: Plotter, interacting: bool) -> bool:
+    """
+    Switch all actors of a plotter between their interactive and still levels of detail.
+
+    Args:
+        plotter: The plotting object.
+        interacting: Whether the camera is interacting.
+
+    Returns:
+        Whether any mapper input changed.
+    """
+    changed = False
+    for actor in plotter.renderer.actors.values():
+        # Hidden actors are not switched to a coarse level, but always back to full resolution.
+        if actor in _DISPLAYS and (actor.GetVisibility() or not interacting):
+            display = _DISPLAYS[actor]
+            display.viewport_pixels = int(np.prod(plotter.window_size))
+            changed = display.set_interacting(interacting) or changed
+    return changed
+
+
+def set_local_rendering(plotter: Plotter, local_rendering: bool) -> bool:
+    """
+    Switch all actors of a plotter between server and client rendering. Hidden actors are not exported by the view,
+    their slim copies are only built once they are shown, see ``update_visibility``.
+
+    Args:
+        plotter: The plotting object.
+        local_rendering: Whether the scene is rendered in the browser.
+
+    Returns:
+        Whether any mapper input changed.
+    """
+    changed = False
+    for actor in plotter.renderer.actors.values():
+        if actor in _DISPLAYS:
+            display = _DISPLAYS[actor]
+            if actor.GetVisibility() or not local_rendering:
+                changed = display.set_local_rendering(local_rendering) or changed
+            else:
+                display.local_rendering = local_rendering
+    return changed
+
+
+def clipping_bounds(plotter: Plotter, axis: int) -> tuple:
+    """
+    Get the ``(min, max)`` coordinates along an axis of the loaded models of a plotter.
+
+    Args:
+        plotter: The plotting object.
+        axis: The axis, 0, 1 or 2 for x, y or z.
+
+    Returns:
+        The bounds, ``(0, 1)`` without any loaded model.
+    """
+    bounds = [
+        _DISPLAYS[actor].axis_bounds(axis)
+        for actor in plotter.renderer.actors.values()
+        if actor in _DISPLAYS and _DISPLAYS[actor].loaded
+    ]
+    if len(bounds) == 0:
+        return 0.0, 1.0
+    return min(b[0] for b in bounds), max(b[1] for b in bounds)
+
+
+def set_clipping(
+    plotter: Plotter,
+    axis: Optional[int],
+    low: float = -np.inf,
+    high: float = np.inf,
+) -> bool:
+    """
+    Clip all actors of a plotter along an axis, see ``ActorDisplay.set_clipping``. Lazy actors are clipped once loaded.
+
+    Args:
+        plotter: The plotting object.
+        axis: The axis, 0, 1 or 2 for x, y or z. If None, the clipping is removed.
+        low: The lower bound of the coordinates, -inf for none.
+        high: The upper bound of the coordinates, inf for none.
+
+    Returns:
+        Whether any shown dataset changed.
+    """
+    changed = False
+    for actor in plotter.renderer.actors.values():
+        if actor in _DISPLAYS:
+            changed = _DISPLAYS[actor].set_clipping(axis, low, high) or changed
+    return changed
+
+
+def pick_point(
+    plotter: Plotter,
+    position=None,
+    size=None,
+    world_position=None,
+    tolerance: float = 5,
+) -> Optional[tuple]:
+    """
+    Pick a shown point of the visible point clouds of a plotter, with the KD-tree of each point cloud. Nothing is
+    rendered: with server rendering the ray of a display position is searched, with client rendering the browser picks
+    the world position on the rendered points and the nearest model point is looked up.
+
+    Args:
+        plotter: The plotting object.
+        position: The ``(x, y)`` display position in pixels from the bottom left corner of the view.
+        size: The ``(width, height)`` of the view in pixels. If None, the window size of the plotter is used.
+        world_position: The picked world position, used instead of ``position`` if given.
+        tolerance: The maximum distance in pixels between the position and the picked point.
+
+    Returns:
+        The actor and the id of the picked point in its model, or None if no point is close enough.
+    """
+    size = plotter.window_size if size is None else size
+    matrix = camera_matrix(plotter.camera, aspect=size[0] / size[1])
+    if world_position is not None:
+        radius = pixel_radius(matrix, world_position, size, pixels=tolerance)
+
+    picked, closest = None, np.inf
+    for actor in plotter.renderer.actors.values():
+        if not (actor in _DISPLAYS and actor.GetVisibility()):
+            continue
+        display = _DISPLAYS[actor]
+        if not (display.loaded and display.is_point_cloud):
+            continue
+        if world_position is None:
+            hit = pick_ray(
+                display.point_tree,
+                np.asarray(display.model.points),
+                matrix,
+                position=position,
+                size=size,
+                tolerance=tolerance,
+                shown=display.shown_mask,
+            )
+        else:
+            hit = pick_nearest(
+                display.point_tree,
+                world_position,
+                radius=radius,
+                shown=display.shown_mask,
+            )
+        # The closest to the camera, or to the world position
+        if hit is not None and hit[1] < closest:
+            picked, closest = (actor, hit[0]), hit[1]
+    return picked
+
+
+def select_points(
+    plotter: Plotter,
+    box: Optional[tuple] = None,
+    frustum=None,
+    size=None,
+) -> dict:
+    """
+    Select the shown points of the visible point clouds of a plotter within a box on the display. All points are
+    projected at once through the camera matrix, without rendering.
+
+    Args:
+        plotter: The plotting object.
+        box: The ``(x_min, x_max, y_min, y_max)`` box in pixels from the bottom left corner of the view.
+        frustum: The 8 world corners of a box selected in the browser, used instead of the display if given, see
+                 ``select_frustum``.
+        size: The ``(width, height)`` of the view in pixels. If None, the window size of the plotter is used.
+
+    Returns:
+        The ids of the selected points in the model of each point cloud with selected points.
+    """
+    size = plotter.window_size if size is None else size
+    matrix = camera_matrix(plotter.camera, aspect=size[0] / size[1])
+
+    selections = {}
+    for actor in plotter.renderer.actors.values():
+        if not (actor in _DISPLAYS and actor.GetVisibility()):
+            continue
+        display = _DISPLAYS[actor]
+        if not (display.loaded and display.is_point_cloud):
+            continue
+        points = np.asarray(display.model.points)
+        if frustum is not None:
+            selected = select_frustum(points, frustum)
+        else:
+            projected = project_points(points, matrix, size)
+            selected = select_projected(projected, box=box)
+        if display.shown_mask is not None:
+            selected &= display.shown_mask
+        ids = np.flatnonzero(selected)
+        if len(ids) > 0:
+            selections[actor] = ids
+    return selections
+
+
+def update_visibility(actor, visibility: bool) -> bool:
+    """
+    Show or hide an actor. Lazy actors are loaded the first time they become visible, and the shown dataset is
+    refreshed.
+
+    Args:
+        actor: The actor.
+        visibility: Whether the actor is visible.
+
+    Returns:
+        Whether the mapper input changed.
+    """
+    actor.SetVisibility(visibility)
+    if not (visibility and actor in _DISPLAYS):
+        return False
+    display = _DISPLAYS[actor]
+    return display.load() or display.update()
@@ -0,0 +1,80 @@
+from typing import Optional
+
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonDataModel import vtkCellArray
+
+# -----------------------------------------------------------------------------
+# Point filters
+# -----------------------------------------------------------------------------
+
+
+def vertex_cells(ids: np.ndarray, offsets: Optional[np.ndarray] = None) -> vtkCellArray:
+    """
+    Build one vertex cell per point id, without copying the ids.
+
+    Args:
+        ids: The point ids, in any order.
+        offsets: ``np.arange(n + 1)`` for any ``n >= len(ids)``, reused across calls. If None, it is created.
+
+    Returns:
+        The vertex cells, whose connectivity is a view of ``ids``.
+    """
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    offsets = np.arange(len(ids) + 1) if offsets is None else offsets
+    cells = vtkCellArray()
+    cells.SetData(
+        numpy_support.numpy_to_vtkIdTypeArray(
+            np.ascontiguousarray(offsets[: len(ids) + 1], dtype=np.int64), deep=False
+        ),
+        numpy_support.numpy_to_vtkIdTypeArray(ids, deep=False),
+    )
+    return cells
+
+
+class SortedIndex:
+    """A sorted index of a per-point array, answering range queries with two binary searches."""
+
+    def __init__(self, values: np.ndarray):
+        """
+        Initialize SortedIndex. Sorting costs O(n log n) once, NaN values are never returned.
+
+        Args:
+            values: The per-point values.
+        """
+        values = np.asarray(values)
+        self.order = np.argsort(values, kind="stable").astype(np.int64, copy=False)
+        self.sorted_values = values[self.order]
+        n_nan = (
+            int(np.count_nonzero(np.isnan(values))) if values.dtype.kind == "f" else 0
+        )
+        self._n_valid = len(values) - n_nan
+
+    def __len__(self):
+        return len(self.order)
+
+    @property
+    def bounds(self) -> tuple:
+        """The ``(min, max)`` of the values, NaN excluded."""
+        if self._n_valid == 0:
+            return 0.0, 0.0
+        return (
+            float(self.sorted_values[0]),
+            float(self.sorted_values[self._n_valid - 1]),
+        )
+
+    def range_ids(self, low: float, high: float) -> np.ndarray:
+        """
+        Get the point ids whose value is within ``[low, high]`` in O(log n).
+
+        Args:
+            low: The lower bound.
+            high: The upper bound.
+
+        Returns:
+            The ids, a view of the index ordered by value; it must not be modified.
+        """
+        valid = self.sorted_values[: self._n_valid]
+        start = np.searchsorted(valid, low, side="left")
+        end = np.searchsorted(valid, high, side="right")
+        return self.order[start : max(start, end)]
@@ -0,0 +1,243 @@
+from typing import Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# -----------------------------------------------------------------------------
+# Camera projection
+# -----------------------------------------------------------------------------
+
+
+def camera_matrix(camera, aspect: float) -> np.ndarray:
+    """
+    Get the matrix projecting world coordinates onto normalized device coordinates in [-1, 1].
+
+    Args:
+        camera: The camera of the renderer.
+        aspect: The width over the height of the view.
+
+    Returns:
+        The 4x4 composite projection matrix of the camera.
+    """
+    vtk_matrix = camera.GetCompositeProjectionTransformMatrix(aspect, -1, 1)
+    return np.array([[vtk_matrix.GetElement(i, j) for j in range(4)] for i in range(4)])
+
+
+def project_points(points: np.ndarray, matrix: np.ndarray, size) -> np.ndarray:
+    """
+    Project points onto the display, vectorized over all points.
+
+    Args:
+        points: The ``(n, 3)`` world coordinates.
+        matrix: The composite projection matrix, see ``camera_matrix``.
+        size: The ``(width, height)`` of the view in pixels.
+
+    Returns:
+        The ``(n, 3)`` display coordinates: x and y in pixels from the bottom left corner, and the depth in [-1, 1].
+    """
+    points = np.asarray(points, dtype=np.float64)
+    projected = points @ matrix[:3, :3].T + matrix[:3, 3]
+    w = points @ matrix[3, :3] + matrix[3, 3]
+    projected /= w[:, None]
+    projected[:, 0] = (projected[:, 0] + 1) * (0.5 * size[0])
+    projected[:, 1] = (projected[:, 1] + 1) * (0.5 * size[1])
+    return projected
+
+
+def display_ray(matrix: np.ndarray, position, size) -> tuple:
+    """
+    Get the ray of the world points projected onto a display position.
+
+    Args:
+        matrix: The composite projection matrix, see ``camera_matrix``.
+        position: The ``(x, y)`` display position in pixels from the bottom left corner.
+        size: The ``(width, height)`` of the view in pixels.
+
+    Returns:
+        The world points of the ray on the near and the far clipping planes.
+    """
+    x = 2.0 * position[0] / size[0] - 1
+    y = 2.0 * position[1] / size[1] - 1
+    ends = np.linalg.solve(matrix, np.array([[x, y, -1.0, 1.0], [x, y, 1.0, 1.0]]).T).T
+    ends = ends[:, :3] / ends[:, 3:]
+    return ends[0], ends[1]
+
+
+def pixel_radius(matrix: np.ndarray, world_position, size, pixels: float) -> float:
+    """The world distance covered by ``pixels`` pixels on the display at the depth of a world position."""
+    x, y, depth = project_points(np.asarray([world_position]), matrix, size)[0]
+    ndc = np.array([2.0 * (x + pixels) / size[0] - 1, 2.0 * y / size[1] - 1, depth, 1])
+    side = np.linalg.solve(matrix, ndc)
+    return float(np.linalg.norm(side[:3] / side[3] - np.asarray(world_position)))
+
+
+# -----------------------------------------------------------------------------
+# Point picking
+# -----------------------------------------------------------------------------
+
+
+def _segment_in_box(near: np.ndarray, far: np.ndarray, mins, maxes) -> Optional[tuple]:
+    # Slab method: the part of the segment within the box, as fractions of the segment
+    direction = far - near
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t0 = (np.asarray(mins) - near) / direction
+        t1 = (np.asarray(maxes) - near) / direction
+    inside = (near >= mins) & (near <= maxes)
+    t0 = np.where(direction == 0, np.where(inside, -np.inf, np.inf), t0)
+    t1 = np.where(direction == 0, np.where(inside, np.inf, -np.inf), t1)
+    start = max(0.0, float(np.max(np.minimum(t0, t1))))
+    end = min(1.0, float(np.min(np.maximum(t0, t1))))
+    return None if start > end else (start, end)
+
+
+def pick_ray(
+    tree: cKDTree,
+    points: np.ndarray,
+    matrix: np.ndarray,
+    position,
+    size,
+    tolerance: float = 5,
+    shown: Optional[np.ndarray] = None,
+    max_balls: int = 1024,
+) -> Optional[tuple]:
+    """
+    Pick the point closest to the camera among the points displayed within ``tolerance`` pixels of a display
+    position, without rendering.
+
+    The ray of the position is covered with balls of the KD-tree, wide enough to hold the cone of the tolerance; only
+    the points in these balls are projected onto the display.
+
+    Args:
+        tree: The KD-tree of the points.
+        points: The ``(n, 3)`` world coordinates of the points.
+        matrix: The composite projection matrix, see ``camera_matrix``.
+        position: The ``(x, y)`` display position in pixels from the bottom left corner.
+        size: The ``(width, height)`` of the view in pixels.
+        tolerance: The maximum distance in pixels between the position and the picked point.
+        shown: A boolean mask of the points that can be picked. If None, all points can.
+        max_balls: The maximum number of balls queried along the ray.
+
+    Returns:
+        The id of the picked point and its depth in [-1, 1], or None if no point is close enough.
+    """
+    near, far = display_ray(matrix, position, size)
+    segment = _segment_in_box(near, far, tree.mins, tree.maxes)
+    if segment is None:
+        return None
+    start, end = near + segment[0] * (far - near), near + segment[1] * (far - near)
+
+    # World size of the tolerance along the segment, the widest at one of its ends
+    side_near, side_far = display_ray(
+        matrix, (position[0] + tolerance, position[1]), size
+    )
+    offset_near, offset_far = side_near - near, side_far - far
+    radius = max(
+        float(np.linalg.norm(offset_near + t * (offset_far - offset_near)))
+        for t in segment
+    )
+    # Balls along the segment, at most ``max_balls``, whose union holds the cylinder of that radius
+    length = float(np.linalg.norm(end - start))
+    n_balls = int(min(max_balls, np.ceil(length / max(radius, 1e-12)) + 1))
+    step = length / max(n_balls - 1, 1)
+    ids = tree.query_ball_point(
+        np.linspace(start, end, n_balls), r=float(np.hypot(radius, step / 2))
+    )
+    ids = np.unique(np.concatenate([np.asarray(i, dtype=np.intp) for i in ids]))
+    if shown is not None and len(ids) > 0:
+        ids = ids[shown[ids]]
+    if len(ids) == 0:
+        return None
+
+    projected = project_points(points[ids], matrix, size)
+    distances = np.hypot(projected[:, 0] - position[0], projected[:, 1] - position[1])
+    hits = np.flatnonzero(
+        (distances <= tolerance) & (projected[:, 2] >= -1) & (projected[:, 2] <= 1)
+    )
+    if len(hits) == 0:
+        return None
+    hit = hits[np.argmin(projected[hits, 2])]
+    return int(ids[hit]), float(projected[hit, 2])
+
+
+def pick_nearest(
+    tree: cKDTree,
+    world_position,
+    radius: float,
+    shown: Optional[np.ndarray] = None,
+    k: int = 16,
+) -> Optional[tuple]:
+    """
+    Pick the point nearest to a world position, e.g. the position picked on the points rendered in the browser.
+
+    Args:
+        tree: The KD-tree of the points.
+        world_position: The world position.
+        radius: The maximum distance between the position and the picked point.
+        shown: A boolean mask of the points that can be picked. If None, all points can.
+        k: The number of nearest points looked at first. It grows until a shown point is found within ``radius``.
+
+    Returns:
+        The id of the picked point and its distance, or None if no point is close enough.
+    """
+    k = min(k, tree.n)
+    while k > 0:
+        distances, ids = tree.query(world_position, k=k, distance_upper_bound=radius)
+        distances, ids = np.atleast_1d(distances), np.atleast_1d(ids)
+        found = ids < tree.n
+        if shown is not None:
+            found[found] = shown[ids[found]]
+        if np.any(found):
+            hit = np.argmax(found)
+            return int(ids[hit]), float(distances[hit])
+        if k == tree.n or np.isinf(distances[-1]):
+            # All points within the radius were looked at
+            return None
+        k = min(k * 16, tree.n)
+    return None
+
+
+# -----------------------------------------------------------------------------
+# Point selection
+# -----------------------------------------------------------------------------
+
+
+def select_projected(projected: np.ndarray, box: tuple) -> np.ndarray:
+    """
+    Select projected points within a box on the display, vectorized over all points.
+
+    Args:
+        projected: The display coordinates of the points, see ``project_points``.
+        box: The ``(x_min, x_max, y_min, y_max)`` box in pixels.
+
+    Returns:
+        The boolean mask of the selected points. Points behind the camera or beyond the clipping range are never
+        selected.
+    """
+    x, y, depth = projected[:, 0], projected[:, 1], projected[:, 2]
+    x_min, x_max, y_min, y_max = box
+    selected = (depth >= -1) & (depth <= 1)
+    selected &= (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+    return selected
+
+
+def select_frustum(points: np.ndarray, frustum) -> np.ndarray:
+    """
+    Select the points within the frustum of a box selected in the browser, vectorized over all points.
+
+    Args:
+        points: The ``(n, 3)`` world coordinates of the points.
+        frustum: The 8 world corners of the frustum, near and far for each corner of the box:
+                 ``(x0, y0)``, ``(x0, y1)``, ``(x1, y0)`` and ``(x1, y1)``.
+
+    Returns:
+        The boolean mask of the points within the 4 side planes of the frustum.
+    """
+    corners = np.asarray(frustum, dtype=np.float64)
+    center = corners.mean(axis=0)
+    selected = np.ones(len(points), dtype=bool)
+    for a, b, c in [(0, 1, 2), (4, 5, 6), (0, 1, 4), (2, 3, 6)]:
+        normal = np.cross(corners[b] - corners[a], corners[c] - corners[a])
+        # Oriented towards the inside of the frustum
+        normal *= np.sign(np.dot(center - corners[a], normal))
+        selected &= (np.asarray(points) - corners[a]) @ normal >= 0
+    return selected
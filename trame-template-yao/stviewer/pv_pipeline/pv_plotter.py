@@ -1,6 +1,8 @@
-from typing import Optional, Union
+import weakref
+from typing import Callable, Optional, Union
 
 import matplotlib as mpl
+import numpy as np
 
 import pyvista as pv
 from pyvista import Plotter, PolyData, UnstructuredGrid
@@ -10,6 +12,8 @@ try:
 except ImportError:
     from typing_extensions import Literal
 
+from .pv_display import get_display
+
 
 def create_plotter(
     window_size: tuple = (1024, 1024), background: str = "black", **kwargs
@@ -92,3 +96,71 @@ def add_single_model(
     )
     actor = plotter.add_mesh(model, **mesh_kwargs)
     return actor
+
+
+# The mapping state of a mapper moved from the placeholder of a lazy model to its loaded mapper, as (getter, setter)
+_MAPPER_STATE = [
+    ("GetScalarVisibility", "SetScalarVisibility"),
+    ("GetScalarRange", "SetScalarRange"),
+    ("GetArrayName", "SelectColorArray"),
+    ("GetColorMode", "SetColorMode"),
+    ("GetScalarMode", "SetScalarMode"),
+]
+
+
+def _mapper_state(mapper) -> list:
+    # The arguments of each setter of ``_MAPPER_STATE``
+    state = []
+    for getter, _ in _MAPPER_STATE:
+        value = getattr(mapper, getter)()
+        state.append(tuple(value) if isinstance(value, tuple) else (value,))
+    return state
+
+
+def add_lazy_model(
+    plotter: Plotter,
+    loader: Callable[[], Union[PolyData, UnstructuredGrid]],
+    **kwargs,
+):
+    """
+    Add a hidden actor whose model is only read, uploaded and mapped the first time the actor is shown, see
+    ``stviewer.pv_pipeline.update_visibility``. Until then the actor maps a single point.
+
+    Args:
+        plotter: The plotting object to display pyvista/vtk model.
+        loader: A function without argument that reads the model, e.g. ``functools.partial(pv.read, filename)``.
+        kwargs: Additional parameters that will be passed to ``add_single_model`` function.
+
+    Returns:
+        The actor.
+    """
+    actor = add_single_model(
+        plotter=plotter, model=pv.PolyData(np.zeros(shape=(1, 3))), **kwargs
+    )
+    actor.SetVisibility(False)
+
+    # The display of the actor holds the loader, which must not keep the actor or its plotter alive
+    plotter_ref = weakref.ref(plotter)
+    # The mapping state of the placeholder, to find what was changed before the model is loaded, e.g. the colormap
+    mapper_state = _mapper_state(actor.mapper)
+    lut_mtime = actor.mapper.lookup_table.GetMTime()
+
+    def _load(actor):
+        # The model is added like any other one, then its mapper is moved into the placeholder actor, whose properties
+        # may have been changed in the meantime. So may have been its mapping: the changes are moved too.
+        plotter = plotter_ref()
+        loaded_actor = add_single_model(plotter=plotter, model=loader(), **kwargs)
+        plotter.remove_actor(loaded_actor, render=False)
+        placeholder_mapper, mapper = actor.mapper, loaded_actor.mapper
+        if placeholder_mapper.lookup_table.GetMTime() > lut_mtime:
+            mapper.lookup_table = placeholder_mapper.lookup_table
+        for (_, setter), value, changed_value in zip(
+            _MAPPER_STATE, mapper_state, _mapper_state(placeholder_mapper)
+        ):
+            if changed_value != value:
+                getattr(mapper, setter)(*changed_value)
+        actor.mapper = mapper
+        return actor.mapper.dataset
+
+    get_display(actor).set_loader(_load)
+    return actor
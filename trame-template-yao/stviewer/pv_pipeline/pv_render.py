@@ -0,0 +1,70 @@
+import asyncio
+import time
+from typing import Callable
+
+from .pv_timing import get_timings
+
+# -----------------------------------------------------------------------------
+# Render scheduler
+# -----------------------------------------------------------------------------
+
+
+class RenderScheduler:
+    """Coalesce all view updates requested within a frame into a single render, capped at ``max_fps``."""
+
+    def __init__(self, update: Callable, max_fps: float = 30):
+        """
+        Initialize RenderScheduler.
+
+        Args:
+            update: The function that actually updates the view, e.g. ``view.update`` of a trame view.
+            max_fps: The maximum number of renders per second.
+        """
+        self._update = update
+        self.max_fps = max_fps
+        self._handle = None
+        self._kwargs = {}
+        self._last_render = 0.0
+        self.n_requests = 0
+        self.n_renders = 0
+
+    @property
+    def pending(self) -> bool:
+        """Whether a render is scheduled."""
+        return self._handle is not None
+
+    def request(self, **kwargs):
+        """
+        Request a view update. Requests made before the scheduled render are merged into it.
+
+        Args:
+            kwargs: Additional parameters that will be passed to ``update``.
+        """
+        self.n_requests += 1
+        self._kwargs.update(kwargs)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Without a running event loop (e.g. before the server starts), render right away.
+            self.flush()
+            return
+
+        if self._handle is None:
+            delay = self._last_render + 1.0 / self.max_fps - time.perf_counter()
+            self._handle = loop.call_later(max(delay, 0.0), self.flush)
+
+    def flush(self):
+        """Render now if anything was requested, cancelling the scheduled render."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        kwargs, self._kwargs = self._kwargs, {}
+        self._last_render = time.perf_counter()
+        self.n_renders += 1
+        with get_timings().measure("view_update:flush"):
+            self._update(**kwargs)
+
+    @property
+    def stats(self) -> dict:
+        """Get the number of requested and executed renders."""
+        return {"requests": self.n_requests, "renders": self.n_renders}
@@ -0,0 +1,930 @@
+try:
+    from typing import Literal
+except ImportError:
+    from typing_extensions import Literal
+
+import asyncio
+import re
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from threading import Lock
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from anndata import AnnData
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from ..dataset import QUANTILES, BackedStore, GeneStore, column_quantiles
+
+# -----------------------------------------------------------------------------
+# Matrix access
+# -----------------------------------------------------------------------------
+
+
+def column_positions(var_names, key: str) -> np.ndarray:
+    """
+    Get the column positions of a var name. Duplicated var names yield several positions.
+
+    Args:
+        var_names: The ``var_names`` index of the AnnData object.
+        key: The var name.
+
+    Returns:
+        The positions of all columns named ``key``.
+    """
+    loc = var_names.get_loc(key)
+    if isinstance(loc, (int, np.integer)):
+        return np.asarray([loc], dtype=np.intp)
+    return np.arange(len(var_names), dtype=np.intp)[loc]
+
+
+def take_column(matrix, col: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Extract a single column of an expression matrix as a dense array without copying the matrix.
+
+    Args:
+        matrix: A dense array or a scipy CSC/CSR matrix, e.g. ``adata.X`` or ``adata.layers[layer]``.
+        col: The column position.
+        rows: Row positions to gather from the column. If None, all rows are returned.
+
+    Returns:
+        The dense column values (of the given rows).
+    """
+    if sparse.issparse(matrix) and matrix.format == "csc":
+        start, end = matrix.indptr[col], matrix.indptr[col + 1]
+        column = np.zeros(matrix.shape[0], dtype=matrix.dtype)
+        if matrix.has_canonical_format:
+            column[matrix.indices[start:end]] = matrix.data[start:end]
+        else:
+            # Duplicated entries are summed, like scipy
+            np.add.at(column, matrix.indices[start:end], matrix.data[start:end])
+    elif sparse.issparse(matrix) and matrix.format == "csr":
+        # A single vectorized pass over all column indices, O(nnz) per column: prefer a CSC copy for repeated reads,
+        # see ``ScalarResolver.get_column_matrix``. The rows of the hits follow from ``indptr``.
+        hits = np.flatnonzero(matrix.indices == col)
+        column = np.zeros(matrix.shape[0], dtype=matrix.dtype)
+        np.add.at(
+            column,
+            np.searchsorted(matrix.indptr, hits, side="right") - 1,
+            matrix.data[hits],
+        )
+    elif sparse.issparse(matrix):
+        column = matrix.getcol(col).toarray().ravel()
+    else:
+        column = np.asarray(matrix[:, col]).ravel()
+    return column if rows is None else column[rows]
+
+
+def take_columns(matrix, cols: np.ndarray):
+    """
+    Extract several columns of an expression matrix at once.
+
+    Args:
+        matrix: A dense array or a scipy sparse matrix, e.g. ``adata.X`` or ``adata.layers[layer]``.
+        cols: The column positions.
+
+    Returns:
+        A CSC matrix of the columns for sparse matrices, a dense array otherwise.
+    """
+    if sparse.issparse(matrix):
+        # A single pass over the nonzeros for CSR matrices, slices of the columns for CSC matrices
+        return sparse.csc_matrix(matrix[:, cols])
+    return np.asarray(matrix[:, cols])
+
+
+def take_row(matrix, row: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extract the nonzeros of a single row of an expression matrix without copying the matrix.
+
+    Args:
+        matrix: A dense array or a scipy sparse matrix, e.g. ``adata.X`` or ``adata.layers[layer]``.
+        row: The row position.
+
+    Returns:
+        cols: The column positions of the nonzeros.
+        values: Their values.
+    """
+    if sparse.issparse(matrix) and matrix.format == "csr":
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        return matrix.indices[start:end], matrix.data[start:end]
+    elif sparse.issparse(matrix) and matrix.format == "csc":
+        # A single vectorized pass over the row indices; the columns of the hits follow from ``indptr``.
+        hits = np.flatnonzero(matrix.indices == row)
+        return np.searchsorted(matrix.indptr, hits, side="right") - 1, matrix.data[hits]
+    elif sparse.issparse(matrix):
+        matrix = matrix.getrow(row).toarray().ravel()
+    else:
+        matrix = np.asarray(matrix[row]).ravel()
+    cols = np.flatnonzero(matrix)
+    return cols, matrix[cols]
+
+
+def weighted_column_sums(matrix, weights: np.ndarray) -> np.ndarray:
+    """
+    Sum every column of an expression matrix weighted per row, as a single (sparse) matrix product.
+
+    Args:
+        matrix: A dense array or a scipy sparse matrix, e.g. ``adata.X`` or ``adata.layers[layer]``.
+        weights: The ``(n_rows, k)`` weights.
+
+    Returns:
+        The ``(n_cols, k)`` weighted sums.
+    """
+    if sparse.issparse(matrix):
+        return np.asarray(matrix.T @ weights)
+    return np.asarray(matrix).T @ weights
+
+
+def rank_genes(
+    means: np.ndarray, var_names, n_genes: int = 20, pseudocount: float = 1.0
+) -> list:
+    """
+    Rank genes by their log fold change between a group of cells and a reference.
+
+    Args:
+        means: The ``(n_genes, 2)`` mean expression of each gene in the group and in the reference.
+        var_names: The var names.
+        n_genes: The number of genes.
+        pseudocount: Added to the means before their ratio, so that genes absent from the reference stay finite.
+
+    Returns:
+        The top genes by decreasing log2 fold change, with their means and the difference of their means.
+    """
+    log_fold_changes = np.log2(
+        (means[:, 0] + pseudocount) / (means[:, 1] + pseudocount)
+    )
+    n_genes = min(n_genes, len(log_fold_changes))
+    top = np.argpartition(-log_fold_changes, n_genes - 1)[:n_genes]
+    top = top[np.argsort(-log_fold_changes[top], kind="stable")]
+    return [
+        dict(
+            name=str(var_names[col]),
+            mean=float(means[col, 0]),
+            reference_mean=float(means[col, 1]),
+            mean_difference=float(means[col, 0] - means[col, 1]),
+            log_fold_change=float(log_fold_changes[col]),
+        )
+        for col in top
+    ]
+
+
+SCORES = ["sum", "mean", "zscore"]
+
+# Ranges of the lookup tables, as quantile levels of the scalars
+CLIPS = {"min-max": (0.0, 1.0), "1-99%": (0.01, 0.99), "5-95%": (0.05, 0.95)}
+
+
+def clip_range(array, clim, clip: str = "min-max", robust_range=None) -> tuple:
+    """
+    Get the range of the lookup table of a resolved array.
+
+    Robust ranges collapse onto a single value for genes detected in fewer cells than their lower quantile, e.g. a
+    gene detected in 0.5% of the cells has both 1-99% quantiles at 0; the ``(min, max)`` range is used instead.
+
+    Args:
+        array: The resolved array.
+        clim: The ``(min, max)`` range of the resolved array, i.e. of the cells of the actor.
+        clip: The range, one of ``CLIPS``.
+        robust_range: The precomputed ``(low, high)`` quantiles of ``clip``, e.g. across all cells, see
+                      ``ScalarResolver.gene_range``. If None, the quantiles of ``array`` are used.
+
+    Returns:
+        The ``(low, high)`` range.
+    """
+    if clip == "min-max" or not np.issubdtype(np.asarray(array).dtype, np.number):
+        return tuple(clim)
+    if robust_range is None:
+        robust_range = np.quantile(array, CLIPS[clip])
+    low, high = (float(v) for v in robust_range)
+    return tuple(clim) if low >= high else (low, high)
+
+
+def matrix_quantiles(matrix, quantiles=QUANTILES) -> np.ndarray:
+    """
+    Compute quantiles of every column of an expression matrix, vectorized over all columns.
+
+    Args:
+        matrix: A dense array or a scipy sparse matrix. Canonical CSC matrices are read as is, other sparse matrices
+                are copied to CSC.
+        quantiles: The quantile levels in [0, 1].
+
+    Returns:
+        The quantiles, one row per level and one column per matrix column.
+    """
+    if sparse.issparse(matrix):
+        if not (matrix.format == "csc" and matrix.has_canonical_format):
+            matrix = sparse.csc_matrix(matrix)
+            matrix.sum_duplicates()
+        return column_quantiles(
+            matrix.indptr, matrix.data, n_rows=matrix.shape[0], quantiles=quantiles
+        )
+    return np.quantile(np.asarray(matrix), quantiles, axis=0).astype(np.float32)
+
+
+def module_score(columns, score: Literal["sum", "mean", "zscore"] = "mean"):
+    """
+    Score each cell over the columns of a gene set, as a single (sparse) matrix-vector product.
+
+    Args:
+        columns: The dense or sparse columns of the genes, see ``take_columns``.
+        score: The score of each cell:
+
+                * ``'sum'``: the sum of the expression of the genes.
+                * ``'mean'``: the mean expression of the genes.
+                * ``'zscore'``: the mean over the genes of the expression standardized across all cells. Genes
+                  without variance count as zero.
+
+    Returns:
+        The score of each row of ``columns``.
+    """
+    n_genes = columns.shape[1]
+    weights, offset = np.ones(n_genes, dtype=np.float64), 0.0
+    if score == "mean":
+        weights /= n_genes
+    elif score == "zscore":
+        # sum_g (x_g - mean_g) / (std_g * n) = x @ (1 / (std * n)) - sum_g mean_g / (std_g * n)
+        squares = columns.power(2) if sparse.issparse(columns) else columns ** 2
+        mean = np.asarray(columns.mean(axis=0), dtype=np.float64).ravel()
+        var = np.asarray(squares.mean(axis=0), dtype=np.float64).ravel() - mean**2
+        std = np.sqrt(np.maximum(var, 0))
+        weights = np.divide(
+            1, std * n_genes, out=np.zeros(n_genes, dtype=np.float64), where=std > 0
+        )
+        offset = float(np.dot(mean, weights))
+    elif score != "sum":
+        raise ValueError(f"``score`` must be one of {SCORES}, got {score!r}.")
+    return np.asarray(columns @ weights).ravel() - offset
+
+
+def natural_key(label: str) -> tuple:
+    """The sort key of a label comparing its runs of digits as numbers, e.g. ``'E_2'`` before ``'E_10'``."""
+    return tuple(
+        int(part) if i % 2 else part for i, part in enumerate(re.split(r"(\d+)", label))
+    )
+
+
+def category_codes(values) -> Tuple[np.ndarray, list]:
+    """
+    Encode categorical or string values as the smallest unsigned integer codes.
+
+    Args:
+        values: A ``pd.Categorical`` or an array of strings.
+
+    Returns:
+        codes: uint8 or uint16 codes (uint32 beyond 65536 categories). Missing values get a trailing ``'NaN'`` category.
+        categories: The category labels, in code order: the order of ordered categoricals, the natural order of the
+                    labels otherwise, so that numbered slices follow each other.
+    """
+    if not isinstance(values, pd.Categorical):
+        values = pd.Categorical(np.asarray(values).astype(str))
+    codes, categories = values.codes, [str(c) for c in values.categories]
+    if not values.ordered and len(categories) > 0:
+        order = sorted(range(len(categories)), key=lambda i: natural_key(categories[i]))
+        positions = np.empty(len(order), dtype=np.intp)
+        positions[order] = np.arange(len(order))
+        codes = np.where(codes < 0, -1, positions[np.maximum(codes, 0)])
+        categories = [categories[i] for i in order]
+    if np.any(codes < 0):
+        codes = np.where(codes < 0, len(categories), codes)
+        categories.append("NaN")
+    dtype = np.uint8 if len(categories) <= 2**8 else np.uint16
+    dtype = dtype if len(categories) <= 2**16 else np.uint32
+    return codes.astype(dtype), categories
+
+
+def knn_graph(coordinates: np.ndarray, n_neighbors: int = 10) -> sparse.csr_matrix:
+    """
+    Build the row-normalized k-nearest-neighbor graph of a set of cells, so that the product of the graph with a
+    per-cell array averages each cell with its neighbors.
+
+    Args:
+        coordinates: The ``(n, d)`` spatial coordinates of the cells.
+        n_neighbors: The number of neighbors of each cell, the cell itself excluded.
+
+    Returns:
+        The ``(n, n)`` sparse graph, with ``n_neighbors + 1`` weights of ``1 / (n_neighbors + 1)`` per row.
+    """
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    n_cells = len(coordinates)
+    k = min(n_neighbors + 1, n_cells)
+    # The nearest neighbor of each cell is the cell itself
+    _, ids = cKDTree(coordinates).query(coordinates, k=k, workers=-1)
+    return sparse.csr_matrix(
+        (
+            np.full(n_cells * k, 1.0 / k, dtype=np.float32),
+            np.asarray(ids, dtype=np.int64).ravel(),
+            np.arange(0, n_cells * k + 1, k, dtype=np.int64),
+        ),
+        shape=(n_cells, n_cells),
+    )
+
+
+def as_scalars(array: np.ndarray) -> np.ndarray:
+    """Cast numeric and boolean per-point arrays to float32, the precision used by the mappers."""
+    if np.issubdtype(array.dtype, np.number) or array.dtype == bool:
+        array = array.astype(np.float32, copy=False)
+    return array
+
+
+def sum_columns(take_column: Callable, cols: np.ndarray, rows: np.ndarray, layer=None):
+    """Sum the columns of duplicated var names, each read by ``take_column(col, rows=rows, layer=layer)``."""
+    array = take_column(cols[0], rows=rows, layer=layer)
+    for col in cols[1:]:
+        array = array + take_column(col, rows=rows, layer=layer)
+    return array
+
+
+# -----------------------------------------------------------------------------
+# Worker pool
+#
+# Genes are resolved off the event loop. Worker processes open their own gene store once, so that only the row
+# positions and the resolved arrays are sent between processes; in-memory matrices are read by threads instead.
+# -----------------------------------------------------------------------------
+
+_WORKER_GENE_STORE = None
+
+
+def gene_store_factory(gene_store) -> Optional[Callable]:
+    """
+    Get a picklable function opening the same gene store again in another process.
+
+    Args:
+        gene_store: A ``stviewer.dataset.GeneStore`` or ``stviewer.dataset.BackedStore``.
+
+    Returns:
+        The function without argument, or None if the gene store cannot be opened in another process.
+    """
+    if isinstance(gene_store, GeneStore):
+        return partial(GeneStore, path=gene_store.path)
+    if isinstance(gene_store, BackedStore):
+        return partial(
+            BackedStore,
+            filename=gene_store.filename,
+            chunk_size=gene_store.chunk_size,
+            allow_scans=gene_store.allow_scans,
+        )
+    return None
+
+
+def _init_worker(gene_store_factory: Callable):
+    global _WORKER_GENE_STORE
+    _WORKER_GENE_STORE = gene_store_factory()
+
+
+def _resolve_gene(cols: np.ndarray, rows: np.ndarray, layer=None) -> np.ndarray:
+    array = sum_columns(_WORKER_GENE_STORE.take_column, cols, rows=rows, layer=layer)
+    return as_scalars(array)
+
+
+def _resolve_gene_set(cols: np.ndarray, rows: np.ndarray, layer=None, score="mean"):
+    columns = _WORKER_GENE_STORE.take_columns(cols, layer=layer)
+    return as_scalars(module_score(columns, score=score)[rows])
+
+
+# -----------------------------------------------------------------------------
+# Scalar resolution
+# -----------------------------------------------------------------------------
+
+
+class ScalarResolver:
+    """Resolve obs keys and var names of an AnnData object into per-point scalar arrays."""
+
+    def __init__(
+        self,
+        adata: AnnData,
+        gene_store=None,
+        executor: Union[Literal["thread", "process"], Executor] = "thread",
+        n_workers: Optional[int] = None,
+        gene_sets: Optional[dict] = None,
+    ):
+        """
+        Initialize ScalarResolver.
+
+        Args:
+            adata: The AnnData object.
+            gene_store: A ``stviewer.dataset.GeneStore`` or ``stviewer.dataset.BackedStore`` of ``adata``. If given,
+                        genes are read from the store instead of ``adata.X`` or ``adata.layers``, and ``adata`` may be
+                        loaded without any matrix. Backed AnnData objects get a ``BackedStore`` of their file.
+            executor: The pool of ``resolve_async``, or the kind of pool to create on first use. A process pool needs
+                      a gene store, otherwise threads are used since in-memory matrices would be copied; its workers
+                      import stviewer again when they start.
+            n_workers: The number of workers of the created pool.
+            gene_sets: Named gene sets, ``{name: [var names]}``, usable as keys like comma-separated var names.
+
+        Raises:
+            ValueError: If the cells of ``gene_store`` are not those of ``adata``, in the same order.
+        """
+        if gene_store is None and adata.isbacked:
+            gene_store = BackedStore(filename=str(adata.filename))
+        if gene_store is not None and not gene_store.obs_names.equals(adata.obs_names):
+            raise ValueError(
+                "The cells of the gene store do not match ``adata.obs_names``, the store is stale or belongs to "
+                "another file: regenerate it with ``stviewer.dataset.write_gene_store``."
+            )
+        self._adata = adata
+        self._gene_store = gene_store
+        self._executor = executor
+        self._n_workers = n_workers
+        self._in_process = False
+        self._obs_keys = set(adata.obs_keys())
+        self._var_names = (
+            adata.var_names if gene_store is None else gene_store.var_names
+        )
+        self._var_names_set = set(self._var_names.tolist())
+        self._gene_sets = {} if gene_sets is None else dict(gene_sets)
+        self._quantiles = {}
+        self._categorical = {}
+        self._column_matrices = {}
+        self._column_lock = Lock()
+
+    @property
+    def adata(self):
+        return self._adata
+
+    @property
+    def executor(self) -> Executor:
+        """The pool of ``resolve_async``, created on first use."""
+        if not isinstance(self._executor, Executor):
+            factory = gene_store_factory(self._gene_store)
+            if self._executor == "process" and factory is not None:
+                # Spawned workers do not inherit the threads of the server
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._n_workers,
+                    mp_context=get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(factory,),
+                )
+                self._in_process = True
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self._n_workers)
+        return self._executor
+
+    def shutdown(self):
+        """Shut the pool of ``resolve_async`` down, without waiting for the running tasks."""
+        if isinstance(self._executor, Executor):
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def obs_rows(self, obs_index: np.ndarray) -> np.ndarray:
+        """
+        Map the ``obs_index`` array of a model onto row positions of the AnnData object.
+
+        Args:
+            obs_index: The ``obs_index`` point array of a model.
+
+        Returns:
+            The row positions of the model points.
+        """
+        obs_index = np.asarray(obs_index)
+        if np.issubdtype(obs_index.dtype, np.integer):
+            return obs_index.astype(np.intp)
+
+        rows = self._adata.obs_names.get_indexer(obs_index.astype(str))
+        if np.any(rows < 0):
+            raise KeyError(
+                f"{int(np.sum(rows < 0))} values of ``obs_index`` are not in ``adata.obs_names``."
+            )
+        return rows
+
+    @property
+    def layers(self) -> list:
+        """The layers genes can be read from, ``'X'`` standing for ``adata.X``."""
+        if self._gene_store is not None:
+            return list(self._gene_store.layers)
+        return ["X"] + list(self._adata.layers.keys())
+
+    def _category_codes(self, key) -> Optional[Tuple[np.ndarray, list]]:
+        # Codes of all cells, encoded once per obs key
+        if key not in self._categorical:
+            values = self._adata.obs[key].values
+            if isinstance(values, pd.Categorical) or values.dtype.kind in "OUS":
+                self._categorical[key] = category_codes(values)
+            else:
+                self._categorical[key] = None
+        return self._categorical[key]
+
+    def categories(self, key) -> Optional[list]:
+        """
+        Get the categories of a categorical or string obs key, whose resolved arrays are category codes.
+
+        Args:
+            key: The key.
+
+        Returns:
+            The category labels in code order, or None if ``key`` is not a categorical obs key.
+        """
+        if key not in self._obs_keys:
+            return None
+        codes = self._category_codes(key)
+        return None if codes is None else codes[1]
+
+    def is_var_name(self, key) -> bool:
+        """Whether a key is a var name, i.e. depends on the layer like gene sets."""
+        return key in self._var_names_set
+
+    def quantiles(self, layer: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Get the ``stviewer.dataset.QUANTILES`` of every gene of a layer across all cells, computed once per layer from
+        ``get_column_matrix``, or read from the gene store.
+
+        Args:
+            layer: The layer. If None, ``adata.X`` is used.
+
+        Returns:
+            The quantiles, one row per level and one column per gene, or None for backed files, whose matrices are
+            never read as a whole.
+        """
+        layer = "X" if layer is None else layer
+        if layer not in self._quantiles:
+            if self._gene_store is None:
+                self._quantiles[layer] = matrix_quantiles(
+                    self.get_column_matrix(layer=layer)
+                )
+            elif hasattr(self._gene_store, "quantiles"):
+                self._quantiles[layer] = self._gene_store.quantiles(layer=layer)
+            else:
+                self._quantiles[layer] = None
+        return self._quantiles[layer]
+
+    def precompute_quantiles(self, layers: Optional[list] = None):
+        """Compute the quantiles of the genes of the given layers, all layers if None, see ``quantiles``."""
+        for layer in self.layers if layers is None else layers:
+            self.quantiles(layer=layer)
+
+    def gene_quantiles(
+        self, col: int, layer: Optional[str] = None
+    ) -> Optional[np.ndarray]:
+        """
+        Get the ``stviewer.dataset.QUANTILES`` of a single gene across all cells. In memory, only the nonzeros of its
+        column are sorted, unless the quantiles of the whole layer were computed, see ``precompute_quantiles``.
+
+        Args:
+            col: The column position of the gene.
+            layer: The layer. If None, ``adata.X`` is used.
+
+        Returns:
+            The quantiles, one per level, or None for backed files.
+        """
+        if (
+            self._gene_store is not None
+            or ("X" if layer is None else layer) in self._quantiles
+        ):
+            quantiles = self.quantiles(layer=layer)
+            return None if quantiles is None else quantiles[:, col]
+        matrix = self.get_column_matrix(layer=layer)
+        if not sparse.issparse(matrix):
+            return matrix_quantiles(np.asarray(matrix[:, [col]]))[:, 0]
+        if matrix.format != "csc":
+            return matrix_quantiles(matrix[:, [col]])[:, 0]
+        start, end = matrix.indptr[col], matrix.indptr[col + 1]
+        return column_quantiles(
+            np.array([0, end - start]), matrix.data[start:end], n_rows=matrix.shape[0]
+        )[:, 0]
+
+    def gene_range(
+        self, key: str, layer: Optional[str] = None, clip: str = "min-max"
+    ) -> Optional[tuple]:
+        """
+        Get the range of a var name across all cells from its quantiles, see ``gene_quantiles``.
+
+        Args:
+            key: The var name.
+            layer: The layer. If None, ``adata.X`` is used.
+            clip: The range, one of ``CLIPS``.
+
+        Returns:
+            The ``(low, high)`` range, or None if ``key`` is not a var name with known quantiles. Duplicated var names
+            are summed, so their range is unknown as well.
+        """
+        if key not in self._var_names_set:
+            return None
+        cols = column_positions(self._var_names, key)
+        if len(cols) > 1:
+            return None
+        quantiles = self.gene_quantiles(cols[0], layer=layer)
+        if quantiles is None:
+            return None
+        levels = [QUANTILES.index(q) for q in CLIPS[clip]]
+        return tuple(float(v) for v in quantiles[levels])
+
+    def get_matrix(self, layer: Optional[str] = None):
+        """Get ``adata.X`` or the given layer."""
+        return self._adata.X if layer in [None, "X"] else self._adata.layers[layer]
+
+    def get_column_matrix(self, layer: Optional[str] = None):
+        """
+        Get ``adata.X`` or the given layer in a format whose columns are contiguous. CSR matrices are copied to CSC
+        once per layer, on first use, so that each gene is a slice of ``indptr`` instead of a pass over all nonzeros.
+        """
+        matrix = self.get_matrix(layer=layer)
+        if not (sparse.issparse(matrix) and matrix.format == "csr"):
+            return matrix
+        layer = "X" if layer is None else layer
+        # Genes are resolved from the threads of the pool, the copy is only made once
+        with self._column_lock:
+            if layer not in self._column_matrices:
+                columns = matrix.tocsc()
+                columns.sum_duplicates()
+                self._column_matrices[layer] = columns
+        return self._column_matrices[layer]
+
+    def take_column(
+        self, col: int, rows: np.ndarray, layer: Optional[str] = None
+    ) -> np.ndarray:
+        """Extract a single column of ``adata.X`` or a layer, from the gene store if available."""
+        if self._gene_store is not None:
+            return self._gene_store.take_column(col, layer=layer, rows=rows)
+        return take_column(self.get_column_matrix(layer=layer), col, rows=rows)
+
+    def take_columns(self, cols: np.ndarray, layer: Optional[str] = None):
+        """Extract several columns of ``adata.X`` or a layer, from the gene store if available."""
+        if self._gene_store is not None:
+            return self._gene_store.take_columns(cols, layer=layer)
+        return take_columns(self.get_column_matrix(layer=layer), cols)
+
+    def take_row(
+        self, row: int, layer: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Extract the nonzeros of a single row of ``adata.X`` or a layer, from the gene store if available."""
+        if self._gene_store is not None:
+            return self._gene_store.take_row(row, layer=layer)
+        return take_row(self.get_matrix(layer=layer), row)
+
+    def top_genes(self, row: int, layer: Optional[str] = None, n_genes: int = 10):
+        """
+        Get the most expressed genes of a single cell from the nonzeros of its row.
+
+        Args:
+            row: The row position of the cell.
+            layer: The layer. If None, ``adata.X`` is used.
+            n_genes: The number of genes.
+
+        Returns:
+            The ``(var name, value)`` pairs of the genes, by decreasing value.
+        """
+        cols, values = self.take_row(row, layer=layer)
+        values = np.asarray(values)
+        if len(values) > n_genes:
+            top = np.argpartition(-values, n_genes - 1)[:n_genes]
+            cols, values = np.asarray(cols)[top], values[top]
+        order = np.argsort(-values, kind="stable")
+        return [
+            (str(self._var_names[col]), float(value))
+            for col, value in zip(np.asarray(cols)[order], values[order])
+        ]
+
+    def weighted_column_sums(
+        self, weights: np.ndarray, layer: Optional[str] = None
+    ) -> np.ndarray:
+        """Sum every column of ``adata.X`` or a layer weighted per row, from the gene store if available."""
+        if self._gene_store is not None:
+            return self._gene_store.weighted_column_sums(weights, layer=layer)
+        return weighted_column_sums(self.get_matrix(layer=layer), weights)
+
+    def differential_expression(
+        self,
+        rows: np.ndarray,
+        reference_rows: np.ndarray,
+        layer: Optional[str] = None,
+        n_genes: int = 20,
+        pseudocount: float = 1.0,
+    ) -> list:
+        """
+        Rank the genes of a group of cells against reference cells. The means of all genes in both groups are a single
+        pass over the nonzeros of the matrix, see ``weighted_column_sums``.
+
+        Args:
+            rows: The row positions of the cells of the group.
+            reference_rows: The row positions of the reference cells.
+            layer: The layer. If None, ``adata.X`` is used.
+            n_genes: The number of genes.
+            pseudocount: See ``rank_genes``.
+
+        Returns:
+            The top genes, see ``rank_genes``.
+        """
+        weights = np.zeros((len(self._adata.obs_names), 2))
+        for k, group in enumerate([np.unique(rows), np.unique(reference_rows)]):
+            if len(group) > 0:
+                weights[group, k] = 1.0 / len(group)
+        means = self.weighted_column_sums(weights, layer=layer)
+        return rank_genes(
+            means, self._var_names, n_genes=n_genes, pseudocount=pseudocount
+        )
+
+    async def differential_expression_async(
+        self,
+        rows: np.ndarray,
+        reference_rows: np.ndarray,
+        layer: Optional[str] = None,
+        n_genes: int = 20,
+        pseudocount: float = 1.0,
+    ) -> list:
+        """
+        Rank the genes of a group of cells in the worker pool, without blocking the event loop. See
+        ``differential_expression``.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        # The pass over the whole matrix reads this process's matrices, worker processes only resolve genes
+        return await loop.run_in_executor(
+            None if self._in_process else executor,
+            partial(
+                self.differential_expression,
+                rows,
+                reference_rows,
+                layer=layer,
+                n_genes=n_genes,
+                pseudocount=pseudocount,
+            ),
+        )
+
+    def gene_set(self, key) -> Optional[list]:
+        """
+        Get the var names of a gene set key: a named gene set, or comma-separated var names. Unknown var names are
+        dropped.
+
+        Args:
+            key: The key.
+
+        Returns:
+            The var names of the gene set, or None if ``key`` is not a gene set.
+        """
+        if not isinstance(key, str) or key in self._var_names_set:
+            return None
+        if key in self._gene_sets:
+            genes = self._gene_sets[key]
+        elif "," in key:
+            genes = [gene.strip() for gene in key.split(",")]
+        else:
+            return None
+        return [gene for gene in genes if gene in self._var_names_set]
+
+    def gene_set_columns(self, genes: list) -> np.ndarray:
+        """Get the unique column positions of the var names of a gene set."""
+        return np.unique(
+            np.concatenate([column_positions(self._var_names, gene) for gene in genes])
+        )
+
+    def resolve(
+        self,
+        key: str,
+        rows: np.ndarray,
+        layer: Optional[str] = None,
+        score: Literal["sum", "mean", "zscore"] = "mean",
+    ) -> Optional[np.ndarray]:
+        """
+        Resolve an obs key, a var name or a gene set into a per-point array.
+
+        Args:
+            key: An obs key, a var name, or a gene set (see ``gene_set``).
+            rows: The row positions of the model points, see ``obs_rows``.
+            layer: The layer used for var names. If None, ``adata.X`` is used.
+            score: The score of gene sets, see ``module_score``.
+
+        Returns:
+            The per-point array, or None if ``key`` is neither an obs key, a var name nor a gene set of known genes.
+            Categorical and string obs keys are resolved into category codes, see ``categories``.
+        """
+        if key in self._obs_keys and self.categories(key) is not None:
+            return self._category_codes(key)[0][rows]
+        elif key in self._obs_keys:
+            array = np.asarray(self._adata.obs[key].values)[rows]
+        elif key in self._var_names_set:
+            cols = column_positions(self._var_names, key)
+            array = sum_columns(self.take_column, cols, rows=rows, layer=layer)
+        else:
+            genes = self.gene_set(key)
+            if not genes:
+                return None
+            columns = self.take_columns(self.gene_set_columns(genes), layer=layer)
+            array = module_score(columns, score=score)[rows]
+        return as_scalars(array)
+
+    async def resolve_async(
+        self,
+        key: str,
+        rows: np.ndarray,
+        layer: Optional[str] = None,
+        score: Literal["sum", "mean", "zscore"] = "mean",
+    ) -> Optional[np.ndarray]:
+        """
+        Resolve an obs key, a var name or a gene set in the worker pool, without blocking the event loop. See
+        ``resolve``.
+
+        Cancelling the awaiting task drops the result, but a computation already started in a worker runs to its end.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        if self._in_process and key in self._var_names_set:
+            cols = column_positions(self._var_names, key)
+            return await loop.run_in_executor(
+                executor, _resolve_gene, cols, rows, layer
+            )
+        genes = self.gene_set(key)
+        if self._in_process and genes:
+            cols = self.gene_set_columns(genes)
+            return await loop.run_in_executor(
+                executor, _resolve_gene_set, cols, rows, layer, score
+            )
+        # obs columns live in this process, they are gathered by a thread
+        return await loop.run_in_executor(
+            None if self._in_process else executor,
+            partial(self.resolve, key, rows, layer=layer, score=score),
+        )
+
+
+# -----------------------------------------------------------------------------
+# Scalar cache
+# -----------------------------------------------------------------------------
+
+
+class ScalarCache:
+    """A bounded LRU cache of resolved scalar arrays and their ranges."""
+
+    def __init__(self, max_bytes: int = 256 * 1024**2):
+        """
+        Initialize ScalarCache.
+
+        Args:
+            max_bytes: The memory budget of the cached arrays in bytes. The least recently used arrays are evicted
+                       once the budget is exceeded.
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._n_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key: tuple) -> Optional[Tuple[np.ndarray, tuple]]:
+        """
+        Get a cached entry and mark it as the most recently used.
+
+        Args:
+            key: The cache key, generally ``(actor_name, scalars, layer)``.
+
+        Returns:
+            The cached ``(array, (min, max))`` entry, or None if ``key`` is not cached.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry
+
+    def put(self, key: tuple, array: np.ndarray, clim: tuple):
+        """
+        Cache an array and its range, evicting the least recently used entries if needed. Only numeric and boolean
+        arrays are cached: ``nbytes`` does not count the objects referenced by object arrays, so they would escape the
+        memory budget.
+
+        Args:
+            key: The cache key, generally ``(actor_name, scalars, layer)``.
+            array: The resolved scalar array.
+            clim: The ``(min, max)`` range of the array.
+
+        Returns:
+            The ``(array, clim)`` entry.
+        """
+        entry = (array, clim)
+        if key in self._entries:
+            self._n_bytes -= self._entries.pop(key)[0].nbytes
+        if array.dtype.kind not in "biuf" or array.nbytes > self.max_bytes:
+            return entry
+
+        self._entries[key] = entry
+        self._n_bytes += array.nbytes
+        while self._n_bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._n_bytes -= evicted.nbytes
+            self._evictions += 1
+        return entry
+
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+        self._n_bytes = 0
+
+    @property
+    def stats(self) -> dict:
+        """Get the cache statistics."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._n_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+        }
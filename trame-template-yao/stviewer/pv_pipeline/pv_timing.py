@@ -0,0 +1,175 @@
+import functools
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Ring buffer
+# -----------------------------------------------------------------------------
+
+
+class RingBuffer:
+    """A fixed-size buffer keeping the latest float samples."""
+
+    def __init__(self, size: int = 1024):
+        """
+        Initialize RingBuffer.
+
+        Args:
+            size: The number of kept samples.
+        """
+        self._values = np.zeros(size, dtype=np.float64)
+        self._n = 0
+
+    def __len__(self):
+        return min(self._n, len(self._values))
+
+    def append(self, value: float):
+        """Add a sample, overwriting the oldest one once the buffer is full."""
+        self._values[self._n % len(self._values)] = value
+        self._n += 1
+
+    @property
+    def n_samples(self) -> int:
+        """The number of samples added since the creation of the buffer."""
+        return self._n
+
+    def values(self) -> np.ndarray:
+        """The kept samples, in no particular order."""
+        return self._values[: len(self)]
+
+    def clear(self):
+        """Remove all samples."""
+        self._n = 0
+
+
+# -----------------------------------------------------------------------------
+# Timings
+# -----------------------------------------------------------------------------
+
+
+class Timings:
+    """
+    Wall times of the hot paths, one ring buffer per name. Names are prefixed by their category, e.g.
+    ``'callback:PVCB.on_scalars_change'`` or ``'render:vtk'``.
+    """
+
+    def __init__(self, size: int = 1024):
+        """
+        Initialize Timings.
+
+        Args:
+            size: The number of samples kept per name.
+        """
+        self.size = size
+        self.enabled = True
+        self._buffers = {}
+        self._frames = RingBuffer(size=size)
+
+    def record(self, name: str, seconds: float):
+        """Record a wall time in seconds."""
+        if not self.enabled:
+            return
+        if name not in self._buffers:
+            self._buffers[name] = RingBuffer(size=self.size)
+        self._buffers[name].append(seconds)
+
+    def frame(self):
+        """Record the end of a rendered frame, used to compute the frame rate."""
+        if self.enabled:
+            self._frames.append(time.perf_counter())
+
+    @contextmanager
+    def measure(self, name: str):
+        """Record the wall time of a ``with`` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def fps(self, window: float = 1.0) -> float:
+        """The number of frames per second over the last ``window`` seconds."""
+        frames = self._frames.values()
+        return float(np.sum(frames >= time.perf_counter() - window) / window)
+
+    def clear(self):
+        """Remove all samples."""
+        self._buffers.clear()
+        self._frames.clear()
+
+    @staticmethod
+    def _describe(values: np.ndarray, count: int) -> dict:
+        p50, p95 = np.percentile(values, [50, 95]) * 1000
+        return {
+            "count": count,
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "max_ms": round(float(np.max(values)) * 1000, 3),
+        }
+
+    def stats(self) -> dict:
+        """
+        Get the statistics of the kept samples.
+
+        Returns:
+            The frame rate, the p50/p95/max wall times of each name and of each category, and the number of samples
+            recorded since the last ``clear``.
+        """
+        names, categories = {}, {}
+        for name, buffer in sorted(self._buffers.items()):
+            if len(buffer) == 0:
+                continue
+            names[name] = self._describe(buffer.values(), count=buffer.n_samples)
+            category = name.split(":")[0]
+            values, count = categories.get(category, ([], 0))
+            categories[category] = (
+                values + [buffer.values()],
+                count + buffer.n_samples,
+            )
+        return {
+            "fps": round(self.fps(), 1),
+            "categories": {
+                category: self._describe(np.concatenate(values), count=count)
+                for category, (values, count) in categories.items()
+            },
+            "timings": names,
+        }
+
+
+_TIMINGS = Timings()
+
+
+def get_timings() -> Timings:
+    """Get the Timings shared by all UI pieces of the process."""
+    return _TIMINGS
+
+
+def timed(func: Callable, name: Optional[str] = None) -> Callable:
+    """
+    Record the wall time of each call of a function in the shared Timings.
+
+    Args:
+        func: The function, generally a bound method of ``PVCB`` or ``Viewer``.
+        name: The name of the recorded wall times. If None, ``'callback:<class>.<method>'`` is used.
+
+    Returns:
+        The wrapped function.
+    """
+    if name is None:
+        owner = getattr(func, "__self__", None)
+        qualname = (
+            f"{type(owner).__name__}.{func.__name__}"
+            if owner is not None
+            else func.__qualname__
+        )
+        name = f"callback:{qualname}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _TIMINGS.measure(name):
+            return func(*args, **kwargs)
+
+    return wrapper
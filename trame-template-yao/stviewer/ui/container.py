@@ -3,12 +3,12 @@ try:
 except ImportError:
     from typing_extensions import Literal
 
-from trame.widgets import vuetify
+from trame.widgets import html, vuetify
 
 from pyvista import BasePlotter
 from pyvista.trame import PyVistaLocalView, PyVistaRemoteLocalView, PyVistaRemoteView
 
-from .toolbar import Viewer
+from ..pv_pipeline import RenderScheduler, get_viewer, set_local_rendering, timed
 
 # -----------------------------------------------------------------------------
 # GUI- standard Container
@@ -20,6 +20,11 @@ def ui_standard_container(
     plotter: BasePlotter,
     mode: Literal["trame", "server", "client"] = "trame",
     default_server_rendering: bool = True,
+    max_fps: float = 30,
+    interactive_quality: int = 50,
+    interactive_ratio: float = 0.5,
+    still_quality: int = 100,
+    still_ratio: float = 1,
     **kwargs,
 ):
     """
@@ -34,17 +39,62 @@ def ui_standard_container(
             * ``'server'``: Uses a view that is purely server rendering.
             * ``'client'``: Uses a view that is purely client rendering (generally safe without a virtual frame buffer)
         default_server_rendering: Whether to use server-side or client-side rendering on-start when using the ``'trame'`` mode.
+        max_fps: The maximum number of frames per second, of both the view updates and the images streamed while
+                 interacting with server rendering. All ``ctrl.view_update`` calls within a frame are coalesced into a
+                 single render.
+        interactive_quality: The JPEG quality in [0, 100] of the images streamed while interacting with server rendering.
+        interactive_ratio: The image size scale factor in [0.1, 1] while interacting with server rendering, e.g. ``0.5``
+                           renders and streams a quarter of the pixels while dragging.
+        still_quality: The JPEG quality in [0, 100] once the camera is idle, ``100`` for the best quality. Still frames
+                       are JPEG too, hence not lossless; the screenshot of the toolbar is a lossless PNG.
+        still_ratio: The image size scale factor in [0.1, 1] once the camera is idle.
         kwargs: Additional parameters that will be passed to ``pyvista.trame.app.PyVistaXXXXView`` function.
     """
     if mode != "trame":
         default_server_rendering = mode == "server"
 
-    viewer = Viewer(plotter, server, suppress_rendering=mode == "client")
+    viewer = get_viewer(
+        plotter=plotter, server=server, suppress_rendering=mode == "client"
+    )
     ctrl = server.controller
+    set_local_rendering(plotter, local_rendering=not default_server_rendering)
+
+    # Image delivery of server rendering: cheap frames while interacting, full frames once idle
+    if mode != "client":
+        kwargs.setdefault("interactive_quality", interactive_quality)
+        kwargs.setdefault("interactive_ratio", interactive_ratio)
+        kwargs.setdefault("still_quality", still_quality)
+        kwargs.setdefault("still_ratio", still_ratio)
+
+    # Swap point clouds to their coarse levels of detail while the camera is interacting
+    if mode != "client":
+        kwargs.setdefault(
+            "interactor_events",
+            ("interactor_events", ["StartInteraction", "EndInteraction"]),
+        )
+        kwargs.setdefault("StartInteraction", timed(viewer.on_interaction_start))
+        kwargs.setdefault("EndInteraction", timed(viewer.on_interaction_end))
+
+    # Inspect the cells under the cursor, see ``Viewer.on_pick``, and select cells with a box, see ``Viewer.on_select``
+    kwargs.setdefault(
+        "picking_modes",
+        (
+            f"({viewer.PICKING} ? ['click', 'hover'] : []).concat({viewer.SELECTING} ? ['select'] : [])",
+        ),
+    )
+    kwargs.setdefault("click", (timed(viewer.on_pick), "[$event]"))
+    # A hover event is only sent once the previous one is handled, instead of one round trip per mouse move
+    kwargs.setdefault(
+        "hover",
+        f"if (!{viewer.PICK_PENDING}) {{ {viewer.PICK_PENDING} = true; "
+        f"trigger('{server.trigger_name(timed(viewer.on_hover))}', [$event]); }}",
+    )
+    kwargs.setdefault("select", (timed(viewer.on_select), "[$event]"))
 
     with vuetify.VContainer(
         fluid=True,
         classes="pa-0 fill-height",
+        style="position: relative;",
     ):
         if mode == "trame":
             view = PyVistaRemoteLocalView(
@@ -64,6 +114,52 @@ def ui_standard_container(
         ctrl.view_reset_camera = view.reset_camera
         ctrl.view_push_camera = view.push_camera
         ctrl.on_server_ready.add(view.update)
-        ctrl.view_update = view.update
+        if mode != "client":
+            # The image delivery caps its stream at 30 FPS unless told otherwise
+            ctrl.on_server_ready.add(
+                lambda **_: server.protocol_call(
+                    "viewport.image.animation.fps.max", max_fps
+                )
+            )
+        render_scheduler = RenderScheduler(update=view.update, max_fps=max_fps)
+        ctrl.view_update = render_scheduler.request
+        ctrl.get_render_scheduler = lambda: render_scheduler
+
+        # Timing overlay, toggled from the toolbar
+        with vuetify.VCard(
+            v_show=(viewer.SHOW_TIMINGS, False),
+            classes="pa-2 caption",
+            style="position: absolute; top: 8px; right: 8px; z-index: 1; opacity: 0.8;",
+            dense=True,
+        ):
+            html.Div(f"{{{{ {viewer.TIMINGS}.fps }}}} FPS")
+            html.Div(
+                "{{ name }}: p50 {{ timing.p50_ms.toFixed(1) }} ms, p95 {{ timing.p95_ms.toFixed(1) }} ms",
+                v_for=f"(timing, name) in {viewer.TIMINGS}.categories",
+                key="name",
+            )
+
+        # Inspected cell
+        with vuetify.VCard(
+            v_if=viewer.PICKED,
+            classes="pa-2 caption",
+            style="position: absolute; top: 8px; left: 8px; z-index: 1; opacity: 0.8; max-width: 300px;",
+            dense=True,
+        ):
+            html.Div(
+                f"{{{{ {viewer.PICKED}.actor }}}}: {{{{ {viewer.PICKED}.obs_index }}}}",
+                classes="font-weight-bold",
+            )
+            html.Div(
+                "{{ field.key }}: {{ field.value }}",
+                v_for=f"field in {viewer.PICKED}.obs",
+                key="field.key",
+            )
+            html.Div("Top genes", classes="font-weight-bold mt-1")
+            html.Div(
+                "{{ gene.name }}: {{ gene.value }}",
+                v_for=f"gene in {viewer.PICKED}.genes",
+                key="gene.name",
+            )
 
     return plotter._id_name
@@ -7,19 +7,24 @@ from typing import Optional
 
 import matplotlib.pyplot as plt
 from anndata import AnnData
-from trame.widgets import vuetify
+from trame.widgets import html, vuetify
 
 from pyvista.plotting.colors import hexcolors
 
-from ..pv_pipeline import PVCB
+from ..pv_pipeline import (
+    CLIPS,
+    PVCB,
+    SCORES,
+    ScalarCache,
+    ScalarResolver,
+    update_visibility,
+)
 
 
 def standard_tree(actors: list, actor_names: list, base_id: int = 0):
     for i, actor in enumerate(actors):
-        if i == 0:
-            actor.SetVisibility(True)
-        else:
-            actor.SetVisibility(False)
+        # Lazy actors are only loaded here if visible
+        update_visibility(actor, visibility=i == 0)
     tree = [
         {
             "id": str(base_id + 1 + i),
@@ -54,7 +59,7 @@ def pipeline(server, actors: list, actor_names: list, tree: Optional[list] = Non
         _id = event["id"]
         _visibility = event["visible"]
         active_actor = actors[int(_id) - 1]
-        active_actor.SetVisibility(_visibility)
+        update_visibility(active_actor, visibility=_visibility)
         ctrl.view_update()
 
     if tree is None:
@@ -143,6 +148,10 @@ def standard_pc_card(
 ):
     _default_values = {
         "scalars": "None",
+        "score": "mean",
+        "layer": "X",
+        "clip": "min-max",
+        "smoothing": False,
         "point_size": 5,
         "style": "points",
         "color": "gainsboro",
@@ -159,8 +168,10 @@ def standard_pc_card(
                 vuetify.VTextField(
                     label="Scalars",
                     v_model=(CBinCard.SCALARS, _default_values["scalars"]),
+                    loading=(CBinCard.SCALARS_LOADING, False),
+                    error_messages=(CBinCard.SCALARS_ERROR, None),
                     type="str",
-                    hide_details=True,
+                    hide_details=(f"!{CBinCard.SCALARS_ERROR}",),
                     dense=True,
                     outlined=True,
                     classes="pt-1",
@@ -175,6 +186,50 @@ def standard_pc_card(
                     outlined=True,
                     classes="pt-1",
                 )
+        with vuetify.VRow(classes="pt-2", dense=True):
+            # Layer of genes and gene sets
+            with vuetify.VCol(cols="6"):
+                vuetify.VSelect(
+                    label="Layer",
+                    v_model=(CBinCard.LAYER, _default_values["layer"]),
+                    items=("layers", CBinCard.layers),
+                    hide_details=True,
+                    dense=True,
+                    outlined=True,
+                    classes="pt-1",
+                )
+            # Range of the lookup table, robust ranges clip the outliers
+            with vuetify.VCol(cols="6"):
+                vuetify.VSelect(
+                    label="Range",
+                    v_model=(CBinCard.CLIP, _default_values["clip"]),
+                    items=("clips", list(CLIPS.keys())),
+                    hide_details=True,
+                    dense=True,
+                    outlined=True,
+                    classes="pt-1",
+                )
+        # Score of gene sets, i.e. comma-separated genes or named gene sets
+        with vuetify.VRow(classes="pt-2", dense=True):
+            with vuetify.VCol(cols="6"):
+                vuetify.VSelect(
+                    label="Gene set score",
+                    v_model=(CBinCard.SCORE, _default_values["score"]),
+                    items=("scores", SCORES),
+                    hide_details=True,
+                    dense=True,
+                    outlined=True,
+                    classes="pt-1",
+                )
+            # Average of numeric scalars over the spatial neighbors of each cell
+            with vuetify.VCol(cols="6"):
+                vuetify.VCheckbox(
+                    v_model=(CBinCard.SMOOTHING, _default_values["smoothing"]),
+                    label="kNN smoothing",
+                    hide_details=True,
+                    dense=True,
+                    classes="mt-2",
+                )
 
         standard_card_components(CBinCard=CBinCard, default_values=_default_values)
 
@@ -189,6 +244,97 @@ def standard_pc_card(
             dense=True,
         )
 
+        # Threshold of the points on their scalars
+        vuetify.VCheckbox(
+            v_model=(CBinCard.THRESHOLD, False),
+            label="Threshold",
+            classes="mt-1",
+            hide_details=True,
+            dense=True,
+        )
+        vuetify.VRangeSlider(
+            v_show=CBinCard.THRESHOLD,
+            v_model=(CBinCard.THRESHOLD_RANGE, [0, 1]),
+            min=(f"{CBinCard.THRESHOLD_BOUNDS}[0]",),
+            max=(f"{CBinCard.THRESHOLD_BOUNDS}[1]",),
+            # Constant arrays have empty bounds, a null step would freeze the slider
+            step=(
+                f"Math.max(({CBinCard.THRESHOLD_BOUNDS}[1] - {CBinCard.THRESHOLD_BOUNDS}[0]) / 200, 1e-6)",
+            ),
+            thumb_label=True,
+            classes="mt-1",
+            hide_details=True,
+            dense=True,
+        )
+
+        # Genes ranked in the cells selected with a box, see ``Viewer.on_select``
+        vuetify.VProgressLinear(
+            v_if=CBinCard.SELECTION_LOADING, indeterminate=True, classes="mt-2"
+        )
+        html.Div(
+            f"{{{{ {CBinCard.SELECTION_ERROR} }}}}",
+            v_if=CBinCard.SELECTION_ERROR,
+            classes="mt-2 caption error--text",
+        )
+        with html.Div(v_if=CBinCard.SELECTION, classes="mt-2"):
+            with html.Div(classes="d-flex align-center"):
+                html.Div(
+                    f"Selection: {{{{ {CBinCard.SELECTION}.n_cells }}}} cells vs {{{{ {CBinCard.SELECTION}.n_reference }}}}",
+                    classes="caption font-weight-bold",
+                )
+                vuetify.VSpacer()
+                with vuetify.VBtn(
+                    icon=True, x_small=True, click=f"{CBinCard.SELECTION} = null"
+                ):
+                    vuetify.VIcon("mdi-close", x_small=True)
+            with vuetify.VSimpleTable(dense=True, height="200px", fixed_header=True):
+                with html.Thead():
+                    with html.Tr():
+                        html.Th("Gene")
+                        html.Th("Mean")
+                        html.Th("Rest")
+                        html.Th("log2FC")
+                with html.Tbody():
+                    # Clicking a gene colors the points by it
+                    with html.Tr(
+                        v_for=f"gene in {CBinCard.SELECTION}.genes",
+                        key="gene.name",
+                        click=f"{CBinCard.SCALARS} = gene.name",
+                        style="cursor: pointer;",
+                    ):
+                        html.Td("{{ gene.name }}")
+                        html.Td("{{ gene.mean }}")
+                        html.Td("{{ gene.reference_mean }}")
+                        html.Td("{{ gene.log_fold_change }}")
+
+        # Slice navigator, a single slice when both ends of the range are the same
+        if len(CBinCard.slice_labels) > 0:
+            vuetify.VCheckbox(
+                v_model=(CBinCard.SLICES, False),
+                label="Slices",
+                classes="mt-1",
+                hide_details=True,
+                dense=True,
+            )
+            vuetify.VRangeSlider(
+                v_show=CBinCard.SLICES,
+                v_model=(CBinCard.SLICES_RANGE, [0, len(CBinCard.slice_labels) - 1]),
+                min=0,
+                max=(f"{CBinCard.SLICE_LABELS}.length - 1",),
+                step=1,
+                ticks=True,
+                classes="mt-1",
+                hide_details=True,
+                dense=True,
+            )
+            vuetify.VSubheader(
+                f"{{{{ {CBinCard.SLICE_LABELS}[{CBinCard.SLICES_RANGE}[0]] }}}}"
+                f" - {{{{ {CBinCard.SLICE_LABELS}[{CBinCard.SLICES_RANGE}[1]] }}}}",
+                v_show=CBinCard.SLICES,
+                classes="pa-0",
+                style="height: 24px;",
+            )
+
 
 def standard_mesh_card(
     CBinCard, actor_name: str, card_title: str, default_values: Optional[dict] = None
@@ -217,19 +363,55 @@ def ui_standard_drawer(
     actors: list,
     actor_names: list,
     tree: Optional[list] = None,
+    scalar_cache_bytes: int = 256 * 1024**2,
+    gene_store=None,
+    scalar_executor: Literal["thread", "process"] = "thread",
+    n_scalar_workers: Optional[int] = None,
+    gene_sets: Optional[dict] = None,
+    slice_key: Optional[str] = "slices",
+    n_neighbors: int = 10,
 ):
     """
     Generate standard Drawer for Spateo UI.
 
     Args:
         server: The trame server.
+        scalar_cache_bytes: The memory budget in bytes of the LRU cache of resolved scalar arrays, shared by all actors.
+        gene_store: A ``stviewer.dataset.GeneStore`` of ``adata`` used to read genes. If None, ``adata.X`` is used.
+        scalar_executor: The kind of worker pool resolving scalars off the event loop. Processes need a gene store,
+                         otherwise threads are used; each worker process imports stviewer again, so they only pay
+                         off for large stores.
+        n_scalar_workers: The number of workers of the pool.
+        gene_sets: Named gene sets, ``{name: [var names]}``, which can be typed in the Scalars field like
+                   comma-separated var names.
+        slice_key: The categorical obs key of the slices, navigated in the cards of the point clouds. If None or not in
+                   ``adata.obs``, the slice navigator is hidden.
+        n_neighbors: The number of spatial neighbors of each cell averaged by the kNN smoothing of the scalars.
 
     """
 
     pipeline(server=server, actors=actors, actor_names=actor_names, tree=tree)
     vuetify.VDivider(classes="mb-2")
+    resolver = ScalarResolver(
+        adata=adata,
+        gene_store=gene_store,
+        executor=scalar_executor,
+        n_workers=n_scalar_workers,
+        gene_sets=gene_sets,
+    )
+    server.controller.on_server_exited.add(lambda **kwargs: resolver.shutdown())
+    scalar_cache = ScalarCache(max_bytes=scalar_cache_bytes)
     for actor, actor_name in zip(actors, actor_names):
-        CBinCard = PVCB(server=server, actor=actor, actor_name=actor_name, adata=adata)
+        CBinCard = PVCB(
+            server=server,
+            actor=actor,
+            actor_name=actor_name,
+            adata=adata,
+            resolver=resolver,
+            scalar_cache=scalar_cache,
+            slice_key=slice_key,
+            n_neighbors=n_neighbors,
+        )
         if str(actor_name).startswith("PC"):
             standard_pc_card(CBinCard, actor_name=actor_name, card_title=actor_name)
         if str(actor_name).startswith("Mesh"):
@@ -7,7 +7,7 @@ from trame.widgets import vuetify
 
 from pyvista import BasePlotter
 
-from ..pv_pipeline import Viewer
+from ..pv_pipeline import get_viewer, timed
 from .utils import button, checkbox
 
 # -----------------------------------------------------------------------------
@@ -15,6 +15,58 @@ from .utils import button, checkbox
 # -----------------------------------------------------------------------------
 
 
+def clipping_menu(viewer):
+    """A toolbar menu clipping all actors along an axis, see ``Viewer.on_clipping_change``."""
+    with vuetify.VMenu(offset_y=True, close_on_content_click=False):
+        with vuetify.Template(v_slot_activator="{ on, attrs }"):
+            with vuetify.VBtn(icon=True, v_bind="attrs", v_on="on"):
+                vuetify.VIcon("mdi-box-cutter")
+        with vuetify.VCard(width=300):
+            with vuetify.VCardText(classes="py-2"):
+                with vuetify.VRow(classes="pt-2", dense=True):
+                    with vuetify.VCol(cols="6"):
+                        vuetify.VSelect(
+                            label="Clipping",
+                            v_model=(viewer.CLIPPING, "off"),
+                            items=("clipping_modes", ["off", "clip", "slab"]),
+                            hide_details=True,
+                            dense=True,
+                            outlined=True,
+                            classes="pt-1",
+                        )
+                    with vuetify.VCol(cols="6"):
+                        vuetify.VSelect(
+                            label="Axis",
+                            v_model=(viewer.CLIPPING_AXIS, "x"),
+                            items=("clipping_axes", ["x", "y", "z"]),
+                            hide_details=True,
+                            dense=True,
+                            outlined=True,
+                            classes="pt-1",
+                        )
+                vuetify.VSlider(
+                    v_model=(viewer.CLIPPING_POSITION, 0.5),
+                    min=0,
+                    max=1,
+                    step=0.005,
+                    label="Position",
+                    classes="mt-1",
+                    hide_details=True,
+                    dense=True,
+                )
+                vuetify.VSlider(
+                    v_show=f"{viewer.CLIPPING} == 'slab'",
+                    v_model=(viewer.SLAB_WIDTH, 0.1),
+                    min=0.005,
+                    max=1,
+                    step=0.005,
+                    label="Width",
+                    classes="mt-1",
+                    hide_details=True,
+                    dense=True,
+                )
+
+
 def ui_standard_toolbar(
     server,
     plotter: BasePlotter,
@@ -40,7 +92,9 @@ def ui_standard_toolbar(
     if mode != "trame":
         default_server_rendering = mode == "server"
 
-    viewer = Viewer(plotter=plotter, server=server, suppress_rendering=mode == "client")
+    viewer = get_viewer(
+        plotter=plotter, server=server, suppress_rendering=mode == "client"
+    )
 
     # Pushes the extra space on the left side of the component.
     vuetify.VSpacer()
@@ -66,6 +120,36 @@ def ui_standard_toolbar(
         tooltip="Save screenshot",
     )
 
+    # Whether to show the timing overlay
+    vuetify.VDivider(vertical=True, classes="mx-1")
+    checkbox(
+        model=(viewer.SHOW_TIMINGS, False),
+        icons=("mdi-speedometer", "mdi-speedometer-slow"),
+        tooltip=f"Toggle timings ({{{{ {viewer.SHOW_TIMINGS} ? 'on' : 'off' }}}})",
+    )
+    button(
+        # Must use single-quote string for JS here
+        click=f"utils.download('timings.json', trigger('{viewer.DUMP_TIMINGS}'), 'application/json')",
+        icon="mdi-timer-outline",
+        tooltip="Save timings",
+    )
+
+    # Clipping plane and slab along an axis
+    vuetify.VDivider(vertical=True, classes="mx-1")
+    clipping_menu(viewer=viewer)
+    # Whether to inspect the cells under the cursor
+    checkbox(
+        model=(viewer.PICKING, False),
+        icons=("mdi-cursor-default-click", "mdi-cursor-default-click-outline"),
+        tooltip=f"Toggle cell inspection ({{{{ {viewer.PICKING} ? 'on' : 'off' }}}})",
+    )
+    # Whether to select cells with a box instead of moving the camera
+    checkbox(
+        model=(viewer.SELECTING, False),
+        icons=("mdi-selection-drag", "mdi-selection-off"),
+        tooltip=f"Toggle box selection ({{{{ {viewer.SELECTING} ? 'on' : 'off' }}}})",
+    )
+
     # Whether to add outline
     vuetify.VDivider(vertical=True, classes="mx-1")
     checkbox(
@@ -89,29 +173,29 @@ def ui_standard_toolbar(
     # Reset camera
     vuetify.VDivider(vertical=True, classes="mx-1")
     button(
-        click=viewer.reset_camera,
+        click=timed(viewer.reset_camera),
         icon="mdi-arrow-expand-all",
         tooltip="Reset Camera",
     )
 
     # Reset camera angle
     button(
-        click=viewer.view_isometric,
+        click=timed(viewer.view_isometric),
         icon="mdi-axis-arrow",
         tooltip="Perspective view",
     )
     button(
-        click=viewer.view_yz,
+        click=timed(viewer.view_yz),
         icon="mdi-axis-x-arrow",
         tooltip="Reset Camera X",
     )
     button(
-        click=viewer.view_xz,
+        click=timed(viewer.view_xz),
         icon="mdi-axis-y-arrow",
         tooltip="Reset Camera Y",
     )
     button(
-        click=viewer.view_xy,
+        click=timed(viewer.view_xy),
         icon="mdi-axis-z-arrow",
         tooltip="Reset Camera Z",
     )
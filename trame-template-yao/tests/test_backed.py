@@ -0,0 +1,69 @@
+import anndata as ad
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from stviewer.dataset import BackedStore, read_h5ad_backed
+
+
+@pytest.fixture
+def adata():
+    rng = np.random.default_rng(0)
+    return ad.AnnData(
+        X=sparse.random(40, 15, density=0.3, format="csr", random_state=rng).astype(
+            np.float32
+        ),
+        obs=pd.DataFrame(index=[f"cell_{i}" for i in range(40)]),
+        var=pd.DataFrame(index=[f"gene_{i}" for i in range(15)]),
+    )
+
+
+def write(adata, path, fmt, compression=None):
+    adata = adata.copy()
+    adata.X = adata.X.asformat(fmt) if fmt != "dense" else adata.X.toarray()
+    filename = str(path / f"{fmt}.h5ad")
+    adata.write_h5ad(filename, compression=compression)
+    return filename
+
+
+def test_backed_store_refuses_csr_unless_scans_are_allowed(adata, tmp_path):
+    filename = write(adata, tmp_path, "csr")
+    with pytest.raises(ValueError, match="gene store"):
+        BackedStore(filename)
+    with pytest.raises(ValueError):
+        read_h5ad_backed(filename)
+
+    store = BackedStore(filename, allow_scans=True, chunk_size=7)
+    assert store.scanned_layers == ["X"]
+    np.testing.assert_allclose(store.take_column(4), adata.X[:, 4].toarray().ravel())
+    store.close()
+
+
+def test_backed_store_refuses_compressed_csc(adata, tmp_path):
+    filename = write(adata, tmp_path, "csc", compression="gzip")
+    with pytest.raises(ValueError):
+        BackedStore(filename)
+
+
+@pytest.mark.parametrize("fmt", ["csc", "dense"])
+def test_backed_store_reads_columns_and_rows(adata, tmp_path, fmt):
+    metadata, store = read_h5ad_backed(write(adata, tmp_path, fmt))
+    assert metadata.X is None
+    assert metadata.obs_names.equals(adata.obs_names)
+    assert store.scanned_layers == []
+
+    reference = adata.X.toarray()
+    rows = np.array([3, 39, 0])
+    for col in range(adata.n_vars):
+        np.testing.assert_allclose(
+            store.take_column(col, rows=rows), reference[rows, col]
+        )
+    np.testing.assert_allclose(
+        store.take_columns(np.array([2, 9])).toarray(), reference[:, [2, 9]]
+    )
+    cols, values = store.take_row(5)
+    row = np.zeros(adata.n_vars, dtype=np.float32)
+    row[cols] = values
+    np.testing.assert_allclose(row, reference[5])
+    store.close()
@@ -0,0 +1,125 @@
+import os
+
+import anndata as ad
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from stviewer.dataset import QUANTILES, GeneStore, column_quantiles, write_gene_store
+from stviewer.pv_pipeline import CLIPS, ScalarResolver
+
+
+@pytest.fixture
+def adata():
+    rng = np.random.default_rng(0)
+    X = sparse.random(60, 25, density=0.2, format="csr", random_state=rng)
+    adata = ad.AnnData(
+        X=X.astype(np.float32),
+        obs=pd.DataFrame(index=[f"cell_{i}" for i in range(60)]),
+        var=pd.DataFrame(index=[f"gene_{i}" for i in range(25)]),
+    )
+    adata.layers["counts"] = X.toarray()
+    return adata
+
+
+@pytest.fixture
+def store(adata, tmp_path):
+    return GeneStore(write_gene_store(adata, str(tmp_path / "genes")))
+
+
+@pytest.mark.parametrize("layer", [None, "counts"])
+def test_gene_store_take_columns(adata, store, layer):
+    matrix = adata.X if layer is None else adata.layers[layer]
+    reference = sparse.csc_matrix(matrix).toarray()
+    cols = np.array([3, 0, 24, 3, 11])
+    np.testing.assert_allclose(
+        store.take_columns(cols, layer=layer).toarray(), reference[:, cols]
+    )
+    rows = np.array([59, 1, 1])
+    for col in cols:
+        np.testing.assert_allclose(
+            store.take_column(col, layer=layer, rows=rows), reference[rows, col]
+        )
+
+
+def test_gene_store_weighted_column_sums(adata, store):
+    weights = np.random.default_rng(1).random((60, 2))
+    np.testing.assert_allclose(
+        store.weighted_column_sums(weights), adata.X.T @ weights, rtol=1e-5
+    )
+
+
+def test_gene_store_metadata(adata, store):
+    assert store.shape == adata.shape
+    assert store.layers == ["X", "counts"]
+    assert store.obs_names.equals(adata.obs_names)
+    assert "gene_3" in store and "gene_99" not in store
+
+
+def test_resolver_refuses_a_stale_gene_store(adata, store):
+    other = adata[::-1].copy()
+    with pytest.raises(ValueError):
+        ScalarResolver(other, gene_store=store)
+
+
+@pytest.mark.parametrize("density", [0.0, 0.05, 0.5, 1.0])
+def test_column_quantiles(density):
+    rng = np.random.default_rng(0)
+    matrix = sparse.random(
+        200, 30, density=density, format="csc", random_state=rng, dtype=np.float64
+    )
+    # Negative values sort before the implicit zeros
+    matrix.data -= 0.5
+    quantiles = column_quantiles(matrix.indptr, matrix.data, n_rows=200)
+    np.testing.assert_allclose(
+        quantiles, np.quantile(matrix.toarray(), QUANTILES, axis=0), atol=1e-6
+    )
+
+
+def test_column_quantiles_single_row():
+    matrix = sparse.csc_matrix(np.array([[0.0, -1.0, 2.0]]))
+    quantiles = column_quantiles(matrix.indptr, matrix.data, n_rows=1)
+    np.testing.assert_allclose(quantiles, np.tile([0.0, -1.0, 2.0], (6, 1)))
+
+
+@pytest.mark.parametrize("source", ["csr", "csc", "dense", "store"])
+def test_gene_range(adata, store, source):
+    reference = adata.X.toarray()
+    if source == "csc":
+        adata.X = sparse.csc_matrix(adata.X)
+    elif source == "dense":
+        adata.X = reference
+    resolver = ScalarResolver(adata, gene_store=store if source == "store" else None)
+    for clip, levels in CLIPS.items():
+        np.testing.assert_allclose(
+            resolver.gene_range("gene_7", clip=clip),
+            np.quantile(reference[:, 7], levels),
+            atol=1e-6,
+        )
+    assert resolver.gene_range("gene_99") is None
+
+
+@pytest.mark.parametrize("layer", [None, "counts"])
+def test_gene_store_take_row(adata, store, layer):
+    matrix = adata.X if layer is None else adata.layers[layer]
+    reference = sparse.csr_matrix(matrix).toarray()
+    for row in [0, 17, 59]:
+        cols, values = store.take_row(row, layer=layer)
+        dense = np.zeros(reference.shape[1])
+        dense[cols] = values
+        np.testing.assert_allclose(dense, reference[row])
+
+
+def test_gene_store_take_row_without_cell_major_copy(adata, tmp_path):
+    # Stores written before the cell-major copy scan the column-major nonzeros
+    path = write_gene_store(adata, str(tmp_path / "genes"))
+    for name in ["row_indptr.npy", "row_indices.npy", "row_data.npy"]:
+        os.remove(os.path.join(path, "X", name))
+    store = GeneStore(path)
+    reference = adata.X.toarray()
+    for row in [0, 17, 59]:
+        cols, values = store.take_row(row)
+        dense = np.zeros(reference.shape[1])
+        dense[cols] = values
+        np.testing.assert_allclose(dense, reference[row])
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+import pyvista as pv
+from stviewer.dataset import model_loader, read_model, read_models
+
+
+@pytest.fixture
+def source(tmp_path):
+    filename = str(tmp_path / "model.vtk")
+    pv.Sphere().save(filename, binary=False)
+    return filename
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    # The files read by ``pv.read``
+    reads, read = [], pv.read
+    monkeypatch.setattr(
+        model_loader.pv, "read", lambda f, **kw: reads.append(f) or read(f, **kw)
+    )
+    return reads
+
+
+def test_read_model_cache(source, tmp_path, reads):
+    cache_dir = str(tmp_path / "cache")
+    model = read_model(source, cache_dir=cache_dir)
+    assert sorted(os.listdir(cache_dir)) == ["model.json", "model.vtp"]
+
+    cached = read_model(source, cache_dir=cache_dir)
+    assert reads == [source, os.path.join(cache_dir, "model.vtp")]
+    np.testing.assert_allclose(np.asarray(cached.points), np.asarray(model.points))
+    assert cached.n_cells == model.n_cells
+
+
+def test_read_model_cache_invalidation(source, tmp_path, reads):
+    cache_dir = str(tmp_path / "cache")
+    read_model(source, cache_dir=cache_dir)
+
+    # A newer source file with the same size
+    stat = os.stat(source)
+    os.utime(source, (stat.st_atime, stat.st_mtime + 10))
+    read_model(source, cache_dir=cache_dir)
+    assert reads[-1] == source
+
+    # Another source file of another size
+    pv.Cube().save(source, binary=False)
+    model = read_model(source, cache_dir=cache_dir)
+    assert reads[-1] == source and model.n_points == pv.Cube().n_points
+    assert read_model(source, cache_dir=cache_dir).n_points == model.n_points
+    assert reads[-1] != source
+
+
+def test_read_model_cache_writes_are_atomic(source, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    read_model(source, cache_dir=cache_dir)
+    cached = os.path.join(cache_dir, "model.vtp")
+    with open(cached, "rb") as f:
+        content = f.read()
+
+    def fail(model, filename):
+        with open(filename, "wb") as f:
+            f.write(b"partial")
+        raise OSError("disk full")
+
+    # A failed write keeps the previous cache and leaves no temporary file
+    monkeypatch.setattr(model_loader, "write_xml_model", fail)
+    os.utime(source, (0, 0))
+    assert read_model(source, cache_dir=cache_dir).n_points == pv.Sphere().n_points
+    assert sorted(os.listdir(cache_dir)) == ["model.json", "model.vtp"]
+    with open(cached, "rb") as f:
+        assert f.read() == content
+
+
+def test_read_models(source, tmp_path):
+    other = str(tmp_path / "other.vtk")
+    pv.Cube().save(other)
+    models = read_models([other, source, other], cache_dir=str(tmp_path / "cache"))
+    assert [model.n_points for model in models] == [8, pv.Sphere().n_points, 8]
+    with pytest.raises(FileNotFoundError):
+        read_models([source, str(tmp_path / "missing.vtk")])
@@ -0,0 +1,31 @@
+import itertools
+
+import pytest
+from trame.app import get_server
+
+from stviewer.pv_pipeline import create_plotter, get_viewer
+
+_SERVER_IDS = itertools.count()
+
+
+@pytest.fixture
+def server():
+    return get_server(f"test_pv_callback_{next(_SERVER_IDS)}")
+
+
+def test_get_viewer_is_shared_per_server_and_plotter(server):
+    plotter = create_plotter()
+    viewer = get_viewer(plotter=plotter, server=server)
+    n_handlers = viewer.n_handlers
+    assert n_handlers == len(viewer._handlers) + len(viewer._triggers)
+
+    for _ in range(3):
+        assert get_viewer(plotter=plotter, server=server) is viewer
+    assert viewer.n_handlers == n_handlers
+
+    # Another plotter or another server has its own Viewer
+    other_plotter = create_plotter()
+    assert get_viewer(plotter=other_plotter, server=server) is not viewer
+    other = get_viewer(plotter=plotter, server=get_server(f"{server.name}_other"))
+    assert other is not viewer
+    assert viewer.n_handlers == n_handlers
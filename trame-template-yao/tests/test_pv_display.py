@@ -0,0 +1,96 @@
+import gc
+
+import numpy as np
+import pytest
+
+import pyvista as pv
+from stviewer.pv_pipeline import (
+    add_single_model,
+    create_plotter,
+    get_display,
+    set_interacting,
+)
+from stviewer.pv_pipeline.pv_display import _DISPLAYS
+
+
+@pytest.fixture
+def plotter():
+    return create_plotter(window_size=(100, 100))
+
+
+@pytest.fixture
+def point_cloud():
+    rng = np.random.default_rng(0)
+    model = pv.PolyData(rng.random((20000, 3)))
+    model.point_data["value"] = np.arange(20000, dtype=np.float32)
+    return model
+
+
+def test_point_levels(plotter, point_cloud):
+    actor = add_single_model(plotter=plotter, model=point_cloud, model_style="points")
+    display = get_display(actor)
+    display.build_point_levels(max_interactive_points=1000, factor=4)
+    assert display.n_levels > 0
+
+    # The full model while idle, a level within the budget while interacting
+    assert actor.mapper.dataset is point_cloud
+    assert set_interacting(plotter, True)
+    shown = actor.mapper.dataset
+    assert 0 < shown.n_points <= 1000
+    # The kept points carry their arrays
+    ids = np.asarray(shown.point_data["value"]).astype(np.intp)
+    np.testing.assert_array_equal(
+        np.asarray(shown.points), np.asarray(point_cloud.points)[ids]
+    )
+    assert set_interacting(plotter, False)
+    assert actor.mapper.dataset is point_cloud
+
+
+def test_small_point_clouds_have_no_levels(plotter, point_cloud):
+    actor = add_single_model(plotter=plotter, model=point_cloud, model_style="points")
+    display = get_display(actor)
+    display.build_point_levels(max_interactive_points=point_cloud.n_points)
+    assert display.n_levels == 0
+    assert not display.set_interacting(True)
+    assert actor.mapper.dataset is point_cloud
+
+
+def test_displays_go_away_with_their_actor(plotter, point_cloud):
+    actor = add_single_model(plotter=plotter, model=point_cloud)
+    get_display(actor)
+    assert actor in _DISPLAYS
+    n_displays = len(_DISPLAYS)
+    plotter.remove_actor(actor)
+    del actor
+    gc.collect()
+    assert len(_DISPLAYS) == n_displays - 1
+
+
+@pytest.fixture
+def mesh_levels():
+    mesh = pv.Sphere(theta_resolution=200, phi_resolution=200)
+    levels = [mesh.decimate(0.5), mesh.decimate(0.9), mesh.decimate(0.99)]
+    return mesh, levels
+
+
+def test_mesh_levels(plotter, mesh_levels):
+    mesh, levels = mesh_levels
+    actor = add_single_model(plotter=plotter, model=mesh)
+    display = get_display(actor)
+    display.set_mesh_levels(levels, cells_per_pixel=1.0, interactive_cells_ratio=0.1)
+
+    # The coarsest level with at least one cell per viewport pixel
+    display.set_viewport_size((100, 100))
+    n_cells = [level.n_cells for level in levels]
+    expected = max(i for i, n in enumerate(n_cells) if n >= 100 * 100)
+    assert actor.mapper.dataset is levels[expected]
+
+    # Ten times fewer cells while interacting
+    display.set_interacting(True)
+    expected = max(i for i, n in enumerate(n_cells) if n >= 100 * 100 * 0.1)
+    assert actor.mapper.dataset is levels[expected]
+    display.set_interacting(False)
+
+    # Viewports with more pixels than any level has cells show the full mesh
+    assert display.set_viewport_size((1000, 1000))
+    assert actor.mapper.dataset is mesh
@@ -0,0 +1,36 @@
+import numpy as np
+from vtkmodules.util import numpy_support
+
+from stviewer.pv_pipeline import SortedIndex, vertex_cells
+
+
+def test_sorted_index_range_ids():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 20, size=500).astype(np.float64)
+    values[::7] = np.nan
+    index = SortedIndex(values)
+
+    assert index.bounds == (np.nanmin(values), np.nanmax(values))
+    for low, high in [(3, 8), (5, 5), (-10, 100), (8, 3), (20.5, 30)]:
+        ids = index.range_ids(low, high)
+        expected = np.flatnonzero((values >= low) & (values <= high))
+        np.testing.assert_array_equal(np.sort(ids), expected)
+
+
+def test_sorted_index_all_nan():
+    index = SortedIndex(np.full(10, np.nan))
+    assert index.bounds == (0.0, 0.0)
+    assert len(index.range_ids(-np.inf, np.inf)) == 0
+
+
+def test_vertex_cells():
+    ids = np.array([5, 2, 9, 0], dtype=np.int64)
+    offsets = np.arange(11)
+    for cells in [vertex_cells(ids), vertex_cells(ids, offsets=offsets)]:
+        assert cells.GetNumberOfCells() == len(ids)
+        np.testing.assert_array_equal(
+            numpy_support.vtk_to_numpy(cells.GetConnectivityArray()), ids
+        )
+        np.testing.assert_array_equal(
+            numpy_support.vtk_to_numpy(cells.GetOffsetsArray()), np.arange(5)
+        )
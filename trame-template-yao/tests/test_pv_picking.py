@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from scipy.spatial import cKDTree
+from vtkmodules.vtkRenderingCore import vtkCamera
+
+from stviewer.pv_pipeline import (
+    camera_matrix,
+    display_ray,
+    pick_ray,
+    project_points,
+    select_frustum,
+    select_projected,
+)
+
+SIZE = (400, 300)
+
+
+@pytest.fixture
+def scene():
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(5000, 3))
+    camera = vtkCamera()
+    camera.SetPosition(4, 3, 8)
+    camera.SetFocalPoint(0, 0, 0)
+    camera.SetViewUp(0, 1, 0)
+    camera.SetClippingRange(1, 30)
+    matrix = camera_matrix(camera, SIZE[0] / SIZE[1])
+    return points, matrix
+
+
+def test_pick_ray(scene):
+    points, matrix = scene
+    tree = cKDTree(points)
+    projected = project_points(points, matrix, SIZE)
+    rng = np.random.default_rng(1)
+    shown = rng.random(len(points)) < 0.5
+
+    for position in [(200, 150), (150, 100), (260, 180), (5, 5)]:
+        for mask in [None, shown]:
+            # Brute-force reference: the nearest projected point within the tolerance
+            distances = np.hypot(
+                projected[:, 0] - position[0], projected[:, 1] - position[1]
+            )
+            hits = (distances <= 5) & (np.abs(projected[:, 2]) <= 1)
+            if mask is not None:
+                hits &= mask
+            picked = pick_ray(tree, points, matrix, position, SIZE, shown=mask)
+            if not np.any(hits):
+                assert picked is None
+                continue
+            expected = np.flatnonzero(hits)[np.argmin(projected[hits, 2])]
+            assert picked is not None
+            assert picked[0] == expected
+            assert picked[1] == pytest.approx(projected[expected, 2])
+
+
+def test_select_frustum(scene):
+    points, matrix = scene
+    projected = project_points(points, matrix, SIZE)
+    box = (120, 290, 80, 210)
+    x_min, x_max, y_min, y_max = box
+    frustum = []
+    for x, y in [(x_min, y_min), (x_min, y_max), (x_max, y_min), (x_max, y_max)]:
+        frustum.extend(display_ray(matrix, (x, y), SIZE))
+
+    expected = select_projected(projected, box)
+    reference = (
+        (projected[:, 0] >= x_min)
+        & (projected[:, 0] <= x_max)
+        & (projected[:, 1] >= y_min)
+        & (projected[:, 1] <= y_max)
+    )
+    np.testing.assert_array_equal(expected, reference & (np.abs(projected[:, 2]) <= 1))
+    # The side planes of the frustum select the same points as the box on the display
+    np.testing.assert_array_equal(select_frustum(points, frustum), reference)
@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from stviewer.pv_pipeline import RenderScheduler
+
+
+def test_render_scheduler_coalesces_requests():
+    renders = []
+    scheduler = RenderScheduler(
+        update=lambda **kwargs: renders.append((time.perf_counter(), kwargs)),
+        max_fps=20,
+    )
+
+    async def run():
+        for i in range(5):
+            scheduler.request(push_camera=i == 2)
+        assert scheduler.pending and len(renders) == 0
+        await asyncio.sleep(0.01)
+        # A second burst within the frame interval waits for the next frame
+        scheduler.request()
+        scheduler.request(force=True)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert [kwargs for _, kwargs in renders] == [
+        {"push_camera": False},
+        {"force": True},
+    ]
+    assert renders[1][0] - renders[0][0] >= 1 / 20 - 1e-3
+    assert scheduler.stats == {"requests": 7, "renders": 2}
+    assert not scheduler.pending
+
+
+def test_render_scheduler_without_event_loop():
+    renders = []
+    scheduler = RenderScheduler(update=lambda **kwargs: renders.append(kwargs))
+    scheduler.request(force=True)
+    scheduler.request()
+    assert renders == [{"force": True}, {}]
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+from scipy.spatial.distance import cdist
+
+from stviewer.pv_pipeline import (
+    CLIPS,
+    ScalarCache,
+    category_codes,
+    clip_range,
+    knn_graph,
+    module_score,
+    rank_genes,
+    take_column,
+)
+
+
+@pytest.fixture
+def matrix():
+    rng = np.random.default_rng(0)
+    return sparse.random(
+        50, 20, density=0.2, format="coo", random_state=rng, dtype=np.float32
+    )
+
+
+@pytest.mark.parametrize("fmt", ["csc", "csr", "coo", "dense"])
+def test_take_column(matrix, fmt):
+    reference = matrix.toarray()
+    matrix = reference if fmt == "dense" else matrix.asformat(fmt)
+    rows = np.array([3, 0, 49, 3])
+    for col in range(matrix.shape[1]):
+        np.testing.assert_array_equal(take_column(matrix, col), reference[:, col])
+        np.testing.assert_array_equal(
+            take_column(matrix, col, rows=rows), reference[rows, col]
+        )
+
+
+@pytest.mark.parametrize("fmt", ["csc", "csr"])
+def test_take_column_sums_duplicates(fmt):
+    # Non-canonical matrices with duplicated entries, which scipy sums
+    rows, cols = np.array([0, 2, 0, 1, 2]), np.array([1, 1, 1, 0, 1])
+    data = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+    if fmt == "csc":
+        matrix = sparse.csc_matrix(
+            (data[[3, 0, 1, 2, 4]], rows[[3, 0, 1, 2, 4]], [0, 1, 5]), shape=(3, 2)
+        )
+    else:
+        matrix = sparse.csr_matrix(
+            (data[[0, 2, 3, 1, 4]], cols[[0, 2, 3, 1, 4]], [0, 2, 3, 5]), shape=(3, 2)
+        )
+    assert not matrix.has_canonical_format
+    reference = matrix.toarray()
+    for col in range(2):
+        np.testing.assert_array_equal(take_column(matrix, col), reference[:, col])
+
+
+def test_scalar_cache_evicts_least_recently_used():
+    cache = ScalarCache(max_bytes=3 * 400)
+    arrays = {key: np.full(100, i, dtype=np.float32) for i, key in enumerate("abcd")}
+    for key in "abc":
+        cache.put(key, arrays[key], clim=(0, 1))
+    # "a" becomes the most recently used, so "b" is evicted by "d"
+    assert cache.get("a")[0] is arrays["a"]
+    entry = cache.put("d", arrays["d"], clim=(3, 3))
+    assert entry == (arrays["d"], (3, 3))
+    assert "b" not in cache and len(cache) == 3
+    assert cache.get("b") is None
+    assert cache.stats == {
+        "entries": 3,
+        "bytes": 3 * 400,
+        "max_bytes": 3 * 400,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 1,
+    }
+
+
+def test_scalar_cache_replaces_and_skips_entries():
+    cache = ScalarCache(max_bytes=1000)
+    cache.put("a", np.zeros(100, dtype=np.float32), clim=(0, 0))
+    cache.put("a", np.zeros(50, dtype=np.float32), clim=(0, 0))
+    assert cache.stats["bytes"] == 200
+    # Arrays beyond the budget and object arrays are returned but never cached
+    big = np.zeros(1000, dtype=np.float32)
+    assert cache.put("big", big, clim=(0, 0))[0] is big
+    cache.put("labels", np.array(["x", "y"], dtype=object), clim=(0, 1))
+    assert "big" not in cache and "labels" not in cache
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0 and cache.stats["bytes"] == 0
+
+
+@pytest.mark.parametrize("fmt", ["csc", "csr", "dense"])
+def test_module_score(matrix, fmt):
+    reference = matrix.toarray().astype(np.float64)
+    reference[:, 5] = 2.0  # a gene without variance
+    columns = (
+        reference if fmt == "dense" else sparse.csr_matrix(reference).asformat(fmt)
+    )
+    genes = [1, 5, 7]
+    x = reference[:, genes]
+
+    np.testing.assert_allclose(
+        module_score(columns[:, genes], score="sum"), x.sum(axis=1), rtol=1e-6
+    )
+    np.testing.assert_allclose(
+        module_score(columns[:, genes], score="mean"), x.mean(axis=1), rtol=1e-6
+    )
+    std = x.std(axis=0)
+    z = np.zeros_like(x)
+    z[:, std > 0] = (x - x.mean(axis=0))[:, std > 0] / std[std > 0]
+    np.testing.assert_allclose(
+        module_score(columns[:, genes], score="zscore"),
+        z.mean(axis=1),
+        rtol=1e-6,
+        atol=1e-9,
+    )
+
+
+def test_module_score_rejects_unknown_scores(matrix):
+    with pytest.raises(ValueError):
+        module_score(matrix.tocsc(), score="median")
+
+
+def test_clip_range():
+    array = np.arange(101, dtype=np.float64)
+    clim = (array.min(), array.max())
+    assert clip_range(array, clim, "min-max") == clim
+    np.testing.assert_allclose(
+        clip_range(array, clim, "5-95%"), np.quantile(array, CLIPS["5-95%"])
+    )
+    assert clip_range(array, clim, "1-99%", robust_range=(10, 20)) == (10, 20)
+
+
+def test_clip_range_degenerate():
+    # A gene detected in 0.5% of the cells: both robust quantiles are 0
+    array = np.zeros(1000)
+    array[:5] = np.arange(1, 6)
+    clim = (0.0, 5.0)
+    assert clip_range(array, clim, "1-99%") == clim
+    assert clip_range(array, clim, "5-95%", robust_range=(0.0, 0.0)) == clim
+    assert clip_range(np.array(["a", "b"]), (0, 1), "1-99%") == (0, 1)
+
+
+def test_category_codes_natural_order():
+    values = np.array(["S10", "S2", "S1", "S2", "S10"])
+    codes, categories = category_codes(values)
+    assert categories == ["S1", "S2", "S10"]
+    assert codes.dtype == np.uint8
+    np.testing.assert_array_equal(np.asarray(categories)[codes], values)
+
+
+def test_category_codes_keep_ordered_categoricals():
+    values = pd.Categorical(
+        ["low", "high", "mid", None], categories=["low", "mid", "high"], ordered=True
+    )
+    codes, categories = category_codes(values)
+    # Missing values get a trailing category
+    assert categories == ["low", "mid", "high", "NaN"]
+    np.testing.assert_array_equal(codes, [0, 2, 1, 3])
+
+
+def test_category_codes_dtype():
+    codes, categories = category_codes(np.arange(300))
+    assert codes.dtype == np.uint16 and len(categories) == 300
+    assert categories[:3] == ["0", "1", "2"]
+
+
+def test_rank_genes():
+    rng = np.random.default_rng(0)
+    means = rng.gamma(2.0, size=(100, 2))
+    var_names = np.array([f"gene_{i}" for i in range(100)])
+    ranked = rank_genes(means, var_names, n_genes=10, pseudocount=1.0)
+
+    log_fold_changes = np.log2((means[:, 0] + 1) / (means[:, 1] + 1))
+    top = np.argsort(-log_fold_changes, kind="stable")[:10]
+    assert [gene["name"] for gene in ranked] == list(var_names[top])
+    np.testing.assert_allclose(
+        [gene["log_fold_change"] for gene in ranked], log_fold_changes[top]
+    )
+    np.testing.assert_allclose(
+        [gene["mean_difference"] for gene in ranked],
+        means[top, 0] - means[top, 1],
+    )
+
+
+def test_knn_graph():
+    rng = np.random.default_rng(0)
+    coordinates = rng.random((200, 3))
+    graph = knn_graph(coordinates, n_neighbors=5)
+
+    nearest = np.argsort(cdist(coordinates, coordinates), axis=1)[:, :6]
+    reference = np.zeros((200, 200))
+    np.put_along_axis(reference, nearest, 1 / 6, axis=1)
+    np.testing.assert_allclose(graph.toarray(), reference, rtol=1e-6)
+    np.testing.assert_allclose(graph @ np.ones(200), np.ones(200), rtol=1e-6)
+
+
+def test_knn_graph_fewer_cells_than_neighbors():
+    graph = knn_graph(np.eye(3), n_neighbors=10)
+    np.testing.assert_allclose(graph.toarray(), np.full((3, 3), 1 / 3), rtol=1e-6)